@@ -0,0 +1,57 @@
+"""
+管理后台后台任务
+delete_user：删除用户及其相关数据（由 delete_user 视图提交）。
+每一步都是按用户ID的幂等删除，失败重试时从头执行即可；每步之间检查取消，已完成的步骤不回滚。
+任务在 run_job_worker 进程中执行，这里调用的失效函数都作用于各进程共用的缓存（Django cache 与缓存代数），
+网站进程随之失效。
+"""
+from django.db import connection
+
+from common.admin_auth import invalidate_admin_flag
+from common.username_resolver import invalidate_username
+from article.list_count_cache import invalidate_article_count
+from article.detail_cache import invalidate_article_detail
+
+
+def _delete_articles(cursor, user_id):
+    # 删除用户发表的文章（会级联删除文章评论和点赞记录）
+    cursor.execute("SELECT id FROM blog_articles WHERE author_id = %s", [user_id])
+    deleted_article_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute("DELETE FROM blog_articles WHERE author_id = %s", [user_id])
+    invalidate_article_detail(*deleted_article_ids)
+    invalidate_article_count()
+
+
+# (进度说明, 执行函数)
+_DELETE_USER_STEPS = (
+    ('删除用户发表的文章', _delete_articles),
+    ('删除关注关系（作为关注者）',
+     lambda cursor, user_id: cursor.execute("DELETE FROM user_follows WHERE follower_id = %s", [user_id])),
+    ('删除关注关系（作为被关注者）',
+     lambda cursor, user_id: cursor.execute("DELETE FROM user_follows WHERE following_id = %s", [user_id])),
+    ('删除点赞记录',
+     lambda cursor, user_id: cursor.execute("DELETE FROM user_liked_articles WHERE user_id = %s", [user_id])),
+    ('删除刷新令牌',
+     lambda cursor, user_id: cursor.execute("DELETE FROM refresh_tokens WHERE user_id = %s", [user_id])),
+    # feedbacks 表的 user_id 会自动设置为 NULL
+    ('删除用户',
+     lambda cursor, user_id: cursor.execute("DELETE FROM users WHERE id = %s", [user_id])),
+)
+
+
+def delete_user(job):
+    """
+    删除用户
+    payload: user_id
+    """
+    user_id = int(job.payload['user_id'])
+    total = len(_DELETE_USER_STEPS)
+    with connection.cursor() as cursor:
+        for index, (label, step) in enumerate(_DELETE_USER_STEPS):
+            job.set_progress(index * 100 // total, label, force=True)
+            job.check_cancelled()
+            step(cursor, user_id)
+
+    invalidate_username(user_id)
+    invalidate_admin_flag(user_id)
+    return {'user_id': user_id}
@@ -4,44 +4,24 @@
 """
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.db import connection
 from django.conf import settings
-from functools import wraps
-from common.jwt_utils import jwt_required, JWTUtils
+from common.jwt_utils import JWTUtils
+from common.admin_auth import admin_required, invalidate_admin_flag
 from common.article_content_sanitize import sanitize_article_content_embeds
-
-
-def admin_required(view_func):
-    """
-    管理员权限装饰器
-    需要先通过JWT认证，然后检查用户是否为管理员
-    """
-    @wraps(view_func)
-    @jwt_required
-    def _wrapped_view(request, *args, **kwargs):
-        # jwt_required 已经设置了 request.user_id
-        user_id = request.user_id
-        
-        # 检查用户是否为管理员
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT is_admin FROM users WHERE id = %s", [user_id])
-            row = cursor.fetchone()
-            
-            if not row or not row[0]:
-                return JsonResponse({
-                    'success': False,
-                    'error': '需要管理员权限',
-                    'code': 'ADMIN_REQUIRED'
-                }, status=403)
-        
-        return view_func(request, *args, **kwargs)
-    
-    return _wrapped_view
+from common.article_summary import build_article_summary
+from common.article_search import author_filter, title_filter, index_article
+from common.config_utils import invalidate_config_cache
+from common.username_resolver import resolve_usernames, invalidate_username
+from common import site_stats, job_queue
+from network_disk import usage_ledger, dir_size_index, blob_store
+from article.list_count_cache import invalidate_article_count
+from article.detail_cache import invalidate_article_detail
 
 
 @csrf_exempt
@@ -51,106 +31,47 @@ def get_statistics(request):
     """
     获取统计数据
     返回用户数、文章数、浏览量、喜欢数、网盘文件数等统计信息
+    数据来自每日统计汇总表 site_daily_stats，趋势天数通过 days 参数指定（7/30/90/365，默认7）
     """
     try:
-        with connection.cursor() as cursor:
-            # 总用户数
-            cursor.execute("SELECT COUNT(*) FROM users")
-            total_users = cursor.fetchone()[0]
-            
-            # 今日新增用户数
-            today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            cursor.execute(
-                "SELECT COUNT(*) FROM users WHERE registered_time >= %s",
-                [today_start]
-            )
-            today_new_users = cursor.fetchone()[0]
-            
-            # 总文章数
-            cursor.execute("SELECT COUNT(*) FROM blog_articles")
-            total_articles = cursor.fetchone()[0]
-            
-            # 今日新增文章数
-            cursor.execute(
-                "SELECT COUNT(*) FROM blog_articles WHERE published_at >= %s",
-                [today_start]
-            )
-            today_new_articles = cursor.fetchone()[0]
-            
-            # 总浏览量
-            cursor.execute("SELECT SUM(view_count) FROM blog_articles")
-            total_views = cursor.fetchone()[0] or 0
-            
-            # 总喜欢数
-            cursor.execute("SELECT SUM(love_count) FROM blog_articles")
-            total_likes = cursor.fetchone()[0] or 0
-            
-            # 网盘文件统计
-            network_disk_root = Path(settings.BASE_DIR) / 'api' / 'static' / 'files'
-            file_count = 0
-            total_size_bytes = 0
-            
-            if network_disk_root.exists():
-                for item in network_disk_root.rglob('*'):
-                    if item.is_file():
-                        file_count += 1
-                        try:
-                            total_size_bytes += item.stat().st_size
-                        except (OSError, PermissionError):
-                            pass
-            
-            total_size_gb = round(total_size_bytes / (1024 ** 3), 2)
-            
-            # 最近7天的数据趋势
-            trend_data = []
-            for i in range(6, -1, -1):
-                date = (datetime.now() - timedelta(days=i)).replace(hour=0, minute=0, second=0, microsecond=0)
-                next_date = date + timedelta(days=1)
-                
-                # 该日新增用户数
-                cursor.execute(
-                    "SELECT COUNT(*) FROM users WHERE registered_time >= %s AND registered_time < %s",
-                    [date, next_date]
-                )
-                day_users = cursor.fetchone()[0]
-                
-                # 该日新增文章数
-                cursor.execute(
-                    "SELECT COUNT(*) FROM blog_articles WHERE published_at >= %s AND published_at < %s",
-                    [date, next_date]
-                )
-                day_articles = cursor.fetchone()[0]
-                
-                trend_data.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'users': day_users,
-                    'articles': day_articles
-                })
-            
+        try:
+            days = int(request.GET.get('days', site_stats.DEFAULT_WINDOW))
+        except (TypeError, ValueError):
+            days = None
+        if days not in site_stats.ALLOWED_WINDOWS:
             return JsonResponse({
-                'success': True,
-                'data': {
-                    'users': {
-                        'total': total_users,
-                        'today_new': today_new_users
-                    },
-                    'articles': {
-                        'total': total_articles,
-                        'today_new': today_new_articles
-                    },
-                    'views': {
-                        'total': total_views
-                    },
-                    'likes': {
-                        'total': total_likes
-                    },
-                    'network_disk': {
-                        'file_count': file_count,
-                        'total_size_gb': total_size_gb
-                    },
-                    'trend': trend_data
-                }
-            })
+                'success': False,
+                'error': f'days 参数只能是 {"/".join(str(d) for d in site_stats.ALLOWED_WINDOWS)}'
+            }, status=400)
+        
+        summary, trend_data = site_stats.get_site_statistics(days)
+        total_size_gb = round(summary['disk_total_bytes'] / (1024 ** 3), 2)
+        
+        return JsonResponse({
+            'success': True,
+            'data': {
+                'users': {
+                    'total': summary['total_users'],
+                    'today_new': summary['today_new_users']
+                },
+                'articles': {
+                    'total': summary['total_articles'],
+                    'today_new': summary['today_new_articles']
+                },
+                'views': {
+                    'total': summary['total_views']
+                },
+                'likes': {
+                    'total': summary['total_likes']
+                },
+                'network_disk': {
+                    'file_count': summary['disk_file_count'],
+                    'total_size_gb': total_size_gb
+                },
+                'days': days,
+                'trend': trend_data
+            }
+        })
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -183,8 +104,13 @@ def list_articles(request):
             params = []
             
             if search:
-                where_clause = "WHERE a.title LIKE %s OR u.username LIKE %s"
-                params.extend([f'%{search}%', f'%{search}%'])
+                # 标题或作者名匹配，优先走全文索引（见 common.article_search）
+                title_condition, title_params = title_filter(search)
+                author_condition, author_params = author_filter(search)
+                conditions = [c for c in (title_condition, author_condition) if c]
+                if conditions:
+                    where_clause = "WHERE " + " OR ".join(f"({c})" for c in conditions)
+                    params.extend(title_params + author_params)
             
             # 查询总数
             count_sql = f"SELECT COUNT(*) FROM blog_articles a LEFT JOIN users u ON a.author_id = u.id {where_clause}"
@@ -319,14 +245,17 @@ def create_article(request):
             author_id = request.user_id
         
         content = sanitize_article_content_embeds(content)
+        summary = build_article_summary(content)
         
         with connection.cursor() as cursor:
             cursor.execute("""
-                INSERT INTO blog_articles (title, content, author_id, published_at)
-                VALUES (%s, %s, %s, NOW())
-            """, [title, content, author_id])
+                INSERT INTO blog_articles (title, content, author_id, published_at, excerpt, word_count, cover_url)
+                VALUES (%s, %s, %s, NOW(), %s, %s, %s)
+            """, [title, content, author_id, summary['excerpt'], summary['word_count'], summary['cover_url']])
             
             article_id = cursor.lastrowid
+            index_article(article_id, content, cursor)
+            invalidate_article_count()
             
             return JsonResponse({
                 'success': True,
@@ -359,30 +288,41 @@ def update_article(request, article_id):
                 'error': '标题和内容不能为空'
             }, status=400)
         
-        content = sanitize_article_content_embeds(content)
-        
         with connection.cursor() as cursor:
-            # 检查文章是否存在
-            cursor.execute("SELECT id FROM blog_articles WHERE id = %s", [article_id])
-            if not cursor.fetchone():
+            # 检查文章是否存在，同时取出已清洗的正文
+            cursor.execute("SELECT content FROM blog_articles WHERE id = %s", [article_id])
+            row = cursor.fetchone()
+            if not row:
                 return JsonResponse({
                     'success': False,
                     'error': '文章不存在'
                 }, status=404)
             
+            # 与库中正文相同的嵌入片段已清洗过，不再重复清洗
+            content = sanitize_article_content_embeds(content, stored_content=row[0])
+            # 正文变化后重新生成摘要、字数和封面
+            summary = build_article_summary(content)
+            summary_params = [summary['excerpt'], summary['word_count'], summary['cover_url']]
+            
             # 更新文章
             if author_id:
                 cursor.execute("""
                     UPDATE blog_articles 
-                    SET title = %s, content = %s, author_id = %s
+                    SET title = %s, content = %s, author_id = %s,
+                        excerpt = %s, word_count = %s, cover_url = %s
                     WHERE id = %s
-                """, [title, content, author_id, article_id])
+                """, [title, content, author_id] + summary_params + [article_id])
             else:
                 cursor.execute("""
                     UPDATE blog_articles 
-                    SET title = %s, content = %s
+                    SET title = %s, content = %s,
+                        excerpt = %s, word_count = %s, cover_url = %s
                     WHERE id = %s
-                """, [title, content, article_id])
+                """, [title, content] + summary_params + [article_id])
+            index_article(article_id, content, cursor)
+            # 作者可能变更，按作者筛选的总数需要刷新
+            invalidate_article_count()
+            invalidate_article_detail(article_id)
             
             return JsonResponse({
                 'success': True,
@@ -412,6 +352,8 @@ def delete_article(request, article_id):
                 }, status=404)
             
             cursor.execute("DELETE FROM blog_articles WHERE id = %s", [article_id])
+            invalidate_article_count()
+            invalidate_article_detail(article_id)
             
             return JsonResponse({
                 'success': True,
@@ -615,6 +557,9 @@ def update_user(request, user_id):
             sql = f"UPDATE users SET {', '.join(update_fields)} WHERE id = %s"
             cursor.execute(sql, params)
             
+            # 用户名可能已修改，清除用户名缓存
+            invalidate_username(user_id)
+            
             return JsonResponse({
                 'success': True,
                 'message': '用户信息更新成功'
@@ -632,7 +577,7 @@ def update_user(request, user_id):
 def delete_user(request, user_id):
     """
     删除用户
-    递归删除用户相关的所有数据：
+    校验后提交后台任务（admin/jobs.py）递归删除用户相关的所有数据，返回 202 和 job_id：
     1. 删除用户发表的文章（会级联删除文章评论）
     2. 删除用户的关注关系（follower_id 和 following_id）
     3. 删除用户的点赞记录（user_liked_articles）
@@ -656,29 +601,16 @@ def delete_user(request, user_id):
                     'success': False,
                     'error': '用户不存在'
                 }, status=404)
-            
-            # 1. 删除用户发表的文章（会级联删除文章评论和点赞记录）
-            cursor.execute("DELETE FROM blog_articles WHERE author_id = %s", [user_id])
-            
-            # 2. 删除用户的关注关系（作为关注者）
-            cursor.execute("DELETE FROM user_follows WHERE follower_id = %s", [user_id])
-            
-            # 3. 删除用户的关注关系（作为被关注者）
-            cursor.execute("DELETE FROM user_follows WHERE following_id = %s", [user_id])
-            
-            # 4. 删除用户的点赞记录
-            cursor.execute("DELETE FROM user_liked_articles WHERE user_id = %s", [user_id])
-            
-            # 5. 删除用户的刷新令牌
-            cursor.execute("DELETE FROM refresh_tokens WHERE user_id = %s", [user_id])
-            
-            # 6. 删除用户本身（feedbacks 表的 user_id 会自动设置为 NULL）
-            cursor.execute("DELETE FROM users WHERE id = %s", [user_id])
-            
-            return JsonResponse({
-                'success': True,
-                'message': '用户删除成功'
-            })
+        
+        job_id = job_queue.enqueue('admin.delete_user', {'user_id': user_id}, created_by=request.user_id)
+        # 立即撤销该用户的管理员缓存；任务删除用户后会再次失效，清除删除期间被重新缓存的标记
+        invalidate_admin_flag(user_id)
+        
+        return JsonResponse({
+            'success': True,
+            'message': '已提交删除任务',
+            'data': {'job_id': job_id}
+        }, status=202)
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -729,6 +661,7 @@ def toggle_admin(request, user_id):
                 }, status=400)
 
             cursor.execute("UPDATE users SET is_admin = %s WHERE id = %s", [new_admin_status, user_id])
+            invalidate_admin_flag(user_id)
             
             return JsonResponse({
                 'success': True,
@@ -762,20 +695,21 @@ def list_network_files(request):
             })
         
         files = []
+        linked_files = []  # 去重文件：(列表下标, 路径)，修改时间改用逐路径记录的上传时间
         total_size_bytes = 0
         
+        # 跳过去重存储等内部目录
+        user_dirs = [item for item in network_disk_root.iterdir() if item.is_dir() and not item.name.startswith('.')]
+        # 一次批量查询所有用户文件夹对应的用户名
+        usernames = resolve_usernames(item.name for item in user_dirs)
+        
         # 遍历所有用户文件夹
-        for user_dir in network_disk_root.iterdir():
-            if not user_dir.is_dir():
-                continue
-            
+        for user_dir in user_dirs:
             user_id = user_dir.name
             
             # 获取用户名
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT username FROM users WHERE id = %s", [user_id])
-                row = cursor.fetchone()
-                username = row[0] if row else f'用户{user_id}'
+            username = usernames.get(int(user_id)) if user_id.isdigit() else None
+            username = username or f'用户{user_id}'
             
             # 遍历用户文件夹下的所有文件
             for file_path in user_dir.rglob('*'):
@@ -793,11 +727,19 @@ def list_network_files(request):
                             'username': username,
                             'modified_time': datetime.fromtimestamp(file_stat.st_mtime).isoformat()
                         })
+                        if file_stat.st_nlink > 1:
+                            linked_files.append((len(files) - 1, file_path))
                         
                         total_size_bytes += file_stat.st_size
                     except (OSError, PermissionError):
                         pass
         
+        upload_times = blob_store.get_upload_times(path for _, path in linked_files)
+        for index, path in linked_files:
+            upload_time = upload_times.get(str(path))
+            if upload_time is not None:
+                files[index]['modified_time'] = datetime.fromtimestamp(upload_time).isoformat()
+        
         total_size_gb = round(total_size_bytes / (1024 ** 3), 2)
         
         return JsonResponse({
@@ -835,9 +777,11 @@ def delete_network_file(request):
         network_disk_root = Path(settings.BASE_DIR) / 'api' / 'static' / 'files'
         target_file = network_disk_root / file_path
         
-        # 安全检查：确保文件在网盘根目录下
+        # 安全检查：确保文件在网盘根目录下，且不是内部目录（去重存储由引用计数管理）
         try:
-            target_file.resolve().relative_to(network_disk_root.resolve())
+            relative_parts = target_file.resolve().relative_to(network_disk_root.resolve()).parts
+            if not relative_parts or blob_store.is_internal_path(relative_parts):
+                raise ValueError
         except ValueError:
             return JsonResponse({
                 'success': False,
@@ -850,11 +794,27 @@ def delete_network_file(request):
                 'error': '文件不存在'
             }, status=404)
         
+        # 删除后从容量台账中扣除（去重文件同时减少 blob 引用）
+        owner_id = usage_ledger.owner_id_for_path(target_file)
+        linked = {}
         if target_file.is_file():
+            linked = blob_store.collect_linked(target_file)
+            removed_size = target_file.stat().st_size
             target_file.unlink()
+            usage_ledger.apply_delta(owner_id, files=-1, size=-removed_size)
+            if linked:
+                blob_store.forget_upload_times([target_file])
         elif target_file.is_dir():
             import shutil
+            file_count, dir_count, total_bytes = usage_ledger.summarize_tree(target_file, linked)
+            is_user_root = target_file.resolve().parent == network_disk_root.resolve()
             shutil.rmtree(target_file)
+            # 用户根目录自身不计入目录数
+            if not is_user_root:
+                dir_count += 1
+            usage_ledger.apply_delta(owner_id, files=-file_count, dirs=-dir_count, size=-total_bytes)
+        blob_store.settle_removed(linked)
+        dir_size_index.invalidate(target_file)
         
         return JsonResponse({
             'success': True,
@@ -995,11 +955,15 @@ def update_config(request):
             with open(back_config_path, 'w', encoding='utf-8') as f:
                 json.dump(back_config, f, ensure_ascii=False, indent=4)
         except Exception as e:
+            invalidate_config_cache()
             return JsonResponse({
                 'success': False,
                 'error': f'保存后端配置失败: {str(e)}'
             }, status=500)
         
+        # 后端配置已变化，立即让本进程的配置缓存失效（其他进程在下次检查文件时自动重新加载）
+        invalidate_config_cache()
+        
         # 合并返回完整配置
         merged_config = {**front_config, **back_config}
         
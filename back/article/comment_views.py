@@ -1,4 +1,5 @@
 import json
+from datetime import datetime
 from django.http import JsonResponse
 from django.db import connection
 from django.views.decorators.http import require_GET, require_POST, require_http_methods
@@ -6,64 +7,137 @@ from django.views.decorators.csrf import csrf_exempt
 from django.core.cache import cache
 from common.jwt_utils import jwt_required
 from common.captcha_utils import CaptchaUtils
+from common.pagination import encode_cursor, decode_cursor, parse_limit
+from .detail_cache import invalidate_article_detail
 import time
 
 
+# 评论分页：每页默认/最大条数
+COMMENT_PAGE_SIZE = 20
+COMMENT_PAGE_MAX_SIZE = 100
+# 第一页缓存有效期（秒）：评论增删时主动失效，评论人改名/换头像最多延迟这么久
+FIRST_PAGE_CACHE_TIMEOUT = 60
+
+COMMENT_SELECT_SQL = """
+    SELECT
+        c.id,
+        c.article_id,
+        c.user_id,
+        u.username as user_name,
+        u.avatar as user_avatar,
+        c.content,
+        c.created_at
+    FROM article_comments c
+    LEFT JOIN users u ON c.user_id = u.id
+"""
+
+
+def _first_page_cache_key(article_id):
+    return f'article_comments_first:{article_id}'
+
+
+def invalidate_comment_pages(article_id):
+    """评论增删后使该文章的第一页缓存失效"""
+    cache.delete(_first_page_cache_key(article_id))
+
+
+def _comment_row_to_dict(row):
+    return {
+        'id': row[0],
+        'article_id': row[1],
+        'user_id': row[2],
+        'user_name': row[3] if row[3] else '未知用户',
+        'user_avatar': row[4] if row[4] else None,
+        'content': row[5],
+        'created_at': row[6].isoformat() if row[6] else None
+    }
+
+
+def _load_comment_page(article_id, limit, cursor_values=None):
+    """
+    按 (created_at, id) 倒序取一页评论（走 (article_id, created_at, id) 索引），多取一条判断是否还有下一页
+    total 取自 blog_articles.comment_count（由触发器维护），不再统计评论表
+    """
+    where_clause = "c.article_id = %s"
+    params = [article_id]
+    if cursor_values:
+        # 从上一页最后一条之后继续取
+        where_clause += " AND (c.created_at < %s OR (c.created_at = %s AND c.id < %s))"
+        params.extend([cursor_values['created_at'], cursor_values['created_at'], cursor_values['id']])
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            {COMMENT_SELECT_SQL}
+            WHERE {where_clause}
+            ORDER BY c.created_at DESC, c.id DESC
+            LIMIT %s
+        """, params + [limit + 1])
+        rows = cursor.fetchall()
+
+        cursor.execute("SELECT comment_count FROM blog_articles WHERE id = %s", [article_id])
+        count_row = cursor.fetchone()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor({'created_at': rows[-1][6], 'id': rows[-1][0]})
+    return {
+        'comments': [_comment_row_to_dict(row) for row in rows],
+        'total': count_row[0] if count_row else 0,
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    }
+
+
 @require_GET
 def get_comments(request, article_id):
     """
-    获取文章的所有评论
-    按时间倒序排列（最新的在前）
+    获取文章的评论
+    按 (created_at, id) 倒序游标分页（最新的在前）：?limit=20&cursor=上一页返回的 next_cursor
+    默认每页条数的第一页按文章缓存，评论增删时失效
     """
     try:
-        with connection.cursor() as cursor:
-            # 查询评论，关联用户表获取评论人信息
-            cursor.execute("""
-                SELECT 
-                    c.id,
-                    c.article_id,
-                    c.user_id,
-                    u.username as user_name,
-                    u.avatar as user_avatar,
-                    c.content,
-                    c.created_at
-                FROM article_comments c
-                LEFT JOIN users u ON c.user_id = u.id
-                WHERE c.article_id = %s
-                ORDER BY c.created_at DESC
-            """, [article_id])
-            
-            rows = cursor.fetchall()
-            
-            comments = []
-            for row in rows:
-                comment = {
-                    'id': row[0],
-                    'article_id': row[1],
-                    'user_id': row[2],
-                    'user_name': row[3] if row[3] else '未知用户',
-                    'user_avatar': row[4] if row[4] else None,
-                    'content': row[5],
-                    'created_at': row[6].isoformat() if row[6] else None
-                }
-                comments.append(comment)
-            
-            return JsonResponse({
-                'success': True,
-                'message': '获取评论列表成功',
-                'data': {
-                    'comments': comments,
-                    'total': len(comments)
-                }
-            })
-            
+        limit = parse_limit(request.GET.get('limit'), default=COMMENT_PAGE_SIZE, maximum=COMMENT_PAGE_MAX_SIZE)
+        cursor_param = request.GET.get('cursor', '').strip()
+
+        if cursor_param:
+            try:
+                cursor_values = decode_cursor(
+                    cursor_param,
+                    required_keys=('created_at', 'id'),
+                    key_types={'created_at': datetime, 'id': int},
+                )
+            except ValueError as e:
+                return JsonResponse({
+                    'success': False,
+                    'error': str(e)
+                }, status=400)
+            data = _load_comment_page(article_id, limit, cursor_values)
+        elif limit == COMMENT_PAGE_SIZE:
+            cache_key = _first_page_cache_key(article_id)
+            data = cache.get(cache_key)
+            if data is None:
+                data = _load_comment_page(article_id, limit)
+                cache.set(cache_key, data, FIRST_PAGE_CACHE_TIMEOUT)
+        else:
+            data = _load_comment_page(article_id, limit)
+
+        return JsonResponse({
+            'success': True,
+            'message': '获取评论列表成功',
+            'data': data
+        })
+
     except Exception as e:
         return JsonResponse({
             'success': False,
             'error': f'获取评论列表失败: {str(e)}',
             'data': {
                 'comments': [],
-                'total': 0
+                'total': 0,
+                'next_cursor': None,
+                'has_more': False
             }
         }, status=500)
 
@@ -195,6 +269,9 @@ def create_comment(request, article_id):
             """, [article_id, user_id, content])
             
             comment_id = cursor.lastrowid
+            # 评论数已变化
+            invalidate_article_detail(article_id)
+            invalidate_comment_pages(article_id)
             
             return JsonResponse({
                 'success': True,
@@ -256,6 +333,8 @@ def delete_comment(request, article_id, comment_id):
             
             # 删除评论（触发器会自动更新文章的评论数）
             cursor.execute("DELETE FROM article_comments WHERE id = %s", [comment_id])
+            invalidate_article_detail(article_id)
+            invalidate_comment_pages(article_id)
             
             return JsonResponse({
                 'success': True,
@@ -0,0 +1,78 @@
+"""
+文章详情缓存
+详情接口按文章ID读穿缓存，命中时不访问数据库：
+- 未命中时只有拿到重建锁的请求去查库，其余并发请求短暂等待缓存填充，避免热点文章缓存失效瞬间的击穿
+- 不存在的文章也短暂缓存，防止反复查询
+- 发布、后台修改/删除文章、评论增删、喜欢变更时调用 invalidate_article_detail
+缓存中不含 view_count，返回前由调用方从浏览量计数（view_counter.get_view_count）读取，浏览量落库不会使详情缓存失效。
+"""
+import time
+
+from django.core.cache import cache
+
+
+# 详情缓存有效期（秒）：兜底过期，作者改名/换头像等未主动失效的变化最多延迟这么久
+DETAIL_CACHE_TIMEOUT = 5 * 60
+# 不存在的文章缓存时间（秒）
+MISSING_CACHE_TIMEOUT = 30
+# 重建锁有效期（秒），防止持锁请求异常退出后一直占用
+REBUILD_LOCK_TIMEOUT = 5
+# 未拿到重建锁时等待缓存填充的轮询间隔与次数
+WAIT_INTERVAL_SECONDS = 0.05
+WAIT_ROUNDS = 20
+
+_MISSING = {'__missing__': True}
+
+
+def _cache_key(article_id):
+    return f'article_detail:{article_id}'
+
+
+def _lock_key(article_id):
+    return f'article_detail_lock:{article_id}'
+
+
+def get_or_load_article_detail(article_id, loader):
+    """
+    读取文章详情
+    loader(article_id) 从数据库加载详情字典，文章不存在时返回 None
+    返回详情字典的副本（调用方可以安全修改），文章不存在时返回 None
+    """
+    key = _cache_key(article_id)
+    cached = cache.get(key)
+    if cached is None:
+        cached = _rebuild(article_id, loader)
+    if cached is None or cached == _MISSING:
+        return None
+    return dict(cached)
+
+
+def _rebuild(article_id, loader):
+    key = _cache_key(article_id)
+    lock_key = _lock_key(article_id)
+
+    if not cache.add(lock_key, 1, REBUILD_LOCK_TIMEOUT):
+        # 其他请求正在重建：等待其写入缓存，超时则自行查库
+        for _ in range(WAIT_ROUNDS):
+            time.sleep(WAIT_INTERVAL_SECONDS)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        return loader(article_id)
+
+    try:
+        article = loader(article_id)
+        if article is None:
+            cache.set(key, _MISSING, MISSING_CACHE_TIMEOUT)
+        else:
+            cache.set(key, article, DETAIL_CACHE_TIMEOUT)
+        return article
+    finally:
+        cache.delete(lock_key)
+
+
+def invalidate_article_detail(*article_ids):
+    """使一篇或多篇文章的详情缓存失效"""
+    keys = [_cache_key(article_id) for article_id in article_ids if article_id]
+    if keys:
+        cache.delete_many(keys)
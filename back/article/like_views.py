@@ -1,8 +1,10 @@
 from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 from django.views.decorators.csrf import csrf_exempt
 from common.jwt_utils import jwt_required
-from common.user_relation_utils import like_article, unlike_article, is_liked_article
+from common.pagination import parse_id_list
+from common.user_relation_utils import toggle_like_article, is_liked_article, get_liked_article_ids
+from .detail_cache import invalidate_article_detail
 
 
 @csrf_exempt
@@ -22,41 +24,23 @@ def toggle_like(request, article_id):
                 'error': '用户未登录'
             }, status=401)
         
-        # 检查当前是否已喜欢
-        is_liked = is_liked_article(user_id, article_id)
+        # 单条语句切换喜欢状态（不事先查询，避免并发重复点击产生冲突）
+        success, message, is_liked = toggle_like_article(user_id, article_id)
+        if not success:
+            return JsonResponse({
+                'success': False,
+                'error': message
+            }, status=400)
         
-        if is_liked:
-            # 取消喜欢
-            success, message = unlike_article(user_id, article_id)
-            if success:
-                return JsonResponse({
-                    'success': True,
-                    'message': '取消喜欢成功',
-                    'data': {
-                        'is_liked': False
-                    }
-                })
-            else:
-                return JsonResponse({
-                    'success': False,
-                    'error': message
-                }, status=400)
-        else:
-            # 喜欢
-            success, message = like_article(user_id, article_id)
-            if success:
-                return JsonResponse({
-                    'success': True,
-                    'message': '喜欢成功',
-                    'data': {
-                        'is_liked': True
-                    }
-                })
-            else:
-                return JsonResponse({
-                    'success': False,
-                    'error': message
-                }, status=400)
+        # 喜欢数已变化
+        invalidate_article_detail(article_id)
+        return JsonResponse({
+            'success': True,
+            'message': '喜欢成功' if is_liked else '取消喜欢成功',
+            'data': {
+                'is_liked': is_liked
+            }
+        })
             
     except Exception as e:
         return JsonResponse({
@@ -95,3 +79,38 @@ def check_like_status(request, article_id):
             'error': f'查询失败: {str(e)}'
         }, status=500)
 
+
+# 批量查询喜欢状态一次最多的文章数
+MAX_LIKE_STATUS_IDS = 100
+
+
+@require_GET
+def check_like_status_batch(request):
+    """
+    批量检查当前用户是否喜欢了一组文章（文章卡片列表使用，一次 IN 查询）
+    ?ids=1,2,3，访客全部返回 False
+    """
+    try:
+        try:
+            article_ids = parse_id_list(request.GET.get('ids'), maximum=MAX_LIKE_STATUS_IDS)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+        
+        user_id = getattr(request, 'user_id', None)
+        liked_ids = get_liked_article_ids(user_id, article_ids)
+        
+        return JsonResponse({
+            'success': True,
+            'data': {
+                'statuses': {str(article_id): article_id in liked_ids for article_id in article_ids}
+            }
+        })
+            
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'查询失败: {str(e)}'
+        }, status=500)
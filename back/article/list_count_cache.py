@@ -0,0 +1,59 @@
+"""
+文章列表总数缓存
+列表接口的 COUNT(*) 按筛选条件缓存一小段时间；
+发布、删除文章时调用 invalidate_article_count 提升版本号，使所有进程的总数缓存立即失效（缓存为各进程共用的 Django cache）。
+"""
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import connection
+
+
+# 总数缓存有效期（秒）
+COUNT_CACHE_TIMEOUT = 60
+_VERSION_KEY = 'article_list:count_version'
+
+
+def _get_version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        cache.add(_VERSION_KEY, 1, None)
+        version = cache.get(_VERSION_KEY) or 1
+    return version
+
+
+def get_article_count(where_clause, params):
+    """
+    读取文章列表在给定筛选条件下的总数（带缓存）
+    where_clause/params 与列表查询保持一致（别名 a 为 blog_articles，u 为 users）
+    """
+    signature = json.dumps([where_clause, [str(p) for p in params]], ensure_ascii=False)
+    digest = hashlib.md5(signature.encode('utf-8')).hexdigest()
+    cache_key = f'article_list:count:{_get_version()}:{digest}'
+
+    total = cache.get(cache_key)
+    if total is not None:
+        return total
+
+    with connection.cursor() as cursor:
+        # 只有按作者名筛选时才需要关联 users 表
+        join_clause = "LEFT JOIN users u ON a.author_id = u.id" if 'u.' in where_clause else ""
+        cursor.execute(f"""
+            SELECT COUNT(*)
+            FROM blog_articles a
+            {join_clause}
+            {where_clause}
+        """, params)
+        total = cursor.fetchone()[0]
+
+    cache.set(cache_key, total, COUNT_CACHE_TIMEOUT)
+    return total
+
+
+def invalidate_article_count():
+    """文章增删后调用，使总数缓存失效"""
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, 2, None)
@@ -0,0 +1,64 @@
+"""
+文章摘要回填管理命令
+为已有文章生成 excerpt / word_count / cover_url（新增摘要列之前发布的文章这些列为空），
+按 id 分批处理，可重复执行
+
+使用方法：
+python manage.py backfill_article_summaries          # 只处理 excerpt 为空的文章
+python manage.py backfill_article_summaries --all    # 全部重新生成（摘要规则调整后使用）
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+from common.article_summary import build_article_summary
+
+
+class Command(BaseCommand):
+    help = '为已有文章回填列表摘要、字数和封面'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='重新生成全部文章的摘要（默认只处理摘要为空的文章）'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='每批处理的文章数（默认100）'
+        )
+
+    def handle(self, *args, **options):
+        regenerate_all = options['all']
+        batch_size = max(options['batch_size'], 1)
+        only_missing = "" if regenerate_all else "AND excerpt IS NULL"
+
+        last_id = 0
+        updated = 0
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT id, content FROM blog_articles
+                    WHERE id > %s {only_missing}
+                    ORDER BY id
+                    LIMIT %s
+                """, [last_id, batch_size])
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                params = []
+                for article_id, content in rows:
+                    summary = build_article_summary(content)
+                    params.append([summary['excerpt'], summary['word_count'], summary['cover_url'], article_id])
+                cursor.executemany("""
+                    UPDATE blog_articles
+                    SET excerpt = %s, word_count = %s, cover_url = %s
+                    WHERE id = %s
+                """, params)
+
+            updated += len(rows)
+            last_id = rows[-1][0]
+            self.stdout.write(f'已处理 {updated} 篇（最后 ID: {last_id}）')
+
+        self.stdout.write(self.style.SUCCESS(f'回填完成，共处理 {updated} 篇文章'))
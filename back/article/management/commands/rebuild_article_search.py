@@ -0,0 +1,61 @@
+"""
+文章搜索索引重建管理命令
+为已有文章写入 article_search 正文索引行（新增搜索表之前发布的文章没有索引），
+按 id 分批处理，可重复执行
+
+使用方法：
+python manage.py rebuild_article_search          # 只处理还没有索引的文章
+python manage.py rebuild_article_search --all    # 全部重建（纯文本提取规则调整后使用）
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+from common.article_search import build_search_text
+
+
+class Command(BaseCommand):
+    help = '为已有文章建立正文全文搜索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='重建全部文章的索引（默认只处理没有索引的文章）'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='每批处理的文章数（默认100）'
+        )
+
+    def handle(self, *args, **options):
+        rebuild_all = options['all']
+        batch_size = max(options['batch_size'], 1)
+        only_missing = "" if rebuild_all else "AND NOT EXISTS (SELECT 1 FROM article_search s WHERE s.article_id = a.id)"
+
+        last_id = 0
+        indexed = 0
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT a.id, a.content FROM blog_articles a
+                    WHERE a.id > %s {only_missing}
+                    ORDER BY a.id
+                    LIMIT %s
+                """, [last_id, batch_size])
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                params = [[article_id, build_search_text(content)] for article_id, content in rows]
+                cursor.executemany("""
+                    INSERT INTO article_search (article_id, body_text, updated_at)
+                    VALUES (%s, %s, NOW())
+                    ON DUPLICATE KEY UPDATE body_text = VALUES(body_text), updated_at = NOW()
+                """, params)
+
+            indexed += len(rows)
+            last_id = rows[-1][0]
+            self.stdout.write(f'已处理 {indexed} 篇（最后 ID: {last_id}）')
+
+        self.stdout.write(self.style.SUCCESS(f'索引完成，共处理 {indexed} 篇文章'))
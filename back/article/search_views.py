@@ -0,0 +1,102 @@
+from django.http import JsonResponse
+from django.db import connection
+from django.views.decorators.http import require_GET
+from common.article_search import search_articles
+
+# 每页结果数上限
+SEARCH_PAGE_MAX_SIZE = 50
+# 搜索词最大长度
+SEARCH_QUERY_MAX_LENGTH = 100
+
+
+@require_GET
+def search(request):
+    """
+    搜索文章标题和正文
+    ?q=关键词&page=1&page_size=10，多个关键词用空格分隔（须全部命中）
+    结果按相关度排序，title_html / snippet_html 为转义后用 <mark> 标出关键词的 HTML
+    mode 为 fulltext（全文索引）或 like（关键词过短时的回退）
+    """
+    try:
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return JsonResponse({
+                'success': False,
+                'error': '搜索关键词不能为空'
+            }, status=400)
+        if len(query) > SEARCH_QUERY_MAX_LENGTH:
+            return JsonResponse({
+                'success': False,
+                'error': f'搜索关键词不能超过{SEARCH_QUERY_MAX_LENGTH}个字符'
+            }, status=400)
+
+        try:
+            page = int(request.GET.get('page', 1))
+            page_size = int(request.GET.get('page_size', 10))
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'error': '分页参数无效'
+            }, status=400)
+        page = max(page, 1)
+        page_size = min(max(page_size, 1), SEARCH_PAGE_MAX_SIZE)
+
+        found = search_articles(query, limit=page_size, offset=(page - 1) * page_size)
+
+        # 补充作者和统计信息
+        article_ids = [item['article_id'] for item in found['results']]
+        details = {}
+        if article_ids:
+            placeholders = ', '.join(['%s'] * len(article_ids))
+            with connection.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT a.id, a.author_id, u.username, u.avatar,
+                           a.view_count, a.love_count, a.comment_count, a.published_at, a.cover_url
+                    FROM blog_articles a
+                    LEFT JOIN users u ON a.author_id = u.id
+                    WHERE a.id IN ({placeholders})
+                """, article_ids)
+                for row in cursor.fetchall():
+                    details[row[0]] = {
+                        'author_id': row[1],
+                        'author_name': row[2] if row[2] else '未知用户',
+                        'author_avatar': row[3] if row[3] else None,
+                        'view_count': row[4],
+                        'love_count': row[5],
+                        'comment_count': row[6],
+                        'published_at': row[7].isoformat() if row[7] else None,
+                        'cover_url': row[8],
+                    }
+
+        results = []
+        for item in found['results']:
+            detail = details.get(item['article_id'])
+            if detail is None:
+                continue  # 搜索与补充信息两次查询之间文章被删除的极短窗口
+            results.append({
+                'id': item['article_id'],
+                'score': item['score'],
+                'title_html': item['title_html'],
+                'snippet_html': item['snippet_html'],
+                **detail,
+            })
+
+        total = found['total']
+        return JsonResponse({
+            'success': True,
+            'data': {
+                'results': results,
+                'terms': found['terms'],
+                'mode': found['mode'],
+                'total': total,
+                'page': page,
+                'page_size': page_size,
+                'total_pages': (total + page_size - 1) // page_size  # 向上取整
+            }
+        })
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'搜索失败: {str(e)}'
+        }, status=500)
@@ -0,0 +1,177 @@
+"""
+文章浏览量写缓冲
+详情页不再每次同步执行 UPDATE view_count + 1：
+- 浏览在本进程内累加到待写入计数，后台线程每隔 FLUSH_INTERVAL_SECONDS 用一条多行 UPDATE 批量落库
+- 同一用户（未登录按IP）在 DEDUP_WINDOW_SECONDS 内重复打开同一篇文章只计一次；
+  去重记录放在本进程内有上限的 LRU 中（每位访客每篇文章一条，不写共享缓存，避免挤掉详情、计数等缓存），
+  多个工作进程之间不共享，同一访客的重复浏览落到另一个进程时会多计一次
+- 返回给前端的浏览量 = 已落库值 + 本进程待写入值；已落库值保存在共享缓存的计数里，
+  落库时对计数做 incr，不需要让文章详情缓存失效（详情缓存中不含浏览量）
+"""
+import atexit
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+
+from common.captcha_utils import LoginLimitUtils
+
+
+# 批量落库间隔（秒）
+FLUSH_INTERVAL_SECONDS = 10
+# 去重窗口（秒）：窗口内同一访客重复浏览不计数
+DEDUP_WINDOW_SECONDS = 30 * 60
+# 去重记录最多保留的条数，超过时淘汰最早记录（最先过期）的条目
+DEDUP_MAX_ENTRIES = 100000
+# 单条 UPDATE 最多更新的文章数
+FLUSH_BATCH_SIZE = 500
+# 共享缓存中已落库浏览量的有效期（秒）：计数未命中时与落库并发导致的少计最多持续这么久
+VIEW_COUNT_CACHE_TIMEOUT = 5 * 60
+
+_pending = {}  # {article_id: 待写入的浏览次数}
+_lock = threading.Lock()
+_recent_views = OrderedDict()  # {(article_id, 访客标识): 去重窗口结束时间}
+
+
+def _count_key(article_id):
+    return f'article_view_count:{article_id}'
+
+
+def _viewer_identity(request):
+    """访客标识：已登录用用户ID，否则用IP"""
+    user_id = getattr(request, 'user_id', None)
+    if user_id:
+        return f'u{user_id}'
+    return f'ip{LoginLimitUtils.get_client_ip(request) or "unknown"}'
+
+
+def record_view(request, article_id):
+    """
+    记录一次浏览
+    去重窗口内的重复浏览返回 False，否则累加到待写入计数并返回 True
+    """
+    dedup_key = (article_id, _viewer_identity(request))
+    now = time.monotonic()
+    with _lock:
+        expires_at = _recent_views.get(dedup_key)
+        if expires_at is not None and expires_at > now:
+            return False
+        _recent_views[dedup_key] = now + DEDUP_WINDOW_SECONDS
+        _recent_views.move_to_end(dedup_key)
+        while len(_recent_views) > DEDUP_MAX_ENTRIES:
+            _recent_views.popitem(last=False)
+        _pending[article_id] = _pending.get(article_id, 0) + 1
+    return True
+
+
+def get_pending_views(article_id):
+    """读取本进程尚未落库的浏览次数"""
+    with _lock:
+        return _pending.get(article_id, 0)
+
+
+def prime_view_count(article_id, view_count):
+    """用数据库中的已落库值初始化共享计数（计数已存在时不覆盖）"""
+    cache.add(_count_key(article_id), view_count, VIEW_COUNT_CACHE_TIMEOUT)
+
+
+def get_view_count(article_id):
+    """
+    返回给前端的浏览量：共享计数中的已落库值 + 本进程待写入值
+    计数未命中时查库并写回
+    """
+    flushed = cache.get(_count_key(article_id))
+    if flushed is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT view_count FROM blog_articles WHERE id = %s", [article_id])
+            row = cursor.fetchone()
+        flushed = row[0] if row else 0
+        prime_view_count(article_id, flushed)
+    return flushed + get_pending_views(article_id)
+
+
+def _advance_view_counts(chunk):
+    """落库成功后把增量累加到共享计数；计数不存在时跳过，下次读取时查库"""
+    for article_id, count in chunk:
+        try:
+            cache.incr(_count_key(article_id), count)
+        except ValueError:
+            pass
+
+
+def flush():
+    """
+    把待写入计数批量落库，返回本次落库的文章数
+    落库失败时把计数合并回待写入，下个周期重试
+    """
+    with _lock:
+        if not _pending:
+            return 0
+        batch = dict(_pending)
+        _pending.clear()
+
+    items = list(batch.items())
+    flushed_ids = []
+    try:
+        with connection.cursor() as cursor:
+            for start in range(0, len(items), FLUSH_BATCH_SIZE):
+                chunk = items[start:start + FLUSH_BATCH_SIZE]
+                case_clause = ' '.join(['WHEN %s THEN %s'] * len(chunk))
+                placeholders = ', '.join(['%s'] * len(chunk))
+                params = [value for item in chunk for value in item]
+                params.extend(article_id for article_id, _ in chunk)
+                cursor.execute(f"""
+                    UPDATE blog_articles
+                    SET view_count = view_count + CASE id {case_clause} ELSE 0 END
+                    WHERE id IN ({placeholders})
+                """, params)
+                flushed_ids.extend(article_id for article_id, _ in chunk)
+                _advance_view_counts(chunk)
+    except Exception:
+        # 未落库的部分合并回待写入计数
+        with _lock:
+            for article_id, count in items:
+                if article_id not in flushed_ids:
+                    _pending[article_id] = _pending.get(article_id, 0) + count
+        raise
+    return len(flushed_ids)
+
+
+# 后台落库任务：定期把浏览量批量写入数据库
+# uwsgi 下需要 enable-threads（见 depend_manage/uwsgi.ini），否则线程只在有请求执行时才会运行
+class _ViewCountFlusher:
+    _started = False
+    _interval_seconds = FLUSH_INTERVAL_SECONDS
+
+    @classmethod
+    def start(cls):
+        if cls._started:
+            return
+        cls._started = True
+
+        def _loop():
+            while True:
+                time.sleep(cls._interval_seconds)
+                try:
+                    # 长期运行的线程需要自行回收失效的数据库连接
+                    close_old_connections()
+                    flush()
+                except Exception:
+                    pass
+
+        t = threading.Thread(target=_loop, name="ViewCountFlusher", daemon=True)
+        t.start()
+
+
+def _flush_on_exit():
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+# 在模块加载时启动后台落库任务，进程退出前再落库一次
+_ViewCountFlusher.start()
+atexit.register(_flush_on_exit)
@@ -1,5 +1,6 @@
 import json
 import time
+from datetime import datetime
 from django.http import JsonResponse
 from django.db import connection
 from django.views.decorators.http import require_GET, require_POST
@@ -8,6 +9,13 @@ from django.core.cache import cache
 from common.jwt_utils import jwt_required
 from common.captcha_utils import CaptchaUtils, LoginLimitUtils
 from common.article_content_sanitize import sanitize_article_content_embeds
+from common.article_summary import build_article_summary
+from common.article_search import author_filter, title_filter, index_article
+from common.pagination import encode_cursor, decode_cursor
+from common.user_relation_utils import get_liked_article_ids
+from .list_count_cache import get_article_count, invalidate_article_count
+from . import view_counter
+from .detail_cache import get_or_load_article_detail, invalidate_article_detail
 
 
 @require_GET
@@ -15,17 +23,26 @@ def get_all_articles(request):
     """
     获取文章列表（支持分页、筛选和排序）
     返回分页后的文章信息
+    两种分页模式：
+    - 页码模式（默认）：?page=1&page_size=3，返回 total/total_pages
+    - 游标模式：?mode=cursor 或带 cursor 参数，按 (排序字段, id) 取下一页，返回 next_cursor/has_more，
+      不做 OFFSET 扫描；需要总数时传 include_total=true（总数带缓存）
     """
     try:
         # 获取分页参数
         page = int(request.GET.get('page', 1))  # 当前页码，默认第1页
         page_size = int(request.GET.get('page_size', 3))  # 每页数量，默认3条
+        cursor_param = request.GET.get('cursor', '').strip()
+        cursor_mode = bool(cursor_param) or request.GET.get('mode', '') == 'cursor'
+        include_total = request.GET.get('include_total', '').lower() == 'true'
         
         # 确保页码和每页数量有效
         if page < 1:
             page = 1
         if page_size < 1:
             page_size = 3
+        if page_size > 100:
+            page_size = 100
         
         # 获取筛选参数
         author_id = request.GET.get('author_id', '').strip()
@@ -59,13 +76,18 @@ def get_all_articles(request):
             except ValueError:
                 pass  # 如果 author_id 不是有效整数，忽略
         
+        # 作者名、标题筛选优先走全文索引（见 common.article_search）
         if author_name:
-            where_conditions.append("u.username LIKE %s")
-            params.append(f'%{author_name}%')
+            condition, condition_params = author_filter(author_name)
+            if condition:
+                where_conditions.append(condition)
+                params.extend(condition_params)
         
         if title:
-            where_conditions.append("a.title LIKE %s")
-            params.append(f'%{title}%')
+            condition, condition_params = title_filter(title)
+            if condition:
+                where_conditions.append(condition)
+                params.extend(condition_params)
         
         if start_date:
             where_conditions.append("DATE(a.published_at) >= %s")
@@ -75,58 +97,99 @@ def get_all_articles(request):
             where_conditions.append("DATE(a.published_at) <= %s")
             params.append(end_date)
         
-        # 构建 WHERE 子句
+        # 构建 WHERE 子句（仅筛选条件，用于总数统计）
         where_clause = ""
         if where_conditions:
             where_clause = "WHERE " + " AND ".join(where_conditions)
         
-        # 构建 ORDER BY 子句
-        order_clause = f"ORDER BY a.{sort_by} {sort_order.upper()}"
+        # 构建 ORDER BY 子句（以 id 作为同值时的次序，保证分页稳定）
+        order_clause = f"ORDER BY a.{sort_by} {sort_order.upper()}, a.id {sort_order.upper()}"
         
-        # 计算偏移量
-        offset = (page - 1) * page_size
+        # 游标模式：从上一页最后一条之后继续取
+        page_conditions = list(where_conditions)
+        page_params = list(params)
+        if cursor_param:
+            try:
+                cursor_values = decode_cursor(
+                    cursor_param,
+                    required_keys=('sort_by', 'sort_order', 'value', 'id'),
+                    key_types={'value': (int, str, datetime), 'id': int},
+                )
+            except ValueError as e:
+                return JsonResponse({
+                    'success': False,
+                    'error': str(e)
+                }, status=400)
+            if cursor_values['sort_by'] != sort_by or cursor_values['sort_order'] != sort_order:
+                return JsonResponse({
+                    'success': False,
+                    'error': '游标与当前排序方式不一致'
+                }, status=400)
+            comparator = '<' if sort_order == 'desc' else '>'
+            page_conditions.append(
+                f"(a.{sort_by} {comparator} %s OR (a.{sort_by} = %s AND a.id {comparator} %s))"
+            )
+            page_params.extend([cursor_values['value'], cursor_values['value'], cursor_values['id']])
+        
+        page_where_clause = ""
+        if page_conditions:
+            page_where_clause = "WHERE " + " AND ".join(page_conditions)
+        
+        if cursor_mode:
+            # 多取一条用于判断是否还有下一页
+            limit_clause = "LIMIT %s"
+            page_params.append(page_size + 1)
+        else:
+            # 计算偏移量
+            offset = (page - 1) * page_size
+            limit_clause = "LIMIT %s OFFSET %s"
+            page_params.extend([page_size, offset])
+        
+        # 页码模式总是需要总数；游标模式仅在显式请求时统计
+        total_count = None
+        if not cursor_mode or include_total:
+            total_count = get_article_count(where_clause, params)
         
         with connection.cursor() as cursor:
-            # 先查询总记录数
-            count_sql = f"""
-                SELECT COUNT(*) 
-                FROM blog_articles a
-                LEFT JOIN users u ON a.author_id = u.id
-                {where_clause}
-            """
-            cursor.execute(count_sql, params)
-            total_count = cursor.fetchone()[0]
-            
             # 查询分页后的文章，并关联用户表获取作者用户名和头像
             query_sql = f"""
                 SELECT 
                     a.id,
                     a.title,
-                    a.content,
+                    COALESCE(a.excerpt, LEFT(a.content, 200)) as excerpt,
                     a.author_id,
                     u.username as author_name,
                     u.avatar as author_avatar,
                     a.view_count,
                     a.love_count,
                     a.comment_count,
-                    a.published_at
+                    a.published_at,
+                    a.word_count,
+                    a.cover_url
                 FROM blog_articles a
                 LEFT JOIN users u ON a.author_id = u.id
-                {where_clause}
+                {page_where_clause}
                 {order_clause}
-                LIMIT %s OFFSET %s
+                {limit_clause}
             """
-            query_params = params + [page_size, offset]
-            cursor.execute(query_sql, query_params)
+            cursor.execute(query_sql, page_params)
             
             rows = cursor.fetchall()
             
+            has_more = False
+            if cursor_mode:
+                has_more = len(rows) > page_size
+                rows = rows[:page_size]
+            
             articles = []
             for row in rows:
                 article = {
                     'id': row[0],
                     'title': row[1],
-                    'content': row[2],
+                    'excerpt': row[2] or '',
+                    'content': row[2] or '',  # 兼容旧前端：列表中 content 即摘要，完整正文请调用详情接口
+                    'word_count': row[10] or 0,
+                    'cover_url': row[11],
                     'author_id': row[3],
                     'author_name': row[4] if row[4] else '未知用户',
                     'author_avatar': row[5] if row[5] else None,
@@ -137,6 +200,38 @@ def get_all_articles(request):
                 }
                 articles.append(article)
             
+            # 登录用户直接带上是否已喜欢，列表页不必逐篇查询喜欢状态
+            liked_ids = get_liked_article_ids(getattr(request, 'user_id', None), [a['id'] for a in articles])
+            for article in articles:
+                article['liked_by_me'] = article['id'] in liked_ids
+            
+            if cursor_mode:
+                next_cursor = None
+                if has_more and rows:
+                    sort_column_index = {
+                        'published_at': 9,
+                        'view_count': 6,
+                        'love_count': 7,
+                        'comment_count': 8,
+                    }[sort_by]
+                    next_cursor = encode_cursor({
+                        'sort_by': sort_by,
+                        'sort_order': sort_order,
+                        'value': rows[-1][sort_column_index],
+                        'id': rows[-1][0],
+                    })
+                return JsonResponse({
+                    'success': True,
+                    'message': '获取文章列表成功',
+                    'data': {
+                        'articles': articles,
+                        'page_size': page_size,
+                        'next_cursor': next_cursor,
+                        'has_more': has_more,
+                        'total': total_count
+                    }
+                })
+            
             return JsonResponse({
                 'success': True,
                 'message': '获取文章列表成功',
@@ -163,69 +258,76 @@ def get_all_articles(request):
         }, status=500)
 
 
+def load_article_detail(article_id):
+    """
+    从数据库加载文章详情（详情缓存未命中时调用）
+    文章不存在时返回 None；浏览量不放进详情，只用来初始化浏览量计数
+    """
+    with connection.cursor() as cursor:
+        # 查询文章详情，并关联用户表获取作者信息
+        cursor.execute("""
+            SELECT 
+                a.id,
+                a.title,
+                a.content,
+                a.author_id,
+                u.username as author_name,
+                u.avatar as author_avatar,
+                a.view_count,
+                a.love_count,
+                a.comment_count,
+                a.published_at
+            FROM blog_articles a
+            LEFT JOIN users u ON a.author_id = u.id
+            WHERE a.id = %s
+        """, [article_id])
+        
+        row = cursor.fetchone()
+    
+    if not row:
+        return None
+    
+    view_counter.prime_view_count(row[0], row[6])
+    return {
+        'id': row[0],
+        'title': row[1],
+        'content': row[2],
+        'author_id': row[3],
+        'author_name': row[4] if row[4] else '未知用户',
+        'author_avatar': row[5] if row[5] else None,
+        'love_count': row[7],
+        'comment_count': row[8],
+        'published_at': row[9].isoformat() if row[9] else None
+    }
+
+
 @require_GET
 def get_article_detail(request, article_id):
     """
     获取文章详情
     根据文章ID返回文章的完整信息
+    详情经读穿缓存读取，多数请求不访问数据库；
+    浏览量先记入写缓冲（去重窗口内重复浏览不计），由后台线程批量落库
     """
     try:
-        with connection.cursor() as cursor:
-
-            # 增加浏览量
-            cursor.execute("""
-                UPDATE blog_articles 
-                SET view_count = view_count + 1 
-                WHERE id = %s
-            """, [article_id])
-
-            # 查询文章详情，并关联用户表获取作者信息
-            cursor.execute("""
-                SELECT 
-                    a.id,
-                    a.title,
-                    a.content,
-                    a.author_id,
-                    u.username as author_name,
-                    u.avatar as author_avatar,
-                    a.view_count,
-                    a.love_count,
-                    a.comment_count,
-                    a.published_at
-                FROM blog_articles a
-                LEFT JOIN users u ON a.author_id = u.id
-                WHERE a.id = %s
-            """, [article_id])
-            
-            row = cursor.fetchone()
-            
-            if not row:
-                return JsonResponse({
-                    'success': False,
-                    'error': '文章不存在',
-                    'data': None
-                }, status=404)
-            
-            article = {
-                'id': row[0],
-                'title': row[1],
-                'content': row[2],
-                'author_id': row[3],
-                'author_name': row[4] if row[4] else '未知用户',
-                'author_avatar': row[5] if row[5] else None,
-                'view_count': row[6],
-                'love_count': row[7],
-                'comment_count': row[8],
-                'published_at': row[9].isoformat() if row[9] else None
-            }
-            
-
-            
+        article = get_or_load_article_detail(article_id, load_article_detail)
+        
+        if not article:
             return JsonResponse({
-                'success': True,
-                'message': '获取文章详情成功',
-                'data': article
-            })
+                'success': False,
+                'error': '文章不存在',
+                'data': None
+            }, status=404)
+        
+        # 记录本次浏览，浏览量取已落库计数与待写入值之和（不在详情缓存中）
+        view_counter.record_view(request, article_id)
+        article['view_count'] = view_counter.get_view_count(article_id)
+        
+        return JsonResponse({
+            'success': True,
+            'message': '获取文章详情成功',
+            'data': article
+        })
             
     except Exception as e:
         return JsonResponse({
@@ -355,15 +457,21 @@ def create_article(request):
         
         # Markdown 正文原样存储；对 [embed:html:...] 内联 HTML 用 bleach 做结构清洗（去 on*、危险协议、嵌套 iframe 等）
         content = sanitize_article_content_embeds(content)
+        # 生成列表页使用的摘要、字数和封面
+        summary = build_article_summary(content)
         
         # 写入数据库（触发器会自动更新用户的文章数）
         with connection.cursor() as cursor:
             cursor.execute("""
-                INSERT INTO blog_articles (title, content, author_id, view_count, love_count, comment_count, published_at)
-                VALUES (%s, %s, %s, 0, 0, 0, NOW())
-            """, [title, content, user_id])
+                INSERT INTO blog_articles (title, content, author_id, view_count, love_count, comment_count, published_at,
+                                           excerpt, word_count, cover_url)
+                VALUES (%s, %s, %s, 0, 0, 0, NOW(), %s, %s, %s)
+            """, [title, content, user_id, summary['excerpt'], summary['word_count'], summary['cover_url']])
             
             article_id = cursor.lastrowid
+            index_article(article_id, content, cursor)
+            invalidate_article_count()
+            invalidate_article_detail(article_id)
             
             return JsonResponse({
                 'success': True,
@@ -26,3 +26,12 @@ DATABASES = {
 # 验证生产环境必需的数据库密码是否已设置
 if not DATABASES['default']['PASSWORD']:
     raise ValueError("生产环境必须设置 DB_PASSWORD 环境变量")
+
+# 共享缓存：uwsgi 工作进程与 run_job_worker 共用，使用 Redis（add / incr 为原子操作）
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+        'TIMEOUT': 300,
+    }
+}
@@ -152,6 +152,18 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# 缓存配置
+# 开发环境使用进程内 LocMemCache（runserver 单进程即可）；
+# 生产环境在 set_prod.py 中改为 Redis：uwsgi 工作进程与 run_job_worker 后台任务进程必须共用同一个缓存，
+# 后台任务删除用户/目录后的缓存失效（文章详情、列表总数、目录大小、用户名与管理员标记的代数）要对网站进程生效，
+# 浏览量计数、详情重建锁等也依赖 Redis 原子的 add / incr
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'TIMEOUT': 300,
+    }
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
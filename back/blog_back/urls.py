@@ -23,8 +23,9 @@ from forgot.views import forgot
 from login.views import login
 from common.captcha_views import get_captcha, verify_captcha, get_captcha_image
 from common.auth_views import refresh_token, logout
+from common.job_views import get_job_status, cancel_job
 from common.views import (
-    get_user_info, get_user_by_id, toggle_follow, check_follow_status,
+    get_user_info, get_user_by_id, toggle_follow, check_follow_status, check_follow_status_batch,
     upload_avatar, update_profile, reset_password,
     get_user_following_list, get_user_followers_list,
     get_user_liked_articles_list, get_user_articles_list,
@@ -43,10 +44,13 @@ urlpatterns = [
     path('api/captcha/verify/', verify_captcha),
     path('api/auth/refresh/', refresh_token),
     path('api/auth/logout/', logout),
+    path('api/jobs/<int:job_id>/', get_job_status, name='get_job_status'),  # 后台任务状态
+    path('api/jobs/<int:job_id>/cancel/', cancel_job, name='cancel_job'),  # 取消后台任务
     path('api/user/info/', get_user_info),
     path('api/user/<int:user_id>/', get_user_by_id, name='get_user_by_id'),  # 根据ID获取用户信息
     path('api/user/<int:user_id>/follow/', toggle_follow, name='toggle_follow'),  # 关注/取消关注
     path('api/user/<int:user_id>/follow-status/', check_follow_status, name='check_follow_status'),  # 检查关注状态
+    path('api/user/follow-status/batch/', check_follow_status_batch, name='check_follow_status_batch'),  # 批量检查关注状态
     path('api/user/avatar/upload/', upload_avatar, name='upload_avatar'),  # 上传头像
     path('api/user/profile/', update_profile, name='update_profile'),  # 更新资料
     path('api/user/password/reset/', reset_password, name='reset_password'),  # 重设密码
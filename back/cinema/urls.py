@@ -5,6 +5,7 @@ from . import views
 urlpatterns = [
     path('get/token', views.get_token, name='cinema_get_token'),
     path('list/', views.cinema_list, name='cinema_list'),
+    path('file/<str:filename>/', views.cinema_file, name='cinema_file'),
     path('stream/status/', views.stream_status, name='cinema_stream_status'),
     path('admin/list/', views.admin_cinema_list, name='cinema_admin_list'),
     path('admin/upload/', views.admin_upload_cinema, name='cinema_admin_upload'),
@@ -11,10 +11,12 @@ from datetime import datetime
 from pathlib import Path
 
 from django.conf import settings
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_GET, require_POST, require_http_methods
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_POST, require_http_methods, require_safe
 
+from common.file_streaming import serve_file
 from history.views import admin_required
 
 from . import access_token
@@ -97,6 +99,7 @@ def _scan_cinema_files():
             'size_mb': round(stat.st_size / (1024 * 1024), 2),
             'modified_at': datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds'),
             'static_url': f'{settings.STATIC_URL}cinema/{path.name}',
+            'stream_url': reverse('cinema_file', args=[path.name]),
         })
     return items
 
@@ -310,6 +313,18 @@ def cinema_list(request):
     })
 
 
+@require_safe
+def cinema_file(request, filename):
+    """播放/下载影片文件，支持 Range 拖动进度与条件请求"""
+    path = _cinema_file_path(filename)
+    if not path or not path.is_file():
+        raise Http404()
+    try:
+        return serve_file(request, path, as_attachment=False)
+    except OSError:
+        raise Http404()
+
+
 @require_GET
 def stream_status(request):
     state, pid, running = _get_stream_status()
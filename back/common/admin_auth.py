@@ -0,0 +1,102 @@
+"""
+管理员权限校验
+admin_required 装饰器在 JWT 认证之后检查 users.is_admin，管理员标记在进程内按用户缓存 CACHE_TTL_SECONDS 秒，
+后台管理页面连续调用多个接口时不再每次查库。
+切换管理员状态、删除用户时调用 invalidate_admin_flag：提升共享缓存中的代数（见 common.cache_generation），
+各网站工作进程和后台任务进程在下一次读取时清空自己的缓存。
+"""
+import threading
+import time
+from functools import wraps
+
+from django.db import connection
+from django.http import JsonResponse
+
+from common.cache_generation import get_generation, bump_generation
+from common.jwt_utils import jwt_required
+
+
+# 缓存有效期（秒）：兜底过期，直接修改数据库等未调用失效函数的变化最多延迟这么久生效
+CACHE_TTL_SECONDS = 30
+# 缓存条目上限，超过后整体清空，避免无限增长
+CACHE_MAX_ENTRIES = 10000
+
+# 共享缓存中的代数键
+GENERATION_KEY = 'admin_auth:generation'
+
+_cache = {}  # {user_id: (is_admin, expires_at)}
+_cache_generation = [None]  # 本进程缓存所对应的代数
+_lock = threading.Lock()
+
+
+def _sync_generation(generation):
+    """代数变化时清空本进程缓存（调用方持有 _lock）"""
+    if _cache_generation[0] != generation:
+        _cache.clear()
+        _cache_generation[0] = generation
+
+
+def is_admin(user_id):
+    """判断用户是否为管理员（不存在的用户视为非管理员）"""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return False
+
+    now = time.monotonic()
+    generation = get_generation(GENERATION_KEY)
+    with _lock:
+        _sync_generation(generation)
+        cached = _cache.get(user_id)
+        if cached and cached[1] > now:
+            return cached[0]
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT is_admin FROM users WHERE id = %s", [user_id])
+        row = cursor.fetchone()
+    admin = bool(row and row[0])
+
+    with _lock:
+        # 查库期间代数已变化（其他进程刚失效过）时不写入，避免缓存旧状态
+        if _cache_generation[0] == generation:
+            if len(_cache) >= CACHE_MAX_ENTRIES:
+                _cache.clear()
+            _cache[user_id] = (admin, now + CACHE_TTL_SECONDS)
+    return admin
+
+
+def invalidate_admin_flag(user_id=None):
+    """
+    使某个用户（不传则全部）的管理员标记缓存失效
+    本进程立即删除对应条目；提升代数使其他进程的缓存整体失效（管理员变更很少，整体清空代价可以忽略）
+    """
+    bump_generation(GENERATION_KEY)
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            try:
+                _cache.pop(int(user_id), None)
+            except (TypeError, ValueError):
+                pass
+
+
+def admin_required(view_func):
+    """
+    管理员权限装饰器
+    需要先通过JWT认证，然后检查用户是否为管理员
+    """
+    @wraps(view_func)
+    @jwt_required
+    def _wrapped_view(request, *args, **kwargs):
+        # jwt_required 已经设置了 request.user_id
+        if not is_admin(request.user_id):
+            return JsonResponse({
+                'success': False,
+                'error': '需要管理员权限',
+                'code': 'ADMIN_REQUIRED'
+            }, status=403)
+        
+        return view_func(request, *args, **kwargs)
+    
+    return _wrapped_view
@@ -1,10 +1,17 @@
 """
 对文章 Markdown 中的 [embed:html:base64|...] 片段内联 HTML 做服务端清洗。
 保留游戏常用的 script/style/canvas 等标签，使用 bleach 剥离 on* 事件、javascript:/data: 等危险属性与嵌套 iframe。
+编辑文章时调用方传入库中已清洗的正文（stored_content），原样出现在其中的嵌入片段直接跳过，
+这一判断不依赖缓存，在任何工作进程中都成立。
+另外清洗结果按 payload 的 SHA-256 缓存在进程内（LRU，按条数和总字节数限制），只作为优化：
+同一片段再次提交时直接复用结果；清洗后的 payload 本身也记为已清洗。
 """
 import base64
+import hashlib
 import re
-from typing import Callable, Match
+import threading
+from collections import OrderedDict
+from typing import Callable, Match, Optional
 
 import bleach
 from bleach.css_sanitizer import CSSSanitizer
@@ -126,6 +133,15 @@ _EMBED_PROTOCOLS = ["http", "https"]
 
 _css_sanitizer = CSSSanitizer()
 
+# 清洗结果缓存的最大条数和最大总字节数（按清洗后的 base64 长度计）
+EMBED_CACHE_MAX_ENTRIES = 512
+EMBED_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# payload 的 SHA-256 -> 清洗后的 base64
+_embed_cache = OrderedDict()
+_embed_cache_bytes = 0
+_embed_cache_lock = threading.Lock()
+
 
 def _decode_embed_payload(b64_payload: str) -> str:
     raw = b64_payload.strip()
@@ -153,17 +169,73 @@ def sanitize_embed_html_fragment(html_fragment: str) -> str:
     )
 
 
-def sanitize_article_content_embeds(content: str) -> str:
+def _payload_key(b64_payload: str) -> str:
+    return hashlib.sha256(b64_payload.strip().encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> Optional[str]:
+    with _embed_cache_lock:
+        cached = _embed_cache.get(key)
+        if cached is not None:
+            _embed_cache.move_to_end(key)
+        return cached
+
+
+def _cache_put(key: str, cleaned_b64: str) -> None:
+    global _embed_cache_bytes
+    size = len(cleaned_b64)
+    if size > EMBED_CACHE_MAX_BYTES:
+        return
+    with _embed_cache_lock:
+        previous = _embed_cache.pop(key, None)
+        if previous is not None:
+            _embed_cache_bytes -= len(previous)
+        _embed_cache[key] = cleaned_b64
+        _embed_cache_bytes += size
+        while len(_embed_cache) > EMBED_CACHE_MAX_ENTRIES or _embed_cache_bytes > EMBED_CACHE_MAX_BYTES:
+            _, evicted = _embed_cache.popitem(last=False)
+            _embed_cache_bytes -= len(evicted)
+
+
+def clear_embed_cache() -> None:
+    """清空清洗结果缓存（基准测试或调整清洗规则后使用）"""
+    global _embed_cache_bytes
+    with _embed_cache_lock:
+        _embed_cache.clear()
+        _embed_cache_bytes = 0
+
+
+def sanitize_embed_payload(b64_payload: str) -> str:
+    """
+    清洗一个 base64 编码的嵌入片段，返回清洗后的 base64（命中缓存时不解码）。
+    清洗结果同时以自身哈希登记：它就是上次入库的内容，原样提交回来时不必再清洗。
+    """
+    key = _payload_key(b64_payload)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+    cleaned_b64 = _encode_embed_payload(sanitize_embed_html_fragment(_decode_embed_payload(b64_payload)))
+    _cache_put(key, cleaned_b64)
+    _cache_put(_payload_key(cleaned_b64), cleaned_b64)
+    return cleaned_b64
+
+
+def sanitize_article_content_embeds(content: str, stored_content: Optional[str] = None) -> str:
     """
     遍历正文中的 [embed:html:...] 块，将其中的 base64 解码后清洗再写回。
+    stored_content 为库中已清洗的正文（编辑文章时传入），其中原样出现过的片段不再清洗。
     """
+    stored_payloads = (
+        {m.group(1).strip() for m in EMBED_HTML_PATTERN.finditer(stored_content)}
+        if stored_content else set()
+    )
 
     def _repl(m: Match[str]) -> str:
         b64_inner, width, height = m.group(1), m.group(2), m.group(3)
+        if b64_inner.strip() in stored_payloads:
+            return m.group(0)
         try:
-            decoded = _decode_embed_payload(b64_inner)
-            cleaned = sanitize_embed_html_fragment(decoded)
-            new_b64 = _encode_embed_payload(cleaned)
+            new_b64 = sanitize_embed_payload(b64_inner)
             return f"[embed:html:{new_b64}|width:{width}|height:{height}]"
         except Exception:
             return m.group(0)
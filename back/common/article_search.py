@@ -0,0 +1,232 @@
+"""
+文章全文搜索
+blog_articles.title、users.username 上直接建立 ngram 全文索引，标题/作者筛选不依赖额外的索引表，不会与文章数据不一致；
+article_search 表只保存每篇文章的纯文本正文（去掉嵌入片段和 Markdown/HTML 标记），body_text 上建立 ngram 全文索引，只用于正文搜索：
+- 搜索接口要求每个关键词出现在标题或正文中，按相关度排序（标题命中加权），返回带 <mark> 高亮的标题和正文片段；
+  还没有正文索引行的文章仍能按标题搜到
+- 文章列表、后台文章列表的标题/作者筛选走全文索引，不再 LIKE '%x%' 全表扫描
+- 关键词中有短于 NGRAM_TOKEN_SIZE 的词时全文索引无法命中，回退为 LIKE
+发布、后台新建/修改文章时调用 index_article；文章删除时由外键级联删除索引行。
+已有文章执行 python manage.py rebuild_article_search 建立正文索引。
+"""
+import html
+import re
+
+from django.db import connection
+
+from common.article_summary import to_plain_text
+
+
+# 与 MySQL 的 ngram_token_size 一致（默认 2，服务器只读参数）
+NGRAM_TOKEN_SIZE = 2
+# 索引的正文最大字符数（超长文章只索引开头部分）
+MAX_BODY_CHARS = 100000
+# 最多使用的关键词数
+MAX_TERMS = 8
+# 标题命中的相关度权重
+TITLE_WEIGHT = 3
+# 正文片段长度（字符数）及命中位置之前保留的字符数
+SNIPPET_LENGTH = 120
+SNIPPET_LEADING = 30
+
+# 布尔模式中有特殊含义的字符，关键词中一律去掉
+_BOOLEAN_OPERATORS = re.compile(r'[+\-<>()~*"@]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def build_search_text(content):
+    """把正文转换为索引用的纯文本"""
+    return to_plain_text(content)[:MAX_BODY_CHARS]
+
+
+def index_article(article_id, content, cursor=None):
+    """写入或更新一篇文章的正文搜索索引"""
+    sql = """
+        INSERT INTO article_search (article_id, body_text, updated_at)
+        VALUES (%s, %s, NOW())
+        ON DUPLICATE KEY UPDATE body_text = VALUES(body_text), updated_at = NOW()
+    """
+    params = [article_id, build_search_text(content)]
+    if cursor is not None:
+        cursor.execute(sql, params)
+        return
+    with connection.cursor() as own_cursor:
+        own_cursor.execute(sql, params)
+
+
+def split_terms(query):
+    """把搜索词拆成关键词（去掉布尔运算符，去重并保持顺序）"""
+    terms = []
+    for term in _WHITESPACE.split(_BOOLEAN_OPERATORS.sub(' ', query or '')):
+        term = term.strip()
+        if term and term.lower() not in [t.lower() for t in terms]:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def use_fulltext(terms):
+    """所有关键词都不短于 ngram 长度时才能使用全文索引"""
+    return bool(terms) and all(len(term) >= NGRAM_TOKEN_SIZE for term in terms)
+
+
+def boolean_query(terms):
+    """生成布尔模式查询：每个关键词作为短语且必须出现（ngram 短语匹配等价于子串匹配）"""
+    return ' '.join(f'+"{term}"' for term in terms)
+
+
+def ranking_query(terms):
+    """生成计算相关度用的布尔模式查询：命中任一关键词即计分"""
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def title_filter(query, article_alias='a'):
+    """
+    文章列表按标题筛选的条件，返回 (sql, params)，没有有效关键词时返回 (None, [])
+    直接匹配 blog_articles.title 上的全文索引
+    """
+    terms = split_terms(query)
+    if not terms:
+        return None, []
+    if use_fulltext(terms):
+        return (
+            f"MATCH({article_alias}.title) AGAINST (%s IN BOOLEAN MODE)",
+            [boolean_query(terms)],
+        )
+    return (
+        ' AND '.join([f"{article_alias}.title LIKE %s"] * len(terms)),
+        [f'%{_escape_like(term)}%' for term in terms],
+    )
+
+
+def author_filter(query, article_alias='a', user_alias='u'):
+    """
+    文章列表按作者名筛选的条件，返回 (sql, params)，没有有效关键词时返回 (None, [])
+    全文索引方式不需要关联 users 表；LIKE 回退需要调用方关联 users（别名 user_alias）
+    """
+    terms = split_terms(query)
+    if not terms:
+        return None, []
+    if use_fulltext(terms):
+        return (
+            f"{article_alias}.author_id IN (SELECT id FROM users "
+            f"WHERE MATCH(username) AGAINST (%s IN BOOLEAN MODE))",
+            [boolean_query(terms)],
+        )
+    return (
+        ' AND '.join([f"{user_alias}.username LIKE %s"] * len(terms)),
+        [f'%{_escape_like(term)}%' for term in terms],
+    )
+
+
+def _term_pattern(terms):
+    return re.compile('|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+
+
+def highlight(text, terms):
+    """HTML 转义后用 <mark> 标出关键词"""
+    if not text:
+        return ''
+    if not terms:
+        return html.escape(text)
+    pattern = _term_pattern(terms)
+    parts = []
+    last = 0
+    for match in pattern.finditer(text):
+        parts.append(html.escape(text[last:match.start()]))
+        parts.append(f'<mark>{html.escape(match.group(0))}</mark>')
+        last = match.end()
+    parts.append(html.escape(text[last:]))
+    return ''.join(parts)
+
+
+def make_snippet(body_text, terms):
+    """截取第一个命中位置附近的正文片段并高亮，没有命中时取开头"""
+    if not body_text:
+        return ''
+    match = _term_pattern(terms).search(body_text) if terms else None
+    start = max((match.start() if match else 0) - SNIPPET_LEADING, 0)
+    end = min(start + SNIPPET_LENGTH, len(body_text))
+    snippet = highlight(body_text[start:end], terms)
+    return ('…' if start > 0 else '') + snippet + ('…' if end < len(body_text) else '')
+
+
+def _term_conditions(terms, fulltext):
+    """
+    搜索条件：每个关键词都须出现在标题或正文中，返回 (sql, params)
+    全文模式下标题走 blog_articles.title 的索引、正文走 article_search.body_text 的索引；
+    LIKE 回退需要关联 article_search（别名 s）
+    """
+    conditions = []
+    params = []
+    for term in terms:
+        if fulltext:
+            conditions.append(
+                "(a.id IN (SELECT id FROM blog_articles WHERE MATCH(title) AGAINST (%s IN BOOLEAN MODE))"
+                " OR a.id IN (SELECT article_id FROM article_search WHERE MATCH(body_text) AGAINST (%s IN BOOLEAN MODE)))"
+            )
+            phrase = boolean_query([term])
+            params.extend([phrase, phrase])
+        else:
+            conditions.append("(a.title LIKE %s OR s.body_text LIKE %s)")
+            pattern = f'%{_escape_like(term)}%'
+            params.extend([pattern, pattern])
+    return ' AND '.join(conditions), params
+
+
+def search_articles(query, limit=10, offset=0):
+    """
+    搜索文章标题和正文
+    返回 {'mode': 'fulltext' / 'like', 'terms', 'total', 'results': [{'article_id', 'score', 'title_html', 'snippet_html'}]}
+    全文模式按相关度（标题命中加权）排序；LIKE 回退按命中标题的关键词数、文章ID倒序排序
+    """
+    terms = split_terms(query)
+    if not terms:
+        return {'mode': 'fulltext', 'terms': [], 'total': 0, 'results': []}
+
+    fulltext = use_fulltext(terms)
+    mode = 'fulltext' if fulltext else 'like'
+    where_sql, where_params = _term_conditions(terms, fulltext)
+    with connection.cursor() as cursor:
+        if fulltext:
+            cursor.execute(f"SELECT COUNT(*) FROM blog_articles a WHERE {where_sql}", where_params)
+            total = cursor.fetchone()[0]
+            ranking = ranking_query(terms)
+            cursor.execute(f"""
+                SELECT a.id, a.title, s.body_text,
+                       MATCH(a.title) AGAINST (%s IN BOOLEAN MODE) * %s
+                       + COALESCE(MATCH(s.body_text) AGAINST (%s IN BOOLEAN MODE), 0) AS score
+                FROM blog_articles a
+                LEFT JOIN article_search s ON s.article_id = a.id
+                WHERE {where_sql}
+                ORDER BY score DESC, a.id DESC
+                LIMIT %s OFFSET %s
+            """, [ranking, TITLE_WEIGHT, ranking] + where_params + [limit, offset])
+        else:
+            cursor.execute(f"""
+                SELECT COUNT(*) FROM blog_articles a
+                LEFT JOIN article_search s ON s.article_id = a.id
+                WHERE {where_sql}
+            """, where_params)
+            total = cursor.fetchone()[0]
+            title_hit = ' + '.join(['(a.title LIKE %s)'] * len(terms))
+            cursor.execute(f"""
+                SELECT a.id, a.title, s.body_text, {title_hit} AS score
+                FROM blog_articles a
+                LEFT JOIN article_search s ON s.article_id = a.id
+                WHERE {where_sql}
+                ORDER BY score DESC, a.id DESC
+                LIMIT %s OFFSET %s
+            """, [f'%{_escape_like(term)}%' for term in terms] + where_params + [limit, offset])
+        rows = cursor.fetchall()
+
+    results = [{
+        'article_id': row[0],
+        'score': float(row[3] or 0),
+        'title_html': highlight(row[1], terms),
+        'snippet_html': make_snippet(row[2], terms),
+    } for row in rows]
+    return {'mode': mode, 'terms': terms, 'total': total, 'results': results}
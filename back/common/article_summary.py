@@ -0,0 +1,83 @@
+"""
+文章摘要生成
+在文章写入时从 Markdown 正文生成列表页所需的摘要信息，列表接口只读取这些列而不再传输整篇正文：
+- excerpt：去掉嵌入片段、Markdown 标记和 HTML 标签后的纯文本前 EXCERPT_LENGTH 个字符
+- word_count：字数（中日韩字符按单字计，其他按连续单词计）
+- cover_url：正文中第一张图片的地址（忽略 data: 内联图片）
+"""
+import re
+
+
+# 摘要长度（字符数），与 blog_articles.excerpt 列宽度保持一致
+EXCERPT_LENGTH = 200
+# 封面地址最大长度，与 blog_articles.cover_url 列宽度保持一致
+COVER_URL_MAX_LENGTH = 500
+
+# 嵌入片段 [embed:url|html:...|width:...|height:...]，payload 可能是很长的 base64
+_EMBED_PATTERN = re.compile(
+    r"\[embed:(?:url|html):[^\|\]]+\|width:[^\|\]]+\|height:[^\|\]]+\]",
+    re.IGNORECASE,
+)
+_MD_IMAGE_PATTERN = re.compile(r"!\[([^\]]*)\]\(\s*<?([^)\s>]+)>?(?:\s+\"[^\"]*\")?\s*\)")
+_HTML_IMAGE_PATTERN = re.compile(r"<img\b[^>]*?\bsrc\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+_MD_LINK_PATTERN = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_CODE_FENCE_PATTERN = re.compile(r"^\s*(```|~~~).*$", re.MULTILINE)
+_HTML_BLOCK_PATTERN = re.compile(r"<(script|style)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+_LINE_PREFIX_PATTERN = re.compile(r"^\s{0,3}(?:#{1,6}\s+|>\s?|[-*+]\s+|\d+\.\s+)", re.MULTILINE)
+_HR_PATTERN = re.compile(r"^\s*([-*_])(?:\s*\1){2,}\s*$", re.MULTILINE)
+_EMPHASIS_PATTERN = re.compile(r"(\*\*|__|\*|_|~~|`)")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_CJK_PATTERN = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9]+(?:['’\-][A-Za-z0-9]+)*")
+
+
+def extract_cover_url(content):
+    """返回正文中第一张非内联图片的地址，没有则返回 None"""
+    if not content:
+        return None
+    candidates = [(m.start(), m.group(2)) for m in _MD_IMAGE_PATTERN.finditer(content)]
+    candidates.extend((m.start(), m.group(1)) for m in _HTML_IMAGE_PATTERN.finditer(content))
+    for _, url in sorted(candidates):
+        url = url.strip()
+        if url and not url.lower().startswith('data:') and len(url) <= COVER_URL_MAX_LENGTH:
+            return url
+    return None
+
+
+def to_plain_text(content):
+    """把 Markdown/HTML 正文转换为单行纯文本（去掉嵌入片段、图片、标记）"""
+    if not content:
+        return ''
+    text = _EMBED_PATTERN.sub(' ', content)
+    text = _MD_IMAGE_PATTERN.sub(lambda m: m.group(1), text)
+    text = _MD_LINK_PATTERN.sub(lambda m: m.group(1), text)
+    text = _HTML_BLOCK_PATTERN.sub(' ', text)
+    text = _HTML_TAG_PATTERN.sub(' ', text)
+    text = _CODE_FENCE_PATTERN.sub(' ', text)
+    text = _HR_PATTERN.sub(' ', text)
+    text = _LINE_PREFIX_PATTERN.sub('', text)
+    text = _EMPHASIS_PATTERN.sub('', text)
+    return _WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+def count_words(plain_text):
+    """统计字数：中日韩字符每字计 1，其余按连续字母数字单词计 1"""
+    if not plain_text:
+        return 0
+    cjk_count = len(_CJK_PATTERN.findall(plain_text))
+    word_count = len(_WORD_PATTERN.findall(_CJK_PATTERN.sub(' ', plain_text)))
+    return cjk_count + word_count
+
+
+def build_article_summary(content):
+    """
+    生成文章摘要信息
+    返回 {'excerpt', 'word_count', 'cover_url'}
+    """
+    plain_text = to_plain_text(content)
+    return {
+        'excerpt': plain_text[:EXCERPT_LENGTH],
+        'word_count': count_words(plain_text),
+        'cover_url': extract_cover_url(content),
+    }
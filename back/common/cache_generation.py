@@ -0,0 +1,23 @@
+"""
+跨进程缓存代数
+进程内缓存（字典）读取时先对比共享缓存（Django cache，见 settings.CACHES）中的代数，代数变化即整体清空；
+失效时提升代数，所有网站工作进程和后台任务进程都能感知，而不是只清空调用方自己进程里的字典。
+"""
+from django.core.cache import cache
+
+
+def get_generation(key):
+    """读取代数，不存在时初始化为 1"""
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, 1, None)
+        generation = cache.get(key) or 1
+    return generation
+
+
+def bump_generation(key):
+    """提升代数，使各进程基于旧代数的缓存失效"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
@@ -1,8 +1,14 @@
 """
 配置文件读取工具
 用于读取后端配置文件 config_back.json
+解析合并后的配置在进程内缓存：每隔 STAT_CHECK_INTERVAL_SECONDS 最多 stat 一次文件，
+mtime/inode/大小变化时才重新读取；每次重新加载都会递增配置代数（get_config_generation），
+热点路径可按代数缓存自己派生出的配置，代数不变时完全不碰磁盘。
 """
 import json
+import os
+import threading
+import time
 from pathlib import Path
 from django.conf import settings
 
@@ -22,9 +28,75 @@ def get_config_path():
     return Path(settings.BASE_DIR) / 'config' / 'config_back.json'
 
 
+# 两次检查配置文件是否变化的最小间隔（秒）
+STAT_CHECK_INTERVAL_SECONDS = 1.0
+
+_config_lock = threading.Lock()
+_config_state = {
+    'config': None,      # 缓存的合并后配置
+    'signature': None,   # 加载时文件的 (mtime_ns, inode, size)
+    'checked_at': 0.0,   # 上次检查文件的时间（time.monotonic）
+    'generation': 0,     # 配置代数，每次重新加载递增
+}
+
+
+def _get_file_signature(config_path):
+    """获取配置文件签名，文件不存在时返回 None"""
+    try:
+        stat = os.stat(config_path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+
+
 def load_config():
     """
-    加载配置文件
+    加载配置（进程内缓存）
+    如果文件不存在或读取失败，返回默认配置
+    返回的字典在进程内共享，调用方只读，不要修改
+    """
+    now = time.monotonic()
+    cached = _config_state['config']
+    if cached is not None and now - _config_state['checked_at'] < STAT_CHECK_INTERVAL_SECONDS:
+        return cached
+    
+    with _config_lock:
+        config_path = get_config_path()
+        signature = _get_file_signature(config_path)
+        cached = _config_state['config']
+        if cached is not None and signature is not None and signature == _config_state['signature']:
+            _config_state['checked_at'] = now
+            return cached
+        
+        config = _read_config_file()
+        # 文件不存在时 _read_config_file 会写入默认配置，重新取签名
+        _config_state['signature'] = _get_file_signature(config_path)
+        _config_state['config'] = config
+        _config_state['checked_at'] = now
+        _config_state['generation'] += 1
+        return config
+
+
+def get_config_generation():
+    """
+    获取当前配置代数
+    配置重新加载后代数递增，调用方可据此判断自己缓存的派生配置是否需要重建
+    """
+    load_config()
+    return _config_state['generation']
+
+
+def invalidate_config_cache():
+    """使配置缓存失效，下次读取时重新加载（直接写配置文件后调用）"""
+    with _config_lock:
+        _config_state['config'] = None
+        _config_state['signature'] = None
+        _config_state['checked_at'] = 0.0
+
+
+def _read_config_file():
+    """
+    读取并解析配置文件，与默认配置合并
     如果文件不存在或读取失败，返回默认配置
     """
     config_path = get_config_path()
@@ -33,7 +105,8 @@ def load_config():
     default_config = {
         # 网盘清理配置
         'network_disk': {
-            'cleanup_days': 7  # 删除多少天前的文件
+            'cleanup_days': 7,  # 删除多少天前的文件
+            'dedup_enabled': False  # 是否对上传的大文件做内容去重（硬链接到 .blobs 存储）
         },
         # 验证码配置
         'captcha': {
@@ -65,6 +138,11 @@ def load_config():
             'enable_audio': True,
             'video_encoder_config': dict(CINEMA_VIDEO_ENCODER_DEFAULT),
         },
+        # 下载卸载配置：由前端代理（nginx / apache）直接发送文件，不占用 uwsgi 进程
+        'download_offload': {
+            'mode': 'off',  # off：进程内发送；x-accel：nginx X-Accel-Redirect；x-sendfile：X-Sendfile
+            'internal_prefix': '/protected_files/'  # x-accel 模式下 nginx internal location 前缀，对应 api/static 目录
+        },
     }
     
     if not config_path.exists():
@@ -131,4 +209,6 @@ def save_config(config_data):
     except Exception as e:
         print(f'保存配置文件失败: {str(e)}')
         return False
+    finally:
+        invalidate_config_cache()
 
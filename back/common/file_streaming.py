@@ -0,0 +1,251 @@
+"""
+文件下载响应（支持断点续传与条件请求）
+serve_file 统一处理磁盘文件下载：
+- ETag（文件大小 + 修改时间）与 Last-Modified，If-None-Match / If-Modified-Since 命中时返回 304
+- RFC 7233 Range：单段返回 206，多段返回 multipart/byteranges，范围全部越界返回 416
+- If-Range 与当前 ETag / Last-Modified 不一致时忽略 Range，返回完整文件
+- 完整文件用 FileResponse 返回，WSGI 服务器提供 wsgi.file_wrapper 时由其零拷贝发送（sendfile）；
+  分段内容按块读取，不暴露 fileno，避免服务器从文件开头整份发送
+- 配置 download_offload.mode 为 x-accel / x-sendfile 时，视图完成校验后只返回内部重定向头，
+  由前端代理直接发送文件（Range、条件请求也由代理处理），uwsgi 进程不再被慢速下载占用
+"""
+import mimetypes
+import os
+import secrets
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import (
+    content_disposition_header,
+    http_date,
+    parse_etags,
+    parse_http_date_safe,
+)
+
+
+# 分段读取的块大小
+STREAM_BLOCK_SIZE = 256 * 1024
+# 单个请求允许的最大分段数，超过时忽略 Range 返回完整文件（防止大量小分段放大开销）
+MAX_RANGES = 16
+
+# 可以交给前端代理发送的文件根目录（网盘、游戏、影院文件都在其下），x-accel 内部前缀对应这个目录
+OFFLOAD_ROOT = Path(settings.BASE_DIR) / 'api' / 'static'
+OFFLOAD_MODES = ('off', 'x-accel', 'x-sendfile')
+
+
+def get_offload_settings():
+    """读取下载卸载配置，返回 {'mode', 'internal_prefix'}，配置非法时视为关闭"""
+    from common.config_utils import get_config_value
+    mode = str(get_config_value('download_offload.mode', 'off') or 'off').lower()
+    if mode not in OFFLOAD_MODES:
+        mode = 'off'
+    prefix = str(get_config_value('download_offload.internal_prefix', '/protected_files/') or '/protected_files/')
+    return {
+        'mode': mode,
+        'internal_prefix': '/' + prefix.strip('/') + '/',
+    }
+
+
+def build_offload_header(path, offload):
+    """
+    生成内部重定向头 (header_name, value)
+    文件不在 OFFLOAD_ROOT 下或卸载关闭时返回 None（回退到进程内发送）
+    """
+    if not offload or offload.get('mode') == 'off':
+        return None
+    resolved = Path(path).resolve()
+    try:
+        relative = resolved.relative_to(OFFLOAD_ROOT.resolve())
+    except ValueError:
+        return None
+    if offload['mode'] == 'x-sendfile':
+        # 头的值只能是 latin-1，路径做 URL 编码（mod_xsendfile 默认 XSendFileUnescape On）
+        return 'X-Sendfile', quote(str(resolved))
+    return 'X-Accel-Redirect', offload['internal_prefix'] + quote(relative.as_posix())
+
+
+def build_etag(stat_result):
+    """根据文件大小和修改时间生成强 ETag"""
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def _strip_weak(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def _not_modified(request, etag, mtime):
+    """判断条件请求是否命中（If-None-Match 优先于 If-Modified-Since）"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or _strip_weak(etag) in [_strip_weak(e) for e in etags]
+
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def _if_range_matches(request, etag, mtime):
+    """If-Range 校验：没有该头或与当前版本一致时返回 True（只接受强 ETag 比较）"""
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and int(mtime) == if_range_date
+
+
+def parse_range_header(header, size):
+    """
+    解析 Range 头
+    返回 None 表示忽略 Range（没有、格式错误、分段过多或空文件），空列表表示全部越界（416），
+    否则返回 [(start, end), ...]（闭区间）
+    空文件没有可满足的范围，按完整响应返回 200 和空内容（前端用 bytes=0-0 探测文件是否存在）
+    """
+    if not header or not header.startswith('bytes=') or size == 0:
+        return None
+
+    ranges = []
+    for spec in header[len('bytes='):].split(','):
+        spec = spec.strip()
+        if not spec:
+            continue
+        start_str, sep, end_str = spec.partition('-')
+        if not sep:
+            return None
+        start_str, end_str = start_str.strip(), end_str.strip()
+        if not start_str:
+            # 后缀范围：bytes=-N 表示最后 N 个字节
+            if not end_str.isdigit():
+                return None
+            suffix_length = int(end_str)
+            if suffix_length == 0:
+                continue
+            ranges.append((max(size - suffix_length, 0), size - 1))
+            continue
+        if not start_str.isdigit() or (end_str and not end_str.isdigit()):
+            return None
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+        if end_str and end < start:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    return ranges
+
+
+def _iter_file_range(path, start, end):
+    """按块读取文件的 [start, end] 区间"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _iter_multipart(path, ranges, size, content_type, boundary):
+    for start, end in ranges:
+        yield (
+            f'\r\n--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ).encode('ascii')
+        yield from _iter_file_range(path, start, end)
+    yield f'\r\n--{boundary}--\r\n'.encode('ascii')
+
+
+def _multipart_length(ranges, size, content_type, boundary):
+    length = 0
+    for start, end in ranges:
+        length += len((
+            f'\r\n--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ).encode('ascii'))
+        length += end - start + 1
+    return length + len(f'\r\n--{boundary}--\r\n'.encode('ascii'))
+
+
+def _set_common_headers(response, etag, mtime, as_attachment, filename):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    response['Accept-Ranges'] = 'bytes'
+    if filename:
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    return response
+
+
+def serve_file(request, path, content_type=None, as_attachment=True, filename=None, offload=None):
+    """
+    返回文件下载响应（GET / HEAD）
+    path 必须是调用方已校验过路径安全和权限的文件；filename 默认为文件名，传入空字符串时不设置 Content-Disposition
+    offload 默认读取 download_offload 配置，也可以直接传入 {'mode', 'internal_prefix'}
+    文件不存在或无法读取时抛出 OSError，由调用方转换为 404
+    """
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    mtime = stat_result.st_mtime
+    etag = build_etag(stat_result)
+    if filename is None:
+        filename = os.path.basename(path)
+    if not content_type:
+        content_type = mimetypes.guess_type(str(path))[0] or 'application/octet-stream'
+
+    offload_header = build_offload_header(path, get_offload_settings() if offload is None else offload)
+    if offload_header:
+        # 交给前端代理发送，Range / 条件请求由代理处理
+        response = HttpResponse(content_type=content_type)
+        response[offload_header[0]] = offload_header[1]
+        if filename:
+            response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        return response
+
+    if _not_modified(request, etag, mtime):
+        return _set_common_headers(HttpResponse(status=304), etag, mtime, False, '')
+
+    ranges = None
+    if request.method == 'GET' and _if_range_matches(request, etag, mtime):
+        ranges = parse_range_header(request.META.get('HTTP_RANGE', '').strip(), size)
+
+    if ranges == []:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return _set_common_headers(response, etag, mtime, False, '')
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+        response['Content-Length'] = str(size)
+        return _set_common_headers(response, etag, mtime, as_attachment, filename)
+
+    if not ranges:
+        response = FileResponse(open(path, 'rb'), content_type=content_type, as_attachment=as_attachment)
+        response['Content-Length'] = str(size)
+        return _set_common_headers(response, etag, mtime, as_attachment, filename)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(
+            _iter_file_range(path, start, end), status=206, content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+        return _set_common_headers(response, etag, mtime, as_attachment, filename)
+
+    boundary = secrets.token_hex(16)
+    response = StreamingHttpResponse(
+        _iter_multipart(path, ranges, size, content_type, boundary),
+        status=206,
+        content_type=f'multipart/byteranges; boundary={boundary}',
+    )
+    response['Content-Length'] = str(_multipart_length(ranges, size, content_type, boundary))
+    return _set_common_headers(response, etag, mtime, as_attachment, filename)
@@ -0,0 +1,331 @@
+"""
+后台任务队列
+耗时较长的操作（删除网盘目录、部署游戏 Web 包、删除用户等）不在请求内执行：
+视图完成参数和权限校验后调用 enqueue 写入 background_jobs 表并返回任务ID，
+由 run_job_worker 管理命令（随 uwsgi 的 attach-daemon 启动）领取执行，前端轮询任务状态接口获取进度和结果。
+- 领取任务使用 SELECT ... FOR UPDATE SKIP LOCKED，可以同时运行多个 worker
+- 任务处理函数抛出 JobError 表示不可重试的失败（如压缩包无效）；其他异常按 max_attempts 延迟重试
+- 取消：排队中的任务直接取消；运行中的任务设置 cancel_requested，由处理函数在检查点调用 check_cancelled 退出
+- 运行中的任务通过更新进度刷新心跳，worker 异常退出后超过 STALE_JOB_SECONDS 未刷新的任务会被重新排队
+任务类型与处理函数的对应关系在 JOB_HANDLERS 中登记（按路径延迟导入），处理函数签名为 handler(job) -> 结果（可 JSON 序列化）。
+"""
+import json
+import time
+
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+
+# 任务类型 -> 处理函数路径
+JOB_HANDLERS = {
+    'network_disk.delete_tree': 'network_disk.jobs.delete_tree',
+    'games.deploy_web_zip': 'games.jobs.deploy_web_zip',
+    'admin.delete_user': 'admin.jobs.delete_user',
+}
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_SUCCEEDED = 'succeeded'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+
+# 默认最大尝试次数
+DEFAULT_MAX_ATTEMPTS = 3
+# 第 n 次失败后延迟 RETRY_BACKOFF_SECONDS * 2^(n-1) 秒重试
+RETRY_BACKOFF_SECONDS = 10
+# 运行中的任务超过该时间没有心跳视为 worker 已退出（秒）
+STALE_JOB_SECONDS = 600
+# 进度与取消标记最多每隔多久读写一次数据库（秒）
+PROGRESS_WRITE_INTERVAL = 1.0
+# 已结束的任务保留天数
+FINISHED_JOB_RETENTION_DAYS = 7
+
+_JOB_COLUMNS = (
+    'id', 'job_type', 'payload', 'status', 'progress', 'progress_message', 'result', 'error',
+    'attempts', 'max_attempts', 'cancel_requested', 'created_by',
+    'created_at', 'started_at', 'finished_at',
+)
+
+
+class JobError(Exception):
+    """不可重试的任务失败，message 会返回给前端"""
+
+
+class JobCancelled(Exception):
+    """任务被取消（由 check_cancelled 抛出）"""
+
+
+def _loads(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, (dict, list)):
+        return value
+    return json.loads(value)
+
+
+def _row_to_job(row):
+    job = dict(zip(_JOB_COLUMNS, row))
+    job['payload'] = _loads(job['payload']) or {}
+    job['result'] = _loads(job['result'])
+    job['cancel_requested'] = bool(job['cancel_requested'])
+    return job
+
+
+def _fetch_job(cursor, job_id, for_update=False):
+    cursor.execute(
+        f"SELECT {', '.join(_JOB_COLUMNS)} FROM background_jobs WHERE id = %s"
+        + (" FOR UPDATE" if for_update else ""),
+        [job_id]
+    )
+    row = cursor.fetchone()
+    return _row_to_job(row) if row else None
+
+
+def enqueue(job_type, payload=None, created_by=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """写入一个排队中的任务，返回任务ID"""
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f'未登记的任务类型: {job_type}')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO background_jobs
+                (job_type, payload, status, progress, attempts, max_attempts, cancel_requested,
+                 created_by, run_after, created_at, updated_at)
+            VALUES (%s, %s, %s, 0, 0, %s, 0, %s, NOW(), NOW(), NOW())
+            """,
+            [
+                job_type, json.dumps(payload or {}, ensure_ascii=False), STATUS_QUEUED,
+                max(int(max_attempts), 1), created_by,
+            ]
+        )
+        return cursor.lastrowid
+
+
+def get_job(job_id):
+    """读取任务，不存在时返回 None"""
+    with connection.cursor() as cursor:
+        return _fetch_job(cursor, job_id)
+
+
+def describe_job(job):
+    """任务状态接口返回给前端的字段"""
+    return {
+        'id': job['id'],
+        'type': job['job_type'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'progress_message': job['progress_message'] or '',
+        'result': job['result'],
+        'error': job['error'] or '',
+        'attempts': job['attempts'],
+        'max_attempts': job['max_attempts'],
+        'cancel_requested': job['cancel_requested'],
+        'finished': job['status'] in FINISHED_STATUSES,
+        'created_at': job['created_at'].isoformat() if job['created_at'] else None,
+        'started_at': job['started_at'].isoformat() if job['started_at'] else None,
+        'finished_at': job['finished_at'].isoformat() if job['finished_at'] else None,
+    }
+
+
+def request_cancel(job_id):
+    """
+    取消任务：排队中的任务直接标记为已取消，运行中的任务设置取消标记等待处理函数退出
+    返回更新后的任务，不存在时返回 None
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            job = _fetch_job(cursor, job_id, for_update=True)
+            if not job or job['status'] in FINISHED_STATUSES:
+                return job
+            if job['status'] == STATUS_QUEUED:
+                cursor.execute(
+                    """
+                    UPDATE background_jobs
+                    SET status = %s, cancel_requested = 1, finished_at = NOW(), updated_at = NOW()
+                    WHERE id = %s
+                    """,
+                    [STATUS_CANCELLED, job_id]
+                )
+            else:
+                cursor.execute(
+                    "UPDATE background_jobs SET cancel_requested = 1, updated_at = NOW() WHERE id = %s",
+                    [job_id]
+                )
+            return _fetch_job(cursor, job_id)
+
+
+class JobContext:
+    """传给处理函数的任务对象：payload、进度上报和取消检查"""
+
+    def __init__(self, job):
+        self.id = job['id']
+        self.job_type = job['job_type']
+        self.payload = job['payload']
+        self.attempt = job['attempts']
+        self.max_attempts = job['max_attempts']
+        self._last_write = 0.0
+        self._cancel_requested = job['cancel_requested']
+
+    @property
+    def is_last_attempt(self):
+        return self.attempt >= self.max_attempts
+
+    def set_progress(self, progress, message=None, force=False):
+        """
+        上报进度（0-100）并刷新心跳，同时读取取消标记
+        距上次写入不足 PROGRESS_WRITE_INTERVAL 秒时跳过（force=True 时总是写入）
+        """
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_WRITE_INTERVAL:
+            return
+        self._last_write = now
+        progress = max(0, min(int(progress), 100))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE background_jobs
+                SET progress = %s, progress_message = COALESCE(%s, progress_message),
+                    heartbeat_at = NOW(), updated_at = NOW()
+                WHERE id = %s
+                """,
+                [progress, message[:255] if message else None, self.id]
+            )
+            cursor.execute("SELECT cancel_requested FROM background_jobs WHERE id = %s", [self.id])
+            row = cursor.fetchone()
+        self._cancel_requested = bool(row and row[0])
+
+    def check_cancelled(self):
+        """在可以安全中止的检查点调用，任务已被取消时抛出 JobCancelled"""
+        if self._cancel_requested:
+            raise JobCancelled()
+
+
+def claim_next(worker_id):
+    """领取一个到期的排队任务并标记为运行中，没有任务时返回 None"""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT id FROM background_jobs
+                WHERE status = %s AND run_after <= NOW()
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+                """,
+                [STATUS_QUEUED]
+            )
+            row = cursor.fetchone()
+            if not row:
+                return None
+            cursor.execute(
+                """
+                UPDATE background_jobs
+                SET status = %s, attempts = attempts + 1, locked_by = %s,
+                    started_at = NOW(), heartbeat_at = NOW(), updated_at = NOW()
+                WHERE id = %s
+                """,
+                [STATUS_RUNNING, worker_id[:64], row[0]]
+            )
+            return _fetch_job(cursor, row[0])
+
+
+def _finish(job_id, status, result=None, error=None):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE background_jobs
+            SET status = %s, result = %s, error = %s,
+                progress = CASE WHEN %s = %s THEN 100 ELSE progress END,
+                locked_by = NULL, finished_at = NOW(), updated_at = NOW()
+            WHERE id = %s
+            """,
+            [
+                status,
+                json.dumps(result, ensure_ascii=False) if result is not None else None,
+                error,
+                status, STATUS_SUCCEEDED,
+                job_id,
+            ]
+        )
+
+
+def _schedule_retry(job, error):
+    delay = RETRY_BACKOFF_SECONDS * 2 ** max(job['attempts'] - 1, 0)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE background_jobs
+            SET status = %s, error = %s, locked_by = NULL,
+                run_after = NOW() + INTERVAL %s SECOND, updated_at = NOW()
+            WHERE id = %s
+            """,
+            [STATUS_QUEUED, error, delay, job['id']]
+        )
+    return delay
+
+
+def run_job(job):
+    """
+    执行一个已领取的任务
+    返回 (最终状态, 说明)；可重试的失败返回 (STATUS_QUEUED, 错误信息)
+    """
+    context = JobContext(job)
+    try:
+        handler_path = JOB_HANDLERS.get(job['job_type'])
+        if not handler_path:
+            raise JobError(f'未登记的任务类型: {job["job_type"]}')
+        context.check_cancelled()
+        result = import_string(handler_path)(context)
+    except JobCancelled:
+        _finish(job['id'], STATUS_CANCELLED, error='任务已取消')
+        return STATUS_CANCELLED, '任务已取消'
+    except JobError as e:
+        _finish(job['id'], STATUS_FAILED, error=str(e))
+        return STATUS_FAILED, str(e)
+    except Exception as e:
+        error = f'{type(e).__name__}: {str(e)}'
+        if context._cancel_requested:
+            _finish(job['id'], STATUS_CANCELLED, error=error)
+            return STATUS_CANCELLED, error
+        if job['attempts'] < job['max_attempts']:
+            delay = _schedule_retry(job, error)
+            return STATUS_QUEUED, f'{error}（{delay} 秒后重试）'
+        _finish(job['id'], STATUS_FAILED, error=error)
+        return STATUS_FAILED, error
+
+    _finish(job['id'], STATUS_SUCCEEDED, result=result)
+    return STATUS_SUCCEEDED, ''
+
+
+def requeue_stale_jobs(stale_seconds=STALE_JOB_SECONDS):
+    """
+    处理 worker 异常退出后遗留的运行中任务：还有重试次数的重新排队，否则标记为失败
+    返回处理的任务数
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE background_jobs
+            SET status = CASE WHEN attempts < max_attempts THEN %s ELSE %s END,
+                error = 'worker 异常退出，任务中断',
+                finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE NOW() END,
+                locked_by = NULL, run_after = NOW(), updated_at = NOW()
+            WHERE status = %s AND heartbeat_at < NOW() - INTERVAL %s SECOND
+            """,
+            [STATUS_QUEUED, STATUS_FAILED, STATUS_RUNNING, int(stale_seconds)]
+        )
+        return cursor.rowcount
+
+
+def purge_finished_jobs(days=FINISHED_JOB_RETENTION_DAYS):
+    """删除结束超过指定天数的任务记录，返回删除数"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            DELETE FROM background_jobs
+            WHERE status IN (%s, %s, %s) AND finished_at < NOW() - INTERVAL %s DAY
+            """,
+            [*FINISHED_STATUSES, int(days)]
+        )
+        return cursor.rowcount
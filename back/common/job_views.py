@@ -0,0 +1,79 @@
+"""
+后台任务状态接口
+任务的创建者和管理员可以查询进度、结果，以及取消任务
+"""
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from common import job_queue
+from common.admin_auth import is_admin
+from common.jwt_utils import jwt_required
+
+
+def _get_visible_job(request, job_id):
+    """读取当前用户有权查看的任务，返回 (job, 错误响应)"""
+    job = job_queue.get_job(job_id)
+    if not job:
+        return None, JsonResponse({
+            'success': False,
+            'error': '任务不存在'
+        }, status=404)
+    if job['created_by'] != request.user_id and not is_admin(request.user_id):
+        return None, JsonResponse({
+            'success': False,
+            'error': '无权查看该任务'
+        }, status=403)
+    return job, None
+
+
+@csrf_exempt
+@jwt_required
+@require_http_methods(["GET"])
+def get_job_status(request, job_id):
+    """查询任务状态、进度和结果（前端轮询）"""
+    try:
+        job, error_response = _get_visible_job(request, job_id)
+        if error_response:
+            return error_response
+        return JsonResponse({
+            'success': True,
+            'data': job_queue.describe_job(job)
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'获取任务状态失败: {str(e)}'
+        }, status=500)
+
+
+@csrf_exempt
+@jwt_required
+@require_http_methods(["POST"])
+def cancel_job(request, job_id):
+    """
+    取消任务
+    排队中的任务立即取消；运行中的任务在下一个检查点退出，已完成的部分不会回滚
+    """
+    try:
+        job, error_response = _get_visible_job(request, job_id)
+        if error_response:
+            return error_response
+        if job['status'] in job_queue.FINISHED_STATUSES:
+            return JsonResponse({
+                'success': False,
+                'error': '任务已结束，无法取消',
+                'data': job_queue.describe_job(job)
+            }, status=409)
+
+        job = job_queue.request_cancel(job_id)
+        return JsonResponse({
+            'success': True,
+            'message': '已取消' if job['status'] == job_queue.STATUS_CANCELLED else '已请求取消，任务将在当前步骤完成后停止',
+            'data': job_queue.describe_job(job)
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'取消任务失败: {str(e)}'
+        }, status=500)
@@ -40,8 +40,9 @@ class JWTAuthenticationMiddleware(MiddlewareMixin):
         
         token = auth_header.split(' ')[1]
         
-        # 验证token
+        # 验证token，结果挂到request上供 jwt_required 复用，避免同一请求重复解码
         is_valid, payload, error_message = JWTUtils.verify_token(token)
+        request.jwt_auth = (token, is_valid, payload, error_message)
         
         if not is_valid:
             # token无效，设置为访客
@@ -61,6 +62,7 @@ class JWTAuthenticationMiddleware(MiddlewareMixin):
         # 设置用户信息
         request.user_id = payload.get('user_id')
         request.username = payload.get('username')
+        request.jwt_payload = payload
         request.is_authenticated = True
         
         return None
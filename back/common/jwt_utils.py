@@ -8,6 +8,7 @@ import secrets
 import hashlib
 import threading
 import time
+from collections import OrderedDict
 from .captcha_utils import CaptchaUtils
 
 
@@ -47,17 +48,32 @@ class JWTUtils:
     SECRET_KEY = getattr(settings, 'SECRET_KEY', 'your-secret-key')
     ALGORITHM = 'HS256'
     
+    # 按配置代数缓存的Token配置：(代数, 配置)
+    _token_config_cache = (None, None)
+    
+    # 已验证Access Token缓存（LRU）：{签名段: (token, payload, exp时间戳)}
+    # 同一个Access Token重复请求时跳过HMAC校验和JSON解码，条目在Token过期时失效
+    VERIFIED_TOKEN_CACHE_SIZE = 1024
+    _verified_tokens = OrderedDict()
+    _verified_tokens_lock = threading.Lock()
+    
     # Token过期时间（从配置文件读取）
     @classmethod
     def _load_token_config(cls):
-        """加载Token配置"""
+        """加载Token配置（配置代数未变化时直接返回缓存）"""
         try:
-            from .config_utils import load_config
+            from .config_utils import load_config, get_config_generation
+            generation = get_config_generation()
+            cached_generation, cached_config = cls._token_config_cache
+            if cached_generation == generation:
+                return cached_config
             jwt_config = load_config().get('jwt', {})
-            return {
+            token_config = {
                 'access_token_expire_minutes': jwt_config.get('access_token_expire_minutes', 60),
                 'refresh_token_expire_days': jwt_config.get('refresh_token_expire_days', 30)
             }
+            cls._token_config_cache = (generation, token_config)
+            return token_config
         except Exception:
             return {
                 'access_token_expire_minutes': 60,
@@ -113,6 +129,38 @@ class JWTUtils:
         """
         验证Token
         返回 (is_valid, payload, error_message)
+        最近验证通过的Access Token从缓存返回，不再重复解码
+        """
+        signature = token.rpartition('.')[2]
+        with cls._verified_tokens_lock:
+            cached = cls._verified_tokens.get(signature)
+            if cached is not None:
+                cached_token, payload, expires_at = cached
+                if cached_token == token and time.time() < expires_at:
+                    cls._verified_tokens.move_to_end(signature)
+                    return True, dict(payload), None
+                del cls._verified_tokens[signature]
+        
+        is_valid, payload, error_message = cls._decode_token(token)
+        if is_valid and payload.get('token_type') == 'access' and isinstance(payload.get('exp'), (int, float)):
+            with cls._verified_tokens_lock:
+                cls._verified_tokens[signature] = (token, dict(payload), payload['exp'])
+                cls._verified_tokens.move_to_end(signature)
+                while len(cls._verified_tokens) > cls.VERIFIED_TOKEN_CACHE_SIZE:
+                    cls._verified_tokens.popitem(last=False)
+        return is_valid, payload, error_message
+    
+    @classmethod
+    def clear_verified_token_cache(cls):
+        """清空已验证Token缓存"""
+        with cls._verified_tokens_lock:
+            cls._verified_tokens.clear()
+    
+    @classmethod
+    def _decode_token(cls, token):
+        """
+        解码并校验Token签名和过期时间（不经过缓存）
+        返回 (is_valid, payload, error_message)
         """
         try:
             payload = jwt.decode(token, cls.SECRET_KEY, algorithms=[cls.ALGORITHM])
@@ -327,8 +375,12 @@ def jwt_required(view_func):
         
         token = auth_header.split(' ')[1]
         
-        # 验证token
-        is_valid, payload, error_message = JWTUtils.verify_token(token)
+        # 验证token：中间件已验证过同一个token时直接复用结果
+        jwt_auth = getattr(request, 'jwt_auth', None)
+        if jwt_auth is not None and jwt_auth[0] == token:
+            _, is_valid, payload, error_message = jwt_auth
+        else:
+            is_valid, payload, error_message = JWTUtils.verify_token(token)
         
         if not is_valid:
             return JsonResponse({
@@ -348,6 +400,7 @@ def jwt_required(view_func):
         # 将用户信息添加到request中
         request.user_id = payload.get('user_id')
         request.username = payload.get('username')
+        request.jwt_payload = payload
         
         return view_func(request, *args, **kwargs)
     
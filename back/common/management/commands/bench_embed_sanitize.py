@@ -0,0 +1,166 @@
+"""
+文章嵌入片段清洗基准测试管理命令
+生成两类文章：大量小嵌入片段（many）和少量大体积游戏嵌入片段（large），对比每篇文章的清洗耗时：
+- 冷启动：每次清空缓存，所有片段都要解码、清洗、重新编码
+- 重复提交：同一份正文再次提交，全部命中缓存
+- 编辑：提交上次清洗后的正文并只改动其中一个片段（模拟编辑文章），只有改动的片段需要清洗
+- 编辑（传入库中正文）：同上，但清空缓存并传入 stored_content（模拟编辑请求落到没见过该文章的工作进程）
+同时校验缓存命中、跳过库中片段时的输出与冷启动一致。不访问数据库
+
+使用方法：
+python manage.py bench_embed_sanitize
+python manage.py bench_embed_sanitize --rounds 10 --large-kb 800
+"""
+import base64
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from common.article_content_sanitize import clear_embed_cache, sanitize_article_content_embeds
+
+
+# 模拟的游戏嵌入片段：样式、画布、带事件属性的按钮和一段脚本（事件属性会被清洗掉）
+_GAME_HTML_HEAD = (
+    '<style>body{margin:0;background:#111;color:#eee}canvas{display:block;width:100%}</style>'
+    '<div class="hud"><button onclick="restart()" class="btn">重新开始</button>'
+    '<span id="score">0</span></div><canvas id="stage" width="640" height="360"></canvas>'
+)
+_GAME_SCRIPT_LINE = (
+    'function step{n}(s){{s.x+=s.vx*{n};s.y+=s.vy;if(s.y>360){{s.vy=-s.vy*0.9}}'
+    'document.getElementById("score").textContent=s.x|0;return s}}\n'
+)
+
+
+def _game_html(size_bytes, seed):
+    lines = []
+    total = 0
+    n = 0
+    while total < size_bytes:
+        line = _GAME_SCRIPT_LINE.format(n=n + seed)
+        lines.append(line)
+        total += len(line)
+        n += 1
+    return f'{_GAME_HTML_HEAD}<script>{"".join(lines)}</script><p onmouseover="x()">关卡 {seed}</p>'
+
+
+def _embed(html):
+    payload = base64.b64encode(html.encode('utf-8')).decode('ascii')
+    return f'[embed:html:{payload}|width:100%|height:400px]'
+
+
+def _article(embed_count, embed_kb, seed):
+    parts = ['# 基准测试文章\n\n正文段落，介绍下面的小游戏。\n\n']
+    for index in range(embed_count):
+        parts.append(_embed(_game_html(embed_kb * 1024, seed * 1000 + index)))
+        parts.append(f'\n\n第 {index + 1} 个片段之后的说明文字。\n\n')
+    return ''.join(parts)
+
+
+class Command(BaseCommand):
+    help = '对比文章嵌入片段清洗在冷启动与缓存命中时的耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=5,
+            help='每种场景重复的次数（默认5）'
+        )
+        parser.add_argument(
+            '--many',
+            type=int,
+            default=40,
+            help='many 文章中的嵌入片段数（默认40）'
+        )
+        parser.add_argument(
+            '--many-kb',
+            type=int,
+            default=8,
+            help='many 文章中每个片段的大小 KB（默认8）'
+        )
+        parser.add_argument(
+            '--large',
+            type=int,
+            default=3,
+            help='large 文章中的嵌入片段数（默认3）'
+        )
+        parser.add_argument(
+            '--large-kb',
+            type=int,
+            default=400,
+            help='large 文章中每个片段的大小 KB（默认400）'
+        )
+
+    def handle(self, *args, **options):
+        rounds = max(options['rounds'], 1)
+        cases = [
+            ('many', max(options['many'], 1), max(options['many_kb'], 1)),
+            ('large', max(options['large'], 1), max(options['large_kb'], 1)),
+        ]
+
+        for name, embed_count, embed_kb in cases:
+            content = _article(embed_count, embed_kb, seed=1)
+            clear_embed_cache()
+            expected = sanitize_article_content_embeds(content)
+            # 编辑场景：在清洗后的正文上替换最后一个片段
+            marker = expected.rfind('[embed:html:')
+            edited = expected[:marker] + _embed(_game_html(embed_kb * 1024, seed=999999)) + \
+                expected[expected.index(']', marker) + 1:]
+
+            def cold():
+                clear_embed_cache()
+                return sanitize_article_content_embeds(content)
+
+            def resubmit():
+                return sanitize_article_content_embeds(content)
+
+            def edit():
+                return sanitize_article_content_embeds(edited)
+
+            def edit_stored():
+                return sanitize_article_content_embeds(edited, stored_content=expected)
+
+            cold_ms = self._measure(cold, rounds)
+            clear_embed_cache()
+            sanitize_article_content_embeds(content)
+            if resubmit() != expected:
+                raise CommandError(f'[{name}] 缓存命中的输出与冷启动不一致')
+            resubmit_ms = self._measure(resubmit, rounds)
+            edit_ms = self._measure(edit, rounds, setup=lambda: self._prime(content))
+            clear_embed_cache()
+            if edit_stored() != edit():
+                raise CommandError(f'[{name}] 跳过库中片段的输出与完整清洗不一致')
+            edit_stored_ms = self._measure(edit_stored, rounds, setup=clear_embed_cache)
+
+            self.stdout.write(
+                f'[{name}] {embed_count} 个片段 × {embed_kb} KB，正文 {len(content) / 1024 / 1024:.2f} MB'
+            )
+            for label, elapsed in (
+                ('冷启动', cold_ms),
+                ('重复提交', resubmit_ms),
+                ('编辑一个片段', edit_ms),
+                ('编辑一个片段（冷缓存，传入库中正文）', edit_stored_ms),
+            ):
+                speedup = cold_ms / elapsed if elapsed else float('inf')
+                self.stdout.write(f'  {label}: 每篇 {elapsed:.2f} ms（{speedup:.1f}x）')
+
+        clear_embed_cache()
+        self.stdout.write(self.style.SUCCESS('基准测试完成'))
+
+    @staticmethod
+    def _prime(content):
+        # 只保留原文章片段的缓存，使被改动的片段每轮都未命中
+        clear_embed_cache()
+        sanitize_article_content_embeds(content)
+
+    @staticmethod
+    def _measure(func, rounds, setup=None):
+        """返回平均每次耗时（毫秒），setup 不计时"""
+        elapsed = 0.0
+        for _ in range(rounds):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func()
+            elapsed += time.perf_counter() - start
+        return elapsed / rounds * 1000
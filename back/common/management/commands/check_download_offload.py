@@ -0,0 +1,166 @@
+"""
+下载卸载自检管理命令
+在本地用一个模拟前端代理验证 X-Accel-Redirect / X-Sendfile 卸载：
+1. 在 api/static 下创建临时测试文件
+2. 分别以进程内发送和卸载模式调用下载响应
+3. 模拟代理按 nginx internal location 的规则解析内部重定向头、读取文件并自行处理 Range
+4. 期望结果直接对测试文件内容切片得到（不复用 file_streaming 的 Range 解析），
+   进程内发送和经模拟代理的结果都与之逐字节对比
+不需要真实的 nginx，也不读写数据库；结束后删除临时文件
+
+使用方法：
+python manage.py check_download_offload                   # 测试 x-accel 和 x-sendfile 两种模式
+python manage.py check_download_offload --mode x-accel
+python manage.py check_download_offload --size-mb 64      # 指定测试文件大小
+"""
+import os
+import shutil
+from pathlib import Path
+from urllib.parse import unquote
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from common.file_streaming import OFFLOAD_ROOT, get_offload_settings, serve_file
+
+
+class StandInProxy:
+    """
+    模拟前端代理：收到带内部重定向头的响应后自行读取文件
+    x-accel：internal_prefix 映射到 OFFLOAD_ROOT（等价于 nginx 的 location internal + alias）
+    x-sendfile：头中为 URL 编码的绝对路径
+    """
+
+    def __init__(self, offload):
+        self.offload = offload
+
+    def resolve(self, response):
+        if self.offload['mode'] == 'x-sendfile':
+            value = response.get('X-Sendfile')
+            return Path(unquote(value)) if value else None
+        value = response.get('X-Accel-Redirect')
+        prefix = self.offload['internal_prefix']
+        if not value or not value.startswith(prefix):
+            return None
+        return OFFLOAD_ROOT / unquote(value[len(prefix):])
+
+    def fetch(self, response, range_header=''):
+        """返回 (状态码, 内容)，按代理的方式处理 Range（只支持单段）"""
+        path = self.resolve(response)
+        if path is None or not path.is_file():
+            return 404, b''
+        size = path.stat().st_size
+        with open(path, 'rb') as f:
+            span = self._single_range(range_header, size)
+            if span is None:
+                return 200, f.read()
+            if span == 'unsatisfiable':
+                return 416, b''
+            start, end = span
+            f.seek(start)
+            return 206, f.read(end - start + 1)
+
+    @staticmethod
+    def _single_range(range_header, size):
+        """
+        代理自己的单段 Range 解析：返回 (start, end)，无法满足时返回 'unsatisfiable'，
+        没有或无法解析的 Range 返回 None（按完整文件处理）
+        """
+        spec = range_header.strip()
+        if not spec.startswith('bytes=') or ',' in spec:
+            return None
+        first, _, last = spec[len('bytes='):].partition('-')
+        try:
+            if not first:
+                suffix = int(last)
+                if suffix <= 0 or size == 0:
+                    return 'unsatisfiable'
+                return max(size - suffix, 0), size - 1
+            start = int(first)
+            end = int(last) if last else size - 1
+        except ValueError:
+            return None
+        if start >= size or end < start:
+            return 'unsatisfiable'
+        return start, min(end, size - 1)
+
+
+def _collect(response):
+    if response.streaming:
+        body = b''.join(response.streaming_content)
+    else:
+        body = response.content
+    response.close()
+    return body
+
+
+class Command(BaseCommand):
+    help = '使用模拟代理在本地验证下载卸载（X-Accel-Redirect / X-Sendfile）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            choices=['x-accel', 'x-sendfile'],
+            help='只测试指定模式（默认两种都测试）'
+        )
+        parser.add_argument(
+            '--size-mb',
+            type=int,
+            default=8,
+            help='测试文件大小（MB，默认8）'
+        )
+
+    def handle(self, *args, **options):
+        modes = [options['mode']] if options['mode'] else ['x-accel', 'x-sendfile']
+        size = max(options['size_mb'], 1) * 1024 * 1024
+        configured = get_offload_settings()
+        self.stdout.write(f'当前配置: mode={configured["mode"]}, internal_prefix={configured["internal_prefix"]}')
+
+        work_dir = OFFLOAD_ROOT / '.offload_check'
+        work_dir.mkdir(parents=True, exist_ok=True)
+        test_file = work_dir / '测试 文件.bin'
+        try:
+            data = os.urandom(size)
+            with open(test_file, 'wb') as f:
+                f.write(data)
+
+            factory = RequestFactory()
+            # (Range 头, 期望状态码, 期望内容)：期望内容直接对文件内容切片
+            cases = [
+                ('', 200, data),
+                ('bytes=0-0', 206, data[:1]),
+                ('bytes=1024-4095', 206, data[1024:4096]),
+                (f'bytes=-{size // 3}', 206, data[-(size // 3):]),
+                (f'bytes={size + 10}-', 416, b''),
+            ]
+            failures = 0
+            for mode in modes:
+                offload = {'mode': mode, 'internal_prefix': configured['internal_prefix']}
+                proxy = StandInProxy(offload)
+                for range_header, expected_status, expected_body in cases:
+                    expected = (expected_status, expected_body)
+                    extra = {'HTTP_RANGE': range_header} if range_header else {}
+                    direct = serve_file(factory.get('/', **extra), test_file, offload={'mode': 'off'})
+                    direct_result = (direct.status_code, _collect(direct))
+
+                    offloaded = serve_file(factory.get('/', **extra), test_file, offload=offload)
+                    offloaded_body = _collect(offloaded)
+                    if offloaded_body:
+                        raise CommandError(f'{mode}: 卸载响应不应包含正文')
+                    actual = proxy.fetch(offloaded, range_header)
+
+                    ok = direct_result == expected and actual == expected
+                    failures += 0 if ok else 1
+                    label = range_header or '完整文件'
+                    status = self.style.SUCCESS('通过') if ok else self.style.ERROR('失败')
+                    self.stdout.write(
+                        f'[{mode}] {label}: {status}（期望 {expected[0]}/{len(expected[1])} 字节，'
+                        f'进程内 {direct_result[0]}/{len(direct_result[1])} 字节，'
+                        f'代理 {actual[0]}/{len(actual[1])} 字节）'
+                    )
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        if failures:
+            raise CommandError(f'{failures} 项检查失败')
+        self.stdout.write(self.style.SUCCESS('下载卸载自检通过'))
@@ -0,0 +1,29 @@
+"""
+站点每日统计刷新管理命令
+强制刷新今天的统计快照，并补齐、定稿最近若干天的每日统计（后台统计接口访问时也会自动完成，
+定时执行可以让前一天的数据在零点后尽快定稿，并保留每天的浏览量/喜欢数/网盘快照）
+
+使用方法：
+python manage.py refresh_site_stats              # 最近365天
+python manage.py refresh_site_stats --days 30
+"""
+from django.core.management.base import BaseCommand
+from common import site_stats
+
+
+class Command(BaseCommand):
+    help = '刷新今天的站点统计，并补齐定稿最近若干天的每日统计'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=max(site_stats.ALLOWED_WINDOWS),
+            help='补齐最近多少天的统计（默认365）'
+        )
+
+    def handle(self, *args, **options):
+        days = max(options['days'], 1)
+        site_stats.refresh_today(force=True)
+        finalized = site_stats.finalize_past_days(days)
+        self.stdout.write(self.style.SUCCESS(f'统计刷新完成，本次定稿 {finalized} 天'))
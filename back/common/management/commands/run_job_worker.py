@@ -0,0 +1,93 @@
+"""
+后台任务 worker 管理命令
+循环领取 background_jobs 中的排队任务并执行，没有任务时按轮询间隔休眠；
+收到 SIGTERM / SIGINT 后执行完当前任务再退出。可以同时运行多个 worker。
+
+使用方法：
+python manage.py run_job_worker                     # 常驻运行
+python manage.py run_job_worker --once              # 执行完当前所有到期任务后退出
+python manage.py run_job_worker --poll-interval 5
+
+部署时在 uwsgi.ini 中用 attach-daemon 随 uwsgi 启动：
+attach-daemon = /usr/local/python3.12/bin/python3.12 manage.py run_job_worker
+"""
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from common import job_queue
+
+
+# 重新排队中断任务、清理过期任务记录的间隔（秒）
+MAINTENANCE_INTERVAL_SECONDS = 300
+
+
+class Command(BaseCommand):
+    help = '运行后台任务 worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='执行完当前所有到期任务后退出'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='没有任务时的轮询间隔（秒，默认2）'
+        )
+        parser.add_argument(
+            '--worker-id',
+            default=None,
+            help='worker 标识（默认 主机名:进程号）'
+        )
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id'] or f'{socket.gethostname()}:{os.getpid()}'
+        poll_interval = max(options['poll_interval'], 0.1)
+        self.stopping = False
+
+        def _stop(signum, frame):
+            self.stopping = True
+        signal.signal(signal.SIGTERM, _stop)
+        signal.signal(signal.SIGINT, _stop)
+
+        self.stdout.write(f'后台任务 worker 已启动: {worker_id}')
+        last_maintenance = 0.0
+        while not self.stopping:
+            # 长时间运行的进程需要自行回收失效的数据库连接
+            close_old_connections()
+
+            now = time.monotonic()
+            if now - last_maintenance >= MAINTENANCE_INTERVAL_SECONDS:
+                last_maintenance = now
+                requeued = job_queue.requeue_stale_jobs()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f'重新排队中断的任务: {requeued} 个'))
+                job_queue.purge_finished_jobs()
+
+            job = job_queue.claim_next(worker_id)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            started = time.monotonic()
+            self.stdout.write(f'开始任务 #{job["id"]} {job["job_type"]}（第 {job["attempts"]} 次）')
+            status, detail = job_queue.run_job(job)
+            elapsed = time.monotonic() - started
+            message = f'任务 #{job["id"]} {status}，耗时 {elapsed:.2f} 秒' + (f'：{detail}' if detail else '')
+            if status == job_queue.STATUS_SUCCEEDED:
+                self.stdout.write(self.style.SUCCESS(message))
+            elif status == job_queue.STATUS_FAILED:
+                self.stdout.write(self.style.ERROR(message))
+            else:
+                self.stdout.write(self.style.WARNING(message))
+
+        self.stdout.write('后台任务 worker 已退出')
@@ -0,0 +1,261 @@
+"""
+关注 / 喜欢并发压力测试管理命令
+创建临时用户和文章，每个用户由多个线程同时操作同一组关系（模拟并发的重复点击），分两轮：
+1. 随机混合喜欢/取消喜欢/关注/取消关注：每个关系的最终状态必须等于各线程成功插入次数减去成功删除次数
+   （即影响行数判断的结果与实际写入一致）
+2. 只做切换（toggle）：检查没有失败
+每轮结束后校验触发器维护的 love_count / liked_article_count / follow_count / follower_count 与关系表实际行数一致，
+并且没有出现非预期的失败（唯一键冲突等）。测试数据在结束后删除。
+需要连接真实数据库。临时用户和文章在运行期间会出现在公开列表、站点统计和搜索中，
+因此只在 settings.DEBUG 为 True（开发环境）时运行；确需在生产库上运行时必须显式传入 --allow-production，
+且不要在业务高峰期运行。
+
+使用方法：
+python manage.py stress_user_relations
+python manage.py stress_user_relations --users 8 --threads-per-user 4 --rounds 200
+python manage.py stress_user_relations --allow-production   # 非 DEBUG 环境
+"""
+import random
+import secrets
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from common.user_relation_utils import (
+    RESULT_CHANGED,
+    RESULT_ERROR,
+    RESULT_UNCHANGED,
+    follow_user,
+    unfollow_user,
+    like_article,
+    unlike_article,
+    toggle_follow_user,
+    toggle_like_article,
+)
+
+
+class Command(BaseCommand):
+    help = '并发切换关注/喜欢关系，校验统计字段和结果判断是否正确'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=8,
+            help='参与测试的临时用户数（默认8）'
+        )
+        parser.add_argument(
+            '--threads-per-user',
+            type=int,
+            default=4,
+            help='每个用户同时操作的线程数（默认4）'
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=200,
+            help='每个线程的操作次数（默认200）'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='随机种子'
+        )
+        parser.add_argument(
+            '--allow-production',
+            action='store_true',
+            help='允许在非 DEBUG 环境（生产库）上运行，临时数据运行期间对外可见'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['allow_production']:
+            raise CommandError(
+                '当前不是 DEBUG 环境：压力测试会在数据库中创建对外可见的临时用户和文章，'
+                '确需在生产库上运行请加 --allow-production'
+            )
+        user_total = max(options['users'], 1)
+        threads_per_user = max(options['threads_per_user'], 1)
+        rounds = max(options['rounds'], 1)
+        seed = options['seed'] if options['seed'] is not None else random.randrange(1 << 30)
+
+        prefix = f'stress_{secrets.token_hex(4)}'
+        author_id, article_id, user_ids = self._create_fixtures(prefix, user_total)
+        self.stdout.write(
+            f'临时数据: 作者 #{author_id}，文章 #{article_id}，用户 {len(user_ids)} 个，'
+            f'每用户 {threads_per_user} 线程 × {rounds} 次，随机种子 {seed}'
+        )
+        failed = False
+        try:
+            for phase in ('mixed', 'toggle'):
+                stats, errors, elapsed = self._hammer(
+                    phase, user_ids, author_id, article_id, threads_per_user, rounds, seed
+                )
+                problems = self._verify(user_ids, author_id, article_id, stats if phase == 'mixed' else None)
+                operations = len(user_ids) * threads_per_user * rounds
+                label = '混合插入/删除' if phase == 'mixed' else '并发切换'
+                self.stdout.write(
+                    f'[{label}] {operations} 次操作，耗时 {elapsed:.2f} 秒'
+                    f'（{operations / max(elapsed, 1e-9):.0f} 次/秒）'
+                )
+                for message, count in errors.most_common(10):
+                    self.stdout.write(self.style.ERROR(f'  非预期失败 {count} 次: {message}'))
+                for problem in problems:
+                    self.stdout.write(self.style.ERROR(f'  {problem}'))
+                failed = failed or bool(errors or problems)
+        finally:
+            self._cleanup(user_ids + [author_id], article_id)
+
+        if failed:
+            raise CommandError('压力测试未通过')
+        self.stdout.write(self.style.SUCCESS('压力测试通过：最终状态和统计字段全部一致'))
+
+    def _create_fixtures(self, prefix, user_total):
+        with connection.cursor() as cursor:
+            user_ids = []
+            for index in range(user_total + 1):
+                cursor.execute(
+                    """
+                    INSERT INTO users (username, password, protect, answer, registered_time)
+                    VALUES (%s, '!', 'stress', 'stress', NOW())
+                    """,
+                    [f'{prefix}_{index}']
+                )
+                user_ids.append(cursor.lastrowid)
+            author_id = user_ids.pop(0)
+            cursor.execute(
+                """
+                INSERT INTO blog_articles (title, content, author_id, published_at)
+                VALUES (%s, '', %s, NOW())
+                """,
+                [prefix, author_id]
+            )
+            article_id = cursor.lastrowid
+        return author_id, article_id, user_ids
+
+    def _hammer(self, phase, user_ids, author_id, article_id, threads_per_user, rounds, seed):
+        """
+        每个用户由多个线程同时操作同一篇文章和同一个作者的关系
+        mixed 轮：stats[(类型, 用户ID)] 记录成功插入次数减去成功删除次数
+        """
+        lock = threading.Lock()
+        stats = Counter()
+        errors = Counter()
+        start_barrier = threading.Barrier(len(user_ids) * threads_per_user)
+
+        def _record(kind, user_id, delta, result, message):
+            # RESULT_UNCHANGED 表示“状态本来就如此”的预期结果，其他未生效的结果都视为错误
+            with lock:
+                if result == RESULT_CHANGED:
+                    stats[(kind, user_id)] += delta
+                elif result != RESULT_UNCHANGED:
+                    errors[message] += 1
+
+        def _worker(user_id, worker_seed):
+            rng = random.Random(worker_seed)
+            try:
+                start_barrier.wait()
+                for _ in range(rounds):
+                    if phase == 'mixed':
+                        action = rng.randrange(4)
+                        if action == 0:
+                            result, message = like_article(user_id, article_id)
+                            _record('like', user_id, 1, result, message)
+                        elif action == 1:
+                            result, message = unlike_article(user_id, article_id)
+                            _record('like', user_id, -1, result, message)
+                        elif action == 2:
+                            result, message = follow_user(user_id, author_id)
+                            _record('follow', user_id, 1, result, message)
+                        else:
+                            result, message = unfollow_user(user_id, author_id)
+                            _record('follow', user_id, -1, result, message)
+                    elif rng.randrange(2):
+                        success, message, _ = toggle_like_article(user_id, article_id)
+                        _record('like', user_id, 0, RESULT_CHANGED if success else RESULT_ERROR, message)
+                    else:
+                        success, message, _ = toggle_follow_user(user_id, author_id)
+                        _record('follow', user_id, 0, RESULT_CHANGED if success else RESULT_ERROR, message)
+            except Exception as e:
+                with lock:
+                    errors[f'{type(e).__name__}: {str(e)}'] += 1
+            finally:
+                connection.close()
+
+        rng = random.Random(seed)
+        threads = [
+            threading.Thread(target=_worker, args=(user_id, rng.randrange(1 << 30)))
+            for user_id in user_ids
+            for _ in range(threads_per_user)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return stats, errors, elapsed
+
+    def _verify(self, user_ids, author_id, article_id, stats=None):
+        """校验统计字段；传入 stats 时还校验每个关系的最终状态与成功插入/删除次数之差一致"""
+        problems = []
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT user_id FROM user_liked_articles WHERE article_id = %s AND user_id IN ({placeholders})",
+                [article_id] + user_ids
+            )
+            liked = {row[0] for row in cursor.fetchall()}
+            cursor.execute(
+                f"SELECT follower_id FROM user_follows WHERE following_id = %s AND follower_id IN ({placeholders})",
+                [author_id] + user_ids
+            )
+            following = {row[0] for row in cursor.fetchall()}
+
+            cursor.execute("SELECT love_count FROM blog_articles WHERE id = %s", [article_id])
+            love_count = cursor.fetchone()[0]
+            if love_count != len(liked):
+                problems.append(f'文章 love_count={love_count}，实际喜欢数={len(liked)}')
+
+            cursor.execute("SELECT follower_count FROM users WHERE id = %s", [author_id])
+            follower_count = cursor.fetchone()[0]
+            if follower_count != len(following):
+                problems.append(f'作者 follower_count={follower_count}，实际粉丝数={len(following)}')
+
+            cursor.execute(
+                f"SELECT id, liked_article_count, follow_count FROM users WHERE id IN ({placeholders})",
+                user_ids
+            )
+            for user_id, liked_article_count, follow_count in cursor.fetchall():
+                expected_liked = 1 if user_id in liked else 0
+                expected_follow = 1 if user_id in following else 0
+                if liked_article_count != expected_liked:
+                    problems.append(f'用户 #{user_id} liked_article_count={liked_article_count}，实际={expected_liked}')
+                if follow_count != expected_follow:
+                    problems.append(f'用户 #{user_id} follow_count={follow_count}，实际={expected_follow}')
+
+        if stats is not None:
+            # 混合轮是第一轮，开始时所有关系都不存在
+            for user_id in user_ids:
+                for kind, actual in (('like', user_id in liked), ('follow', user_id in following)):
+                    delta = stats.get((kind, user_id), 0)
+                    if delta != int(actual):
+                        problems.append(
+                            f'用户 #{user_id} {kind} 成功插入减删除 = {delta}，实际状态 = {int(actual)}'
+                        )
+        return problems
+
+    def _cleanup(self, user_ids, article_id):
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM user_liked_articles WHERE user_id IN ({placeholders})", user_ids)
+            cursor.execute(
+                f"DELETE FROM user_follows WHERE follower_id IN ({placeholders}) OR following_id IN ({placeholders})",
+                user_ids + user_ids
+            )
+            cursor.execute("DELETE FROM blog_articles WHERE id = %s", [article_id])
+            cursor.execute(f"DELETE FROM users WHERE id IN ({placeholders})", user_ids)
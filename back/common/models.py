@@ -34,6 +34,9 @@ class Users(models.Model):
     class Meta:
         managed = False
         db_table = 'users'
+        indexes = [
+            models.Index(fields=['registered_time'], name='idx_registered_time'),
+        ]
     
     def __str__(self):
         return f"User {self.username} (ID: {self.id})"
@@ -102,6 +105,9 @@ class BlogArticle(models.Model):
     love_count = models.PositiveIntegerField(default=0, db_comment='喜欢数，默认0')
     comment_count = models.PositiveIntegerField(default=0, db_comment='评论数，默认0，冗余字段便于查询')
     published_at = models.DateTimeField(auto_now_add=True, db_comment='发布时间，默认服务器系统时间')
+    excerpt = models.CharField(max_length=255, blank=True, null=True, db_comment='列表摘要，去除标记后的纯文本前200字，写入时生成')
+    word_count = models.PositiveIntegerField(default=0, db_comment='正文字数，写入时生成')
+    cover_url = models.CharField(max_length=500, blank=True, null=True, db_comment='封面图地址，取正文第一张图片')
     
     class Meta:
         managed = False
@@ -110,6 +116,8 @@ class BlogArticle(models.Model):
             models.Index(fields=['author_id'], name='idx_author_id'),
             models.Index(fields=['published_at'], name='idx_published_at'),
             models.Index(fields=['view_count'], name='idx_view_count'),
+            models.Index(fields=['love_count'], name='idx_love_count'),
+            models.Index(fields=['comment_count'], name='idx_comment_count'),
         ]
     
     def __str__(self):
@@ -177,7 +185,7 @@ class ArticleComment(models.Model):
         managed = False
         db_table = 'article_comments'
         indexes = [
-            models.Index(fields=['article_id'], name='idx_article_id'),  # 查询某文章的所有评论
+            models.Index(fields=['article_id', 'created_at', 'id'], name='idx_article_comment_article_created'),  # 按文章分页查询评论
             models.Index(fields=['user_id'], name='idx_article_comment_user_id'),  # 查询某用户的所有评论
             models.Index(fields=['created_at'], name='idx_article_comment_created_at'),  # 按时间排序
         ]
@@ -186,6 +194,24 @@ class ArticleComment(models.Model):
         return f"Comment {self.id} on Article {self.article_id} by User {self.user_id}"
 
 
+class ArticleSearch(models.Model):
+    """
+    文章正文全文搜索索引表
+    只保存纯文本正文，body_text 上有 ngram 全文索引，由 common.article_search 维护；
+    标题的全文索引直接建在 blog_articles.title 上
+    """
+    article_id = models.PositiveIntegerField(primary_key=True, db_comment='文章ID，外键关联 blog_articles 表')
+    body_text = models.TextField(db_comment='去掉嵌入片段和标记后的正文纯文本')
+    updated_at = models.DateTimeField(auto_now=True, db_comment='索引更新时间')
+
+    class Meta:
+        managed = False
+        db_table = 'article_search'
+
+    def __str__(self):
+        return f"Search index of Article {self.article_id}"
+
+
 class Feedback(models.Model):
     """
     反馈意见表
@@ -218,6 +244,7 @@ class Feedback(models.Model):
             models.Index(fields=['issue_type'], name='idx_issue_type'),  # 按问题类型查询
             models.Index(fields=['is_resolved'], name='idx_is_resolved'),  # 查询已解决/未解决的反馈
             models.Index(fields=['created_at'], name='idx_feedback_created_at'),  # 按时间排序
+            models.Index(fields=['issue_type', 'created_at', 'id'], name='idx_feedback_type_created'),  # 按类型筛选后游标分页
         ]
     
     def __str__(self):
@@ -225,6 +252,178 @@ class Feedback(models.Model):
         return f"Feedback {self.id} by {user_info} - {self.issue_type}"
 
 
+class NetworkDiskUsage(models.Model):
+    """
+    网盘容量台账表
+    按用户记录网盘占用，owner_id = 0 为全局汇总行
+    """
+    owner_id = models.PositiveIntegerField(primary_key=True, db_comment='所属用户ID，0表示全局汇总行')
+    file_count = models.BigIntegerField(default=0, db_comment='文件数')
+    dir_count = models.BigIntegerField(default=0, db_comment='目录数')
+    total_bytes = models.BigIntegerField(default=0, db_comment='逻辑占用字节数（用户可见文件大小之和）')
+    saved_bytes = models.BigIntegerField(default=0, db_comment='去重存储节省的字节数（仅全局汇总行）')
+    updated_at = models.DateTimeField(auto_now=True, db_comment='最后更新时间')
+
+    class Meta:
+        managed = False
+        db_table = 'network_disk_usage'
+
+    def __str__(self):
+        return f"Disk usage of owner {self.owner_id}: {self.total_bytes} bytes"
+
+
+class NetworkDiskBlob(models.Model):
+    """
+    网盘去重存储表
+    记录 files/.blobs 下按 SHA-256 存放的文件及其被用户目录硬链接引用的次数
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True, db_comment='内容SHA-256')
+    size = models.BigIntegerField(default=0, db_comment='文件大小（字节）')
+    device = models.PositiveBigIntegerField(default=0, db_comment='blob 文件所在设备号')
+    inode = models.PositiveBigIntegerField(default=0, db_index=True, db_comment='blob 文件的 inode')
+    ref_count = models.IntegerField(default=0, db_comment='用户目录中的硬链接数')
+    created_at = models.DateTimeField(auto_now_add=True, db_comment='创建时间')
+    last_linked_at = models.DateTimeField(auto_now=True, db_comment='最近一次被链接的时间')
+
+    class Meta:
+        managed = False
+        db_table = 'network_disk_blobs'
+
+    def __str__(self):
+        return f"Blob {self.sha256[:12]} ({self.ref_count} refs)"
+
+
+class NetworkDiskLinkTime(models.Model):
+    """
+    网盘去重文件的逐路径上传时间表
+    去重文件是共享 blob 的硬链接，mtime 属于同一个 inode，列表显示和定时清理改用这里记录的各路径上传时间
+    """
+    path_hash = models.CharField(max_length=64, primary_key=True, db_comment='相对网盘根目录路径的 SHA-256')
+    path = models.CharField(max_length=1024, db_comment='相对网盘根目录的文件路径')
+    uploaded_at = models.DateTimeField(db_comment='该路径的上传时间')
+
+    class Meta:
+        managed = False
+        db_table = 'network_disk_link_times'
+
+    def __str__(self):
+        return f"Link time of {self.path}"
+
+
+class NetworkDiskUploadSession(models.Model):
+    """
+    网盘分片上传会话表
+    记录进行中的大文件分片上传及其预留的容量
+    """
+    id = models.CharField(max_length=32, primary_key=True, db_comment='上传会话ID')
+    user_id = models.PositiveIntegerField(db_comment='发起上传的用户ID')
+    owner_id = models.PositiveIntegerField(db_comment='目标文件所属用户ID（容量台账归属）')
+    target_path = models.CharField(max_length=1024, db_comment='目标文件相对 files 目录的路径')
+    file_size = models.PositiveBigIntegerField(db_comment='文件大小（字节）')
+    file_hash = models.CharField(max_length=64, blank=True, null=True, db_comment='文件 SHA-256，提交时校验，为空不校验')
+    chunk_size = models.PositiveIntegerField(db_comment='分片大小（字节）')
+    total_chunks = models.PositiveIntegerField(db_comment='分片总数')
+    reserved_bytes = models.PositiveBigIntegerField(default=0, db_comment='初始化时在容量台账上预留的字节数')
+    status = models.CharField(max_length=16, default='uploading', db_comment='状态：uploading-上传中，committing-提交中')
+    created_at = models.DateTimeField(auto_now_add=True, db_comment='创建时间')
+    expires_at = models.DateTimeField(db_comment='过期时间，每收到一个分片顺延')
+    commit_started_at = models.DateTimeField(blank=True, null=True, db_comment='开始提交的时间，提交中超时后由清理任务回滚或结算')
+    commit_old_size = models.PositiveBigIntegerField(blank=True, null=True, db_comment='提交前目标文件大小，NULL 表示新文件')
+
+    class Meta:
+        managed = False
+        db_table = 'network_disk_upload_sessions'
+        indexes = [
+            models.Index(fields=['user_id'], name='idx_upload_session_user'),
+            models.Index(fields=['expires_at'], name='idx_upload_session_expires'),
+            models.Index(fields=['status', 'commit_started_at'], name='idx_upload_session_status'),
+        ]
+
+    def __str__(self):
+        return f"Upload session {self.id} -> {self.target_path}"
+
+
+class NetworkDiskUploadChunk(models.Model):
+    """
+    网盘分片上传已接收分片表
+    联合主键 (upload_id, chunk_index)
+    """
+    pk = models.CompositePrimaryKey('upload_id', 'chunk_index')
+    upload_id = models.CharField(max_length=32, db_comment='上传会话ID')
+    chunk_index = models.PositiveIntegerField(db_comment='分片序号，从0开始')
+    chunk_size = models.PositiveIntegerField(db_comment='分片实际字节数')
+    received_at = models.DateTimeField(auto_now_add=True, db_comment='接收时间')
+
+    class Meta:
+        managed = False
+        db_table = 'network_disk_upload_chunks'
+
+    def __str__(self):
+        return f"Chunk {self.chunk_index} of upload {self.upload_id}"
+
+
+class SiteDailyStats(models.Model):
+    """
+    站点每日统计汇总表
+    每天一行，记录当日新增和总量快照，供后台统计趋势使用
+    """
+    stat_date = models.DateField(primary_key=True, db_comment='统计日期')
+    new_users = models.PositiveIntegerField(default=0, db_comment='当日新增用户数')
+    new_articles = models.PositiveIntegerField(default=0, db_comment='当日新增文章数')
+    total_users = models.PositiveIntegerField(default=0, db_comment='当日结束时总用户数')
+    total_articles = models.PositiveIntegerField(default=0, db_comment='当日结束时总文章数')
+    total_views = models.PositiveBigIntegerField(null=True, blank=True, db_comment='总浏览量快照，补齐的历史日期为NULL')
+    total_likes = models.PositiveBigIntegerField(null=True, blank=True, db_comment='总喜欢数快照，补齐的历史日期为NULL')
+    disk_file_count = models.PositiveBigIntegerField(null=True, blank=True, db_comment='网盘文件数快照，补齐的历史日期为NULL')
+    disk_total_bytes = models.PositiveBigIntegerField(null=True, blank=True, db_comment='网盘占用字节数快照，补齐的历史日期为NULL')
+    is_final = models.BooleanField(default=False, db_comment='是否已定稿，0-当天仍在刷新，1-已定稿')
+    updated_at = models.DateTimeField(auto_now=True, db_comment='最后更新时间')
+
+    class Meta:
+        managed = False
+        db_table = 'site_daily_stats'
+
+    def __str__(self):
+        return f"Site stats of {self.stat_date}"
+
+
+class BackgroundJob(models.Model):
+    """
+    后台任务队列表
+    耗时操作由视图写入、run_job_worker 领取执行，前端通过任务状态接口轮询进度
+    """
+    id = models.BigAutoField(primary_key=True, db_comment='任务ID，主键自增')
+    job_type = models.CharField(max_length=64, db_comment='任务类型')
+    payload = models.JSONField(default=dict, db_comment='任务参数')
+    status = models.CharField(max_length=16, default='queued', db_comment='状态：queued/running/succeeded/failed/cancelled')
+    progress = models.PositiveSmallIntegerField(default=0, db_comment='进度（0-100）')
+    progress_message = models.CharField(max_length=255, blank=True, null=True, db_comment='进度说明')
+    result = models.JSONField(blank=True, null=True, db_comment='执行结果')
+    error = models.TextField(blank=True, null=True, db_comment='最近一次错误信息')
+    attempts = models.PositiveIntegerField(default=0, db_comment='已尝试次数')
+    max_attempts = models.PositiveIntegerField(default=3, db_comment='最大尝试次数')
+    cancel_requested = models.BooleanField(default=False, db_comment='是否已请求取消')
+    created_by = models.PositiveIntegerField(blank=True, null=True, db_comment='提交任务的用户ID')
+    locked_by = models.CharField(max_length=64, blank=True, null=True, db_comment='执行该任务的 worker')
+    run_after = models.DateTimeField(default=timezone.now, db_comment='最早执行时间（重试延迟）')
+    heartbeat_at = models.DateTimeField(blank=True, null=True, db_comment='最近一次心跳时间')
+    created_at = models.DateTimeField(auto_now_add=True, db_comment='创建时间')
+    started_at = models.DateTimeField(blank=True, null=True, db_comment='最近一次开始执行时间')
+    finished_at = models.DateTimeField(blank=True, null=True, db_comment='结束时间')
+    updated_at = models.DateTimeField(auto_now=True, db_comment='最后更新时间')
+
+    class Meta:
+        managed = False
+        db_table = 'background_jobs'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='idx_status_run_after'),
+            models.Index(fields=['status', 'finished_at'], name='idx_status_finished_at'),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} {self.job_type} ({self.status})"
+
+
 class UpdateHistory(models.Model):
     """
     更新史表
@@ -0,0 +1,96 @@
+"""
+游标分页工具
+游标是对上一页最后一行排序键的不透明编码（URL 安全的 base64 JSON），
+列表接口据此用 WHERE (排序键) < (游标值) 继续取下一页，延迟不随翻页深度增长。
+另有每页条数、ID 列表等列表类查询参数的解析。
+"""
+import base64
+import json
+from datetime import datetime
+
+
+# 日期时间字段在游标中的标记前缀
+_DATETIME_PREFIX = '$dt:'
+
+
+def encode_cursor(values):
+    """
+    把排序键编码为游标字符串
+    values: dict，值可以是 int/str/datetime/None
+    """
+    payload = {}
+    for key, value in values.items():
+        if isinstance(value, datetime):
+            value = _DATETIME_PREFIX + value.isoformat()
+        payload[key] = value
+    raw = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, required_keys=(), key_types=None):
+    """
+    解码游标字符串
+    key_types: {键: 允许的类型或类型元组}，游标是客户端可以伪造的，值直接作为 SQL 参数前要校验类型
+    返回 dict；游标格式错误、缺少 required_keys 中的键或值类型不符时抛出 ValueError
+    """
+    if not cursor:
+        raise ValueError('游标为空')
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise ValueError('无效的游标')
+    if not isinstance(payload, dict):
+        raise ValueError('无效的游标')
+
+    values = {}
+    for key, value in payload.items():
+        if isinstance(value, str) and value.startswith(_DATETIME_PREFIX):
+            try:
+                value = datetime.fromisoformat(value[len(_DATETIME_PREFIX):])
+            except ValueError:
+                raise ValueError('无效的游标')
+        values[key] = value
+
+    for key in required_keys:
+        if key not in values:
+            raise ValueError('无效的游标')
+    for key, allowed in (key_types or {}).items():
+        value = values.get(key)
+        # bool 是 int 的子类，不能当作数值
+        if key in values and (isinstance(value, bool) or not isinstance(value, allowed)):
+            raise ValueError('无效的游标')
+    return values
+
+
+def parse_limit(raw_value, default=20, maximum=100):
+    """解析每页条数参数，非法值回落到默认值，并限制上限"""
+    try:
+        limit = int(raw_value)
+    except (TypeError, ValueError):
+        return default
+    if limit < 1:
+        return default
+    return min(limit, maximum)
+
+
+def parse_id_list(raw_value, maximum=100):
+    """
+    解析逗号分隔的ID列表参数（如 ?ids=1,2,3），去重并保持顺序
+    含非正整数或超过 maximum 个时抛出 ValueError
+    """
+    ids = []
+    seen = set()
+    for part in (raw_value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if not part.isdigit() or int(part) < 1:
+            raise ValueError('无效的ID')
+        value = int(part)
+        if value not in seen:
+            seen.add(value)
+            ids.append(value)
+    if len(ids) > maximum:
+        raise ValueError(f'一次最多查询 {maximum} 个')
+    return ids
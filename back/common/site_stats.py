@@ -0,0 +1,230 @@
+"""
+站点每日统计汇总
+site_daily_stats 每天一行：当天新增用户数、新增文章数，以及当天的总用户数、总文章数、总浏览量、总喜欢数和网盘占用快照。
+后台统计接口只读这张表，不再逐天 COUNT：
+- 今天的行最多每 TODAY_REFRESH_SECONDS 秒用一条聚合查询刷新一次，网盘数据取自容量台账
+- 已经过去但还未定稿的日期（包括缺失的日期）用按天分组的查询一次补齐并定稿，之后不再改动
+- 趋势数据（7/30/90/365 天）按主键范围一次查出
+补齐的历史日期没有浏览量、喜欢数和网盘快照（为 NULL），总用户数和总文章数由当前总数按每日新增倒推。
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from django.db import connection
+
+from network_disk import usage_ledger
+
+
+# 允许查询的趋势天数
+ALLOWED_WINDOWS = (7, 30, 90, 365)
+DEFAULT_WINDOW = 7
+# 今天的统计最多多久刷新一次（秒）
+TODAY_REFRESH_SECONDS = 60
+
+_STAT_COLUMNS = (
+    'stat_date', 'new_users', 'new_articles', 'total_users', 'total_articles',
+    'total_views', 'total_likes', 'disk_file_count', 'disk_total_bytes',
+)
+
+_state = {
+    'today': None,            # 最近一次刷新时的日期
+    'refreshed_at': 0.0,      # 最近一次刷新今天统计的时间（time.monotonic）
+    'finalized_from': None,   # 今天之前已确认定稿的最早日期
+}
+_lock = threading.Lock()
+
+
+def _day_start(day):
+    return datetime(day.year, day.month, day.day)
+
+
+def refresh_today(force=False):
+    """
+    刷新今天的统计行（距上次刷新不足 TODAY_REFRESH_SECONDS 秒时跳过，force=True 时强制刷新）
+    返回是否执行了刷新
+    """
+    today = date.today()
+    now = time.monotonic()
+    with _lock:
+        if not force and _state['today'] == today and now - _state['refreshed_at'] < TODAY_REFRESH_SECONDS:
+            return False
+
+    today_start = _day_start(today)
+    disk_usage = usage_ledger.get_usage()
+    with connection.cursor() as cursor:
+        # 一条查询取出全部总量和今日新增
+        cursor.execute("""
+            SELECT u.total, u.today_new, a.total, a.today_new, a.views, a.likes
+            FROM (
+                SELECT COUNT(*) AS total,
+                       COALESCE(SUM(registered_time >= %s), 0) AS today_new
+                FROM users
+            ) u
+            CROSS JOIN (
+                SELECT COUNT(*) AS total,
+                       COALESCE(SUM(published_at >= %s), 0) AS today_new,
+                       COALESCE(SUM(view_count), 0) AS views,
+                       COALESCE(SUM(love_count), 0) AS likes
+                FROM blog_articles
+            ) a
+        """, [today_start, today_start])
+        total_users, new_users, total_articles, new_articles, total_views, total_likes = cursor.fetchone()
+
+        cursor.execute("""
+            INSERT INTO site_daily_stats
+                (stat_date, new_users, new_articles, total_users, total_articles,
+                 total_views, total_likes, disk_file_count, disk_total_bytes, is_final)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 0)
+            ON DUPLICATE KEY UPDATE
+                new_users = VALUES(new_users),
+                new_articles = VALUES(new_articles),
+                total_users = VALUES(total_users),
+                total_articles = VALUES(total_articles),
+                total_views = VALUES(total_views),
+                total_likes = VALUES(total_likes),
+                disk_file_count = VALUES(disk_file_count),
+                disk_total_bytes = VALUES(disk_total_bytes)
+        """, [
+            today, int(new_users), int(new_articles), total_users, total_articles,
+            int(total_views), int(total_likes), disk_usage['file_count'], disk_usage['total_bytes'],
+        ])
+
+    with _lock:
+        if _state['today'] != today:
+            # 跨天后需要重新检查过去日期是否定稿
+            _state['finalized_from'] = None
+        _state['today'] = today
+        _state['refreshed_at'] = now
+    return True
+
+
+def finalize_past_days(days):
+    """
+    补齐并定稿最近 days 天中今天之前的统计行
+    依赖今天的统计行（先调用 refresh_today），返回本次定稿的天数
+    """
+    today = date.today()
+    start = today - timedelta(days=days - 1)
+    with _lock:
+        finalized_from = _state['finalized_from'] if _state['today'] == today else None
+    if finalized_from is not None and finalized_from <= start:
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT stat_date FROM site_daily_stats
+            WHERE stat_date >= %s AND stat_date < %s AND is_final = 1
+        """, [start, today])
+        final_days = {row[0] for row in cursor.fetchall()}
+        pending = [
+            start + timedelta(days=offset)
+            for offset in range(days - 1)
+            if start + timedelta(days=offset) not in final_days
+        ]
+
+        if pending:
+            range_start = _day_start(pending[0])
+            range_end = _day_start(today)
+            cursor.execute("""
+                SELECT DATE(registered_time), COUNT(*) FROM users
+                WHERE registered_time >= %s AND registered_time < %s
+                GROUP BY DATE(registered_time)
+            """, [range_start, range_end])
+            new_users = dict(cursor.fetchall())
+            cursor.execute("""
+                SELECT DATE(published_at), COUNT(*) FROM blog_articles
+                WHERE published_at >= %s AND published_at < %s
+                GROUP BY DATE(published_at)
+            """, [range_start, range_end])
+            new_articles = dict(cursor.fetchall())
+
+            cursor.execute("""
+                SELECT new_users, new_articles, total_users, total_articles
+                FROM site_daily_stats WHERE stat_date = %s
+            """, [today])
+            today_row = cursor.fetchone() or (0, 0, 0, 0)
+
+            # 从今天的总数倒推每一天结束时的总数
+            running_users = today_row[2] - today_row[0]
+            running_articles = today_row[3] - today_row[1]
+            pending_set = set(pending)
+            params = []
+            day = today - timedelta(days=1)
+            while day >= pending[0]:
+                day_users = new_users.get(day, 0)
+                day_articles = new_articles.get(day, 0)
+                if day in pending_set:
+                    params.append([
+                        day, day_users, day_articles,
+                        max(running_users, 0), max(running_articles, 0),
+                    ])
+                running_users -= day_users
+                running_articles -= day_articles
+                day -= timedelta(days=1)
+
+            cursor.executemany("""
+                INSERT INTO site_daily_stats
+                    (stat_date, new_users, new_articles, total_users, total_articles, is_final)
+                VALUES (%s, %s, %s, %s, %s, 1)
+                ON DUPLICATE KEY UPDATE
+                    new_users = VALUES(new_users),
+                    new_articles = VALUES(new_articles),
+                    total_users = VALUES(total_users),
+                    total_articles = VALUES(total_articles),
+                    is_final = 1
+            """, params)
+
+    with _lock:
+        if _state['today'] == today:
+            current = _state['finalized_from']
+            _state['finalized_from'] = start if current is None else min(current, start)
+    return len(pending)
+
+
+def get_site_statistics(days=DEFAULT_WINDOW):
+    """
+    获取后台统计数据
+    返回 (summary, trend)：summary 为今天的总量快照，trend 为最近 days 天每天一项
+    """
+    refresh_today()
+    finalize_past_days(days)
+
+    today = date.today()
+    start = today - timedelta(days=days - 1)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT {', '.join(_STAT_COLUMNS)}
+            FROM site_daily_stats
+            WHERE stat_date BETWEEN %s AND %s
+            ORDER BY stat_date
+        """, [start, today])
+        rows = {row[0]: dict(zip(_STAT_COLUMNS, row)) for row in cursor.fetchall()}
+
+    trend = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        row = rows.get(day, {})
+        trend.append({
+            'date': day.strftime('%Y-%m-%d'),
+            'users': row.get('new_users') or 0,
+            'articles': row.get('new_articles') or 0,
+            'total_users': row.get('total_users'),
+            'total_articles': row.get('total_articles'),
+            'total_views': row.get('total_views'),
+            'total_likes': row.get('total_likes'),
+            'disk_total_bytes': row.get('disk_total_bytes'),
+        })
+
+    today_row = rows.get(today, {})
+    summary = {
+        'total_users': today_row.get('total_users') or 0,
+        'today_new_users': today_row.get('new_users') or 0,
+        'total_articles': today_row.get('total_articles') or 0,
+        'today_new_articles': today_row.get('new_articles') or 0,
+        'total_views': today_row.get('total_views') or 0,
+        'total_likes': today_row.get('total_likes') or 0,
+        'disk_file_count': today_row.get('disk_file_count') or 0,
+        'disk_total_bytes': today_row.get('disk_total_bytes') or 0,
+    }
+    return summary, trend
@@ -1,22 +1,63 @@
 """
 用户关系操作工具函数
 提供关注、取消关注、喜欢文章、取消喜欢等操作的封装
+写操作都是单条 INSERT IGNORE / DELETE 语句，由影响行数决定结果，并发的重复请求不会产生唯一键冲突，
+统计字段由数据库触发器随实际插入/删除的行更新。
+INSERT ... SELECT 同时连接操作者和目标行：INSERT IGNORE 会把外键错误降级为警告，
+操作者已被删除（令牌仍有效）时不会插入，再按存在性检查区分结果，而不是误报为“已经关注/喜欢过”。
+写操作返回 (结果码, 提示信息)，调用方按结果码分支，提示信息只用于展示
 """
-from django.db import transaction
-from django.db.models import F
+from django.db import connection, OperationalError
 from common.models import Users, UserFollow, UserLikedArticle, BlogArticle
 
 
+# 关系写入遇到死锁 / 锁等待超时时的最多尝试次数
+RELATION_WRITE_RETRIES = 3
+# MySQL 死锁、锁等待超时错误码
+_RETRYABLE_ERROR_CODES = (1213, 1205)
+
+# 写操作结果码
+RESULT_CHANGED = 'changed'                # 已插入/删除
+RESULT_UNCHANGED = 'unchanged'            # 关系本来就是目标状态（已关注、未喜欢等）
+RESULT_ACTOR_MISSING = 'actor_missing'    # 操作者（当前用户）不存在
+RESULT_TARGET_MISSING = 'target_missing'  # 被关注的用户或文章不存在
+RESULT_ERROR = 'error'                    # 数据库错误
+
+
+def _execute_change(sql, params):
+    """
+    执行一条关系写入/删除语句，返回影响行数
+    关注/喜欢的触发器会同时更新 users、blog_articles 的统计行，并发时可能发生死锁或锁等待超时，
+    整条语句回滚后重试，不会重复计数
+    """
+    for attempt in range(RELATION_WRITE_RETRIES):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                return cursor.rowcount
+        except OperationalError as e:
+            if e.args and e.args[0] in _RETRYABLE_ERROR_CODES and attempt < RELATION_WRITE_RETRIES - 1:
+                continue
+            raise
+
+
+def _row_exists(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone() is not None
+
+
 def follow_user(follower_id, following_id):
     """
     关注用户
+    单条 INSERT IGNORE，按影响行数判断结果：重复关注（包括并发的重复请求）不会报唯一键冲突
     
     Args:
         follower_id: 关注者ID
         following_id: 被关注者ID
     
     Returns:
-        tuple: (success: bool, message: str)
+        tuple: (result: str, message: str)，result 为 RESULT_* 结果码
     
     Raises:
         ValueError: 如果尝试关注自己
@@ -24,121 +65,151 @@ def follow_user(follower_id, following_id):
     if follower_id == following_id:
         raise ValueError("不能关注自己")
     
-    # 检查是否已经关注
-    if UserFollow.objects.filter(
-        follower_id=follower_id,
-        following_id=following_id
-    ).exists():
-        return False, "已经关注过该用户"
-    
     try:
-        with transaction.atomic():
-            # 创建关注关系（触发器会自动更新统计字段）
-            UserFollow.objects.create(
-                follower_id=follower_id,
-                following_id=following_id
-            )
-        
-        return True, "关注成功"
+        # 创建关注关系（触发器会自动更新统计字段）；关注者或被关注者不存在时不会插入
+        inserted = _execute_change("""
+            INSERT IGNORE INTO user_follows (follower_id, following_id, created_at)
+            SELECT f.id, t.id, NOW()
+            FROM users f
+            JOIN users t ON t.id = %s
+            WHERE f.id = %s
+        """, [following_id, follower_id])
+        if inserted:
+            return RESULT_CHANGED, "关注成功"
+        if not _row_exists("SELECT 1 FROM users WHERE id = %s", [follower_id]):
+            return RESULT_ACTOR_MISSING, "当前用户不存在"
+        if not _row_exists("SELECT 1 FROM users WHERE id = %s", [following_id]):
+            return RESULT_TARGET_MISSING, "用户不存在"
+        return RESULT_UNCHANGED, "已经关注过该用户"
     except Exception as e:
-        return False, f"关注失败: {str(e)}"
+        return RESULT_ERROR, f"关注失败: {str(e)}"
 
 
 def unfollow_user(follower_id, following_id):
     """
     取消关注用户
+    单条 DELETE，按影响行数判断是否原本已关注
     
     Args:
         follower_id: 关注者ID
         following_id: 被关注者ID
     
     Returns:
-        tuple: (success: bool, message: str)
+        tuple: (result: str, message: str)，result 为 RESULT_* 结果码
     """
-    # 检查是否已经关注
-    if not UserFollow.objects.filter(
-        follower_id=follower_id,
-        following_id=following_id
-    ).exists():
-        return False, "未关注该用户"
-    
     try:
-        with transaction.atomic():
-            # 删除关注关系（触发器会自动更新统计字段）
-            UserFollow.objects.filter(
-                follower_id=follower_id,
-                following_id=following_id
-            ).delete()
-        
-        return True, "取消关注成功"
+        # 删除关注关系（触发器会自动更新统计字段）
+        deleted = _execute_change(
+            "DELETE FROM user_follows WHERE follower_id = %s AND following_id = %s",
+            [follower_id, following_id]
+        )
+        if deleted:
+            return RESULT_CHANGED, "取消关注成功"
+        return RESULT_UNCHANGED, "未关注该用户"
     except Exception as e:
-        return False, f"取消关注失败: {str(e)}"
+        return RESULT_ERROR, f"取消关注失败: {str(e)}"
+
+
+def toggle_follow_user(follower_id, following_id):
+    """
+    切换关注状态：先尝试取消关注，没有可删除的关系时再关注
+    不需要事先查询状态；并发的多次切换按到达顺序依次生效
+    
+    Returns:
+        tuple: (success: bool, message: str, is_following: bool)
+    
+    Raises:
+        ValueError: 如果尝试关注自己
+    """
+    if follower_id == following_id:
+        raise ValueError("不能关注自己")
+    result, message = unfollow_user(follower_id, following_id)
+    if result == RESULT_CHANGED:
+        return True, message, False
+    if result != RESULT_UNCHANGED:
+        return False, message, False
+    result, message = follow_user(follower_id, following_id)
+    if result == RESULT_UNCHANGED:
+        # 并发请求已经建立了关注关系，结果与本次期望一致
+        return True, "关注成功", True
+    return result == RESULT_CHANGED, message, result == RESULT_CHANGED
 
 
 def like_article(user_id, article_id):
     """
     喜欢文章
+    单条 INSERT IGNORE，按影响行数判断结果：重复喜欢（包括并发的重复请求）不会报唯一键冲突
     
     Args:
         user_id: 用户ID
         article_id: 文章ID
     
     Returns:
-        tuple: (success: bool, message: str)
+        tuple: (result: str, message: str)，result 为 RESULT_* 结果码
     """
-    # 检查文章是否存在
-    if not BlogArticle.objects.filter(id=article_id).exists():
-        return False, "文章不存在"
-    
-    # 检查是否已经喜欢
-    if UserLikedArticle.objects.filter(
-        user_id=user_id,
-        article_id=article_id
-    ).exists():
-        return False, "已经喜欢过该文章"
-    
     try:
-        with transaction.atomic():
-            # 创建喜欢关系（触发器会自动更新统计字段）
-            UserLikedArticle.objects.create(
-                user_id=user_id,
-                article_id=article_id
-            )
-        
-        return True, "喜欢成功"
+        # 创建喜欢关系（触发器会自动更新统计字段）；用户或文章不存在时不会插入
+        inserted = _execute_change("""
+            INSERT IGNORE INTO user_liked_articles (user_id, article_id, created_at)
+            SELECT u.id, a.id, NOW()
+            FROM users u
+            JOIN blog_articles a ON a.id = %s
+            WHERE u.id = %s
+        """, [article_id, user_id])
+        if inserted:
+            return RESULT_CHANGED, "喜欢成功"
+        if not _row_exists("SELECT 1 FROM users WHERE id = %s", [user_id]):
+            return RESULT_ACTOR_MISSING, "当前用户不存在"
+        if not _row_exists("SELECT 1 FROM blog_articles WHERE id = %s", [article_id]):
+            return RESULT_TARGET_MISSING, "文章不存在"
+        return RESULT_UNCHANGED, "已经喜欢过该文章"
     except Exception as e:
-        return False, f"喜欢失败: {str(e)}"
+        return RESULT_ERROR, f"喜欢失败: {str(e)}"
 
 
 def unlike_article(user_id, article_id):
     """
     取消喜欢文章
+    单条 DELETE，按影响行数判断是否原本已喜欢
     
     Args:
         user_id: 用户ID
         article_id: 文章ID
     
     Returns:
-        tuple: (success: bool, message: str)
+        tuple: (result: str, message: str)，result 为 RESULT_* 结果码
     """
-    # 检查是否已经喜欢
-    if not UserLikedArticle.objects.filter(
-        user_id=user_id,
-        article_id=article_id
-    ).exists():
-        return False, "未喜欢该文章"
-    
     try:
-        with transaction.atomic():
-            # 删除喜欢关系（触发器会自动更新统计字段）
-            UserLikedArticle.objects.filter(
-                user_id=user_id,
-                article_id=article_id
-            ).delete()
-        
-        return True, "取消喜欢成功"
+        # 删除喜欢关系（触发器会自动更新统计字段）
+        deleted = _execute_change(
+            "DELETE FROM user_liked_articles WHERE user_id = %s AND article_id = %s",
+            [user_id, article_id]
+        )
+        if deleted:
+            return RESULT_CHANGED, "取消喜欢成功"
+        return RESULT_UNCHANGED, "未喜欢该文章"
     except Exception as e:
-        return False, f"取消喜欢失败: {str(e)}"
+        return RESULT_ERROR, f"取消喜欢失败: {str(e)}"
+
+
+def toggle_like_article(user_id, article_id):
+    """
+    切换喜欢状态：先尝试取消喜欢，没有可删除的关系时再喜欢
+    不需要事先查询状态；并发的多次切换按到达顺序依次生效
+    
+    Returns:
+        tuple: (success: bool, message: str, is_liked: bool)
+    """
+    result, message = unlike_article(user_id, article_id)
+    if result == RESULT_CHANGED:
+        return True, message, False
+    if result != RESULT_UNCHANGED:
+        return False, message, False
+    result, message = like_article(user_id, article_id)
+    if result == RESULT_UNCHANGED:
+        # 并发请求已经建立了喜欢关系，结果与本次期望一致
+        return True, "喜欢成功", True
+    return result == RESULT_CHANGED, message, result == RESULT_CHANGED
 
 
 def get_user_following(user_id):
@@ -239,4 +310,39 @@ def is_liked_article(user_id, article_id):
     ).exists()
 
 
+def get_liked_article_ids(user_id, article_ids):
+    """
+    批量检查用户喜欢了哪些文章（一次 IN 查询）
+    
+    Args:
+        user_id: 用户ID
+        article_ids: 文章ID列表
+    
+    Returns:
+        set: 其中已喜欢的文章ID
+    """
+    if not user_id or not article_ids:
+        return set()
+    return set(UserLikedArticle.objects.filter(
+        user_id=user_id,
+        article_id__in=list(article_ids)
+    ).values_list('article_id', flat=True))
+
 
+def get_following_ids(follower_id, user_ids):
+    """
+    批量检查用户关注了哪些用户（一次 IN 查询）
+    
+    Args:
+        follower_id: 关注者ID
+        user_ids: 被检查的用户ID列表
+    
+    Returns:
+        set: 其中已关注的用户ID
+    """
+    if not follower_id or not user_ids:
+        return set()
+    return set(UserFollow.objects.filter(
+        follower_id=follower_id,
+        following_id__in=list(user_ids)
+    ).values_list('following_id', flat=True))
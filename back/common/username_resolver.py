@@ -0,0 +1,122 @@
+"""
+用户名批量解析工具
+把一批用户ID一次性转换为用户名：先查进程内 TTL 缓存，未命中的ID合并为一条 WHERE id IN (...) 查询。
+修改用户名、删除用户时调用 invalidate_username：提升共享缓存中的代数（见 common.cache_generation），
+各网站工作进程和后台任务进程在下一次解析时清空自己的缓存。
+"""
+import threading
+import time
+
+from django.db import connection
+
+from common.cache_generation import get_generation, bump_generation
+
+
+# 缓存有效期（秒）
+CACHE_TTL_SECONDS = 5 * 60
+# 缓存条目上限，超过后整体清空，避免无限增长
+CACHE_MAX_ENTRIES = 10000
+# 单条 IN 查询的最大ID数
+QUERY_BATCH_SIZE = 500
+
+# 共享缓存中的代数键
+GENERATION_KEY = 'username_resolver:generation'
+
+_cache = {}  # {user_id: (username, expires_at)}
+_cache_generation = [None]  # 本进程缓存所对应的代数
+_lock = threading.Lock()
+
+
+def _sync_generation(generation):
+    """代数变化时清空本进程缓存（调用方持有 _lock）"""
+    if _cache_generation[0] != generation:
+        _cache.clear()
+        _cache_generation[0] = generation
+
+
+def _normalize_ids(user_ids):
+    """过滤非法ID并转换为 int，保持去重"""
+    normalized = set()
+    for user_id in user_ids:
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            continue
+        if user_id > 0:
+            normalized.add(user_id)
+    return normalized
+
+
+def resolve_usernames(user_ids):
+    """
+    批量获取用户名
+    返回 {user_id: username}，不存在的用户不出现在结果中（不缓存未命中，新注册用户可立即解析）
+    """
+    ids = _normalize_ids(user_ids)
+    if not ids:
+        return {}
+
+    now = time.monotonic()
+    generation = get_generation(GENERATION_KEY)
+    result = {}
+    missing = []
+    with _lock:
+        _sync_generation(generation)
+        for user_id in ids:
+            cached = _cache.get(user_id)
+            if cached and cached[1] > now:
+                result[user_id] = cached[0]
+            else:
+                missing.append(user_id)
+
+    if not missing:
+        return result
+
+    fetched = {}
+    with connection.cursor() as cursor:
+        for start in range(0, len(missing), QUERY_BATCH_SIZE):
+            batch = missing[start:start + QUERY_BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f"SELECT id, username FROM users WHERE id IN ({placeholders})",
+                batch
+            )
+            for row in cursor.fetchall():
+                fetched[row[0]] = row[1]
+
+    expires_at = now + CACHE_TTL_SECONDS
+    with _lock:
+        # 查库期间代数已变化（其他进程刚失效过）时不写入，避免缓存旧用户名
+        if _cache_generation[0] == generation:
+            if len(_cache) + len(fetched) > CACHE_MAX_ENTRIES:
+                _cache.clear()
+            for user_id, username in fetched.items():
+                _cache[user_id] = (username, expires_at)
+
+    result.update(fetched)
+    return result
+
+
+def resolve_username(user_id):
+    """获取单个用户名，不存在时返回 None"""
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    return resolve_usernames([user_id]).get(user_id)
+
+
+def invalidate_username(user_id=None):
+    """
+    使某个用户（不传则全部）的用户名缓存失效
+    本进程立即删除对应条目；提升代数使其他进程的缓存整体失效（改名、删除用户很少，整体清空代价可以忽略）
+    """
+    bump_generation(GENERATION_KEY)
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            try:
+                _cache.pop(int(user_id), None)
+            except (TypeError, ValueError):
+                pass
@@ -5,7 +5,8 @@ from django.db import connection
 from django.contrib.auth.hashers import make_password, check_password
 from common.jwt_utils import jwt_required
 from common.captcha_utils import captcha_required
-from common.user_relation_utils import follow_user, unfollow_user, is_following
+from common.user_relation_utils import toggle_follow_user, is_following, get_following_ids
+from common.pagination import parse_id_list
 import os
 import json
 from pathlib import Path
@@ -166,22 +167,15 @@ def toggle_follow(request, user_id):
                 'error': '不能关注自己'
             }, status=400)
         
-        # 检查是否已关注
-        is_following_user = is_following(current_user_id, target_user_id)
-        
-        if is_following_user:
-            # 取消关注
-            success, message = unfollow_user(current_user_id, target_user_id)
-        else:
-            # 关注
-            success, message = follow_user(current_user_id, target_user_id)
+        # 单条语句切换关注状态（不事先查询，避免并发重复点击产生冲突）
+        success, message, now_following = toggle_follow_user(current_user_id, target_user_id)
         
         if success:
             return JsonResponse({
                 'success': True,
                 'message': message,
                 'data': {
-                    'is_following': not is_following_user
+                    'is_following': now_following
                 }
             })
         else:
@@ -236,6 +230,43 @@ def check_follow_status(request, user_id):
         }, status=500)
 
 
+# 批量查询关注状态一次最多的用户数
+MAX_FOLLOW_STATUS_IDS = 100
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def check_follow_status_batch(request):
+    """
+    批量检查当前用户是否关注了一组用户（用户卡片列表使用，一次 IN 查询）
+    ?ids=1,2,3，访客全部返回 False
+    """
+    try:
+        try:
+            target_ids = parse_id_list(request.GET.get('ids'), maximum=MAX_FOLLOW_STATUS_IDS)
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+        
+        current_user_id = getattr(request, 'user_id', None)
+        following_ids = get_following_ids(current_user_id, target_ids)
+        
+        return JsonResponse({
+            'success': True,
+            'data': {
+                'statuses': {str(target_id): target_id in following_ids for target_id in target_ids}
+            }
+        })
+            
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'检查失败: {str(e)}'
+        }, status=500)
+
+
 @csrf_exempt
 @jwt_required
 @require_http_methods(["POST"])
@@ -440,6 +471,11 @@ def get_user_following_list(request, user_id):
                     'follower_count': row[7] if len(row) > 7 else 0
                 })
             
+            # 当前登录用户是否关注了列表中的用户（一次 IN 查询）
+            my_following_ids = get_following_ids(getattr(request, 'user_id', None), [item['id'] for item in following_list])
+            for item in following_list:
+                item['followed_by_me'] = item['id'] in my_following_ids
+            
             return JsonResponse({
                 'success': True,
                 'data': {
@@ -488,6 +524,11 @@ def get_user_followers_list(request, user_id):
                     'follower_count': row[7] if len(row) > 7 else 0
                 })
             
+            # 当前登录用户是否关注了列表中的用户（一次 IN 查询）
+            my_following_ids = get_following_ids(getattr(request, 'user_id', None), [item['id'] for item in followers_list])
+            for item in followers_list:
+                item['followed_by_me'] = item['id'] in my_following_ids
+            
             return JsonResponse({
                 'success': True,
                 'data': {
@@ -514,9 +555,10 @@ def get_user_liked_articles_list(request, user_id):
         
         with connection.cursor() as cursor:
             cursor.execute("""
-                SELECT ba.id, ba.title, ba.content, ba.author_id, ba.view_count,
+                SELECT ba.id, ba.title, COALESCE(ba.excerpt, LEFT(ba.content, 200)) as excerpt,
+                       ba.author_id, ba.view_count,
                        ba.love_count, ba.comment_count, ba.published_at,
-                       u.username as author_name
+                       u.username as author_name, ba.word_count, ba.cover_url
                 FROM blog_articles ba
                 INNER JOIN user_liked_articles ula ON ba.id = ula.article_id
                 INNER JOIN users u ON ba.author_id = u.id
@@ -530,7 +572,10 @@ def get_user_liked_articles_list(request, user_id):
                 articles_list.append({
                     'id': row[0],
                     'title': row[1],
-                    'content': row[2][:200] if row[2] else '',  # 只返回前200字符
+                    'excerpt': row[2] or '',
+                    'content': row[2] or '',  # 列表只返回摘要
+                    'word_count': row[9] or 0,
+                    'cover_url': row[10],
                     'author_id': row[3],
                     'author_name': row[8],
                     'view_count': row[4] if len(row) > 4 else 0,
@@ -565,8 +610,9 @@ def get_user_articles_list(request, user_id):
         
         with connection.cursor() as cursor:
             cursor.execute("""
-                SELECT id, title, content, author_id, view_count,
-                       love_count, comment_count, published_at
+                SELECT id, title, COALESCE(excerpt, LEFT(content, 200)) as excerpt,
+                       author_id, view_count,
+                       love_count, comment_count, published_at, word_count, cover_url
                 FROM blog_articles
                 WHERE author_id = %s
                 ORDER BY published_at DESC
@@ -578,7 +624,10 @@ def get_user_articles_list(request, user_id):
                 articles_list.append({
                     'id': row[0],
                     'title': row[1],
-                    'content': row[2][:200] if row[2] else '',  # 只返回前200字符
+                    'excerpt': row[2] or '',
+                    'content': row[2] or '',  # 列表只返回摘要
+                    'word_count': row[8] or 0,
+                    'cover_url': row[9],
                     'author_id': row[3],
                     'view_count': row[4] if len(row) > 4 else 0,
                     'love_count': row[5] if len(row) > 5 else 0,
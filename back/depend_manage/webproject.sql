@@ -14,6 +14,8 @@
 /*!40014 SET @OLD_FOREIGN_KEY_CHECKS=@@FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS=0 */;
 /*!40101 SET @OLD_SQL_MODE=@@SQL_MODE, SQL_MODE='NO_AUTO_VALUE_ON_ZERO' */;
 /*!40111 SET @OLD_SQL_NOTES=@@SQL_NOTES, SQL_NOTES=0 */;
+-- 全文索引使用 ngram 分词，关闭停用词（默认停用词会让包含 a、i 等字母的 ngram 词元不被索引）
+SET SESSION innodb_ft_enable_stopword = 0;
 
 --
 -- Table structure for table `article_comments`
@@ -29,7 +31,7 @@ CREATE TABLE `article_comments` (
   `content` varchar(200) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '评论内容，最多200字',
   `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '评论时间，默认服务器系统时间',
   PRIMARY KEY (`id`),
-  KEY `idx_article_id` (`article_id`),
+  KEY `idx_article_comment_article_created` (`article_id`,`created_at`,`id`),
   KEY `idx_article_comment_user_id` (`user_id`),
   KEY `idx_article_comment_created_at` (`created_at`),
   CONSTRAINT `article_comments_ibfk_1` FOREIGN KEY (`article_id`) REFERENCES `blog_articles` (`id`) ON DELETE CASCADE ON UPDATE CASCADE,
@@ -83,6 +85,56 @@ DELIMITER ;
 /*!50003 SET character_set_results = @saved_cs_results */ ;
 /*!50003 SET collation_connection  = @saved_col_connection */ ;
 
+--
+-- Table structure for table `article_search`
+--
+
+DROP TABLE IF EXISTS `article_search`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `article_search` (
+  `article_id` int unsigned NOT NULL COMMENT '文章ID，外键关联 blog_articles 表',
+  `body_text` mediumtext COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '去掉嵌入片段和标记后的正文纯文本',
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '索引更新时间',
+  PRIMARY KEY (`article_id`),
+  FULLTEXT KEY `ft_article_search_body` (`body_text`) /*!50100 WITH PARSER `ngram` */,
+  CONSTRAINT `article_search_ibfk_1` FOREIGN KEY (`article_id`) REFERENCES `blog_articles` (`id`) ON DELETE CASCADE ON UPDATE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='文章正文全文搜索索引表';
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `background_jobs`
+--
+
+DROP TABLE IF EXISTS `background_jobs`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `background_jobs` (
+  `id` bigint unsigned NOT NULL AUTO_INCREMENT COMMENT '任务ID，主键自增',
+  `job_type` varchar(64) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '任务类型（见 common/job_queue.py JOB_HANDLERS）',
+  `payload` json NOT NULL COMMENT '任务参数',
+  `status` varchar(16) COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT 'queued' COMMENT '状态：queued/running/succeeded/failed/cancelled',
+  `progress` tinyint unsigned NOT NULL DEFAULT '0' COMMENT '进度（0-100）',
+  `progress_message` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '进度说明',
+  `result` json DEFAULT NULL COMMENT '执行结果',
+  `error` text COLLATE utf8mb4_unicode_ci COMMENT '最近一次错误信息',
+  `attempts` int unsigned NOT NULL DEFAULT '0' COMMENT '已尝试次数',
+  `max_attempts` int unsigned NOT NULL DEFAULT '3' COMMENT '最大尝试次数',
+  `cancel_requested` tinyint(1) NOT NULL DEFAULT '0' COMMENT '是否已请求取消',
+  `created_by` int unsigned DEFAULT NULL COMMENT '提交任务的用户ID',
+  `locked_by` varchar(64) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '执行该任务的 worker',
+  `run_after` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '最早执行时间（重试延迟）',
+  `heartbeat_at` datetime DEFAULT NULL COMMENT '最近一次心跳时间',
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  `started_at` datetime DEFAULT NULL COMMENT '最近一次开始执行时间',
+  `finished_at` datetime DEFAULT NULL COMMENT '结束时间',
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最后更新时间',
+  PRIMARY KEY (`id`),
+  KEY `idx_status_run_after` (`status`,`run_after`),
+  KEY `idx_status_finished_at` (`status`,`finished_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='后台任务队列表';
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `blog_articles`
 --
@@ -99,10 +151,16 @@ CREATE TABLE `blog_articles` (
   `love_count` int unsigned NOT NULL DEFAULT '0' COMMENT '喜欢数，默认0',
   `comment_count` int unsigned NOT NULL DEFAULT '0' COMMENT '评论数，默认0，冗余字段便于查询',
   `published_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '发布时间，默认服务器系统时间',
+  `excerpt` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '列表摘要，去除标记后的纯文本前200字，写入时生成',
+  `word_count` int unsigned NOT NULL DEFAULT '0' COMMENT '正文字数，写入时生成',
+  `cover_url` varchar(500) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '封面图地址，取正文第一张图片',
   PRIMARY KEY (`id`),
   KEY `idx_author_id` (`author_id`),
   KEY `idx_published_at` (`published_at`),
   KEY `idx_view_count` (`view_count`),
+  KEY `idx_love_count` (`love_count`),
+  KEY `idx_comment_count` (`comment_count`),
+  FULLTEXT KEY `ft_blog_articles_title` (`title`) /*!50100 WITH PARSER `ngram` */,
   CONSTRAINT `blog_articles_ibfk_1` FOREIGN KEY (`author_id`) REFERENCES `users` (`id`) ON UPDATE CASCADE
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='博客文章表';
 /*!40101 SET character_set_client = @saved_cs_client */;
@@ -240,10 +298,134 @@ CREATE TABLE `feedbacks` (
   KEY `idx_issue_type` (`issue_type`),
   KEY `idx_is_resolved` (`is_resolved`),
   KEY `idx_feedback_created_at` (`created_at`),
+  KEY `idx_feedback_type_created` (`issue_type`,`created_at`,`id`),
   CONSTRAINT `feedbacks_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE SET NULL ON UPDATE CASCADE
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='反馈意见表';
 /*!40101 SET character_set_client = @saved_cs_client */;
 
+--
+-- Table structure for table `network_disk_blobs`
+--
+
+DROP TABLE IF EXISTS `network_disk_blobs`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `network_disk_blobs` (
+  `sha256` char(64) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '内容SHA-256，对应 files/.blobs 下的文件名',
+  `size` bigint NOT NULL DEFAULT '0' COMMENT '文件大小（字节）',
+  `device` bigint unsigned NOT NULL DEFAULT '0' COMMENT 'blob 文件所在设备号',
+  `inode` bigint unsigned NOT NULL DEFAULT '0' COMMENT 'blob 文件的 inode，删除用户文件时据此反查 blob',
+  `ref_count` int NOT NULL DEFAULT '0' COMMENT '用户目录中的硬链接数',
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  `last_linked_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '最近一次被链接的时间',
+  PRIMARY KEY (`sha256`),
+  KEY `idx_inode` (`inode`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='网盘去重存储表';
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `network_disk_link_times`
+--
+
+DROP TABLE IF EXISTS `network_disk_link_times`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `network_disk_link_times` (
+  `path_hash` char(64) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '相对网盘根目录路径的 SHA-256（SHA2(path, 256)）',
+  `path` varchar(1024) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '相对网盘根目录的文件路径',
+  `uploaded_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '该路径的上传时间（共享 inode 的 mtime 不能区分各副本）',
+  PRIMARY KEY (`path_hash`),
+  KEY `idx_path` (`path`(191))
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='网盘去重文件的逐路径上传时间表';
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `network_disk_usage`
+--
+
+DROP TABLE IF EXISTS `network_disk_usage`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `network_disk_usage` (
+  `owner_id` int unsigned NOT NULL COMMENT '所属用户ID，0表示全局汇总行',
+  `file_count` bigint NOT NULL DEFAULT '0' COMMENT '文件数',
+  `dir_count` bigint NOT NULL DEFAULT '0' COMMENT '目录数',
+  `total_bytes` bigint NOT NULL DEFAULT '0' COMMENT '逻辑占用字节数（用户可见文件大小之和）',
+  `saved_bytes` bigint NOT NULL DEFAULT '0' COMMENT '去重存储节省的字节数（仅全局汇总行），物理占用=total_bytes-saved_bytes',
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最后更新时间',
+  PRIMARY KEY (`owner_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='网盘容量台账表';
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `network_disk_upload_sessions`
+--
+
+DROP TABLE IF EXISTS `network_disk_upload_sessions`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `network_disk_upload_sessions` (
+  `id` char(32) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '上传会话ID',
+  `user_id` int unsigned NOT NULL COMMENT '发起上传的用户ID',
+  `owner_id` int unsigned NOT NULL COMMENT '目标文件所属用户ID（容量台账归属）',
+  `target_path` varchar(1024) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '目标文件相对 files 目录的路径',
+  `file_size` bigint unsigned NOT NULL COMMENT '文件大小（字节）',
+  `file_hash` char(64) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '文件 SHA-256，提交时校验，为空不校验',
+  `chunk_size` int unsigned NOT NULL COMMENT '分片大小（字节）',
+  `total_chunks` int unsigned NOT NULL COMMENT '分片总数',
+  `reserved_bytes` bigint unsigned NOT NULL DEFAULT '0' COMMENT '初始化时在容量台账上预留的字节数',
+  `status` varchar(16) COLLATE utf8mb4_unicode_ci NOT NULL DEFAULT 'uploading' COMMENT '状态：uploading-上传中，committing-提交中',
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  `expires_at` datetime NOT NULL COMMENT '过期时间，每收到一个分片顺延',
+  `commit_started_at` datetime DEFAULT NULL COMMENT '开始提交的时间，提交中超时后由清理任务回滚或结算',
+  `commit_old_size` bigint unsigned DEFAULT NULL COMMENT '提交前目标文件大小，NULL 表示新文件',
+  PRIMARY KEY (`id`),
+  KEY `idx_upload_session_user` (`user_id`),
+  KEY `idx_upload_session_expires` (`expires_at`),
+  KEY `idx_upload_session_status` (`status`,`commit_started_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='网盘分片上传会话表';
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `network_disk_upload_chunks`
+--
+
+DROP TABLE IF EXISTS `network_disk_upload_chunks`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `network_disk_upload_chunks` (
+  `upload_id` char(32) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '上传会话ID',
+  `chunk_index` int unsigned NOT NULL COMMENT '分片序号，从0开始',
+  `chunk_size` int unsigned NOT NULL COMMENT '分片实际字节数',
+  `received_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '接收时间',
+  PRIMARY KEY (`upload_id`,`chunk_index`),
+  CONSTRAINT `network_disk_upload_chunks_ibfk_1` FOREIGN KEY (`upload_id`) REFERENCES `network_disk_upload_sessions` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='网盘分片上传已接收分片表';
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `site_daily_stats`
+--
+
+DROP TABLE IF EXISTS `site_daily_stats`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `site_daily_stats` (
+  `stat_date` date NOT NULL COMMENT '统计日期',
+  `new_users` int unsigned NOT NULL DEFAULT '0' COMMENT '当日新增用户数',
+  `new_articles` int unsigned NOT NULL DEFAULT '0' COMMENT '当日新增文章数',
+  `total_users` int unsigned NOT NULL DEFAULT '0' COMMENT '当日结束时总用户数',
+  `total_articles` int unsigned NOT NULL DEFAULT '0' COMMENT '当日结束时总文章数',
+  `total_views` bigint unsigned DEFAULT NULL COMMENT '总浏览量快照，补齐的历史日期为NULL',
+  `total_likes` bigint unsigned DEFAULT NULL COMMENT '总喜欢数快照，补齐的历史日期为NULL',
+  `disk_file_count` bigint unsigned DEFAULT NULL COMMENT '网盘文件数快照，补齐的历史日期为NULL',
+  `disk_total_bytes` bigint unsigned DEFAULT NULL COMMENT '网盘占用字节数快照，补齐的历史日期为NULL',
+  `is_final` tinyint(1) NOT NULL DEFAULT '0' COMMENT '是否已定稿，0-当天仍在刷新，1-已定稿',
+  `updated_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最后更新时间',
+  PRIMARY KEY (`stat_date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='站点每日统计汇总表';
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `refresh_tokens`
 --
@@ -505,7 +687,9 @@ CREATE TABLE `users` (
   `follower_count` int unsigned NOT NULL DEFAULT '0' COMMENT '粉丝数，默认0',
   `is_admin` tinyint(1) NOT NULL DEFAULT '0' COMMENT '是否为管理员，0-否，1-是',
   PRIMARY KEY (`id`),
-  UNIQUE KEY `username` (`username`)
+  UNIQUE KEY `username` (`username`),
+  KEY `idx_registered_time` (`registered_time`),
+  FULLTEXT KEY `ft_users_username` (`username`) /*!50100 WITH PARSER `ngram` */
 ) ENGINE=InnoDB AUTO_INCREMENT=1 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
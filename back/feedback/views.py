@@ -7,36 +7,33 @@ from django.db import connection
 from django.views.decorators.http import require_GET, require_POST, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from common.jwt_utils import jwt_required
-from functools import wraps
+from common.admin_auth import admin_required
+from common.pagination import encode_cursor, decode_cursor, parse_limit
 from datetime import datetime
 
 
-def admin_required(view_func):
-    """
-    管理员权限装饰器
-    需要先通过JWT认证，然后检查用户是否为管理员
-    """
-    @wraps(view_func)
-    @jwt_required
-    def _wrapped_view(request, *args, **kwargs):
-        # jwt_required 已经设置了 request.user_id
-        user_id = request.user_id
-        
-        # 检查用户是否为管理员
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT is_admin FROM users WHERE id = %s", [user_id])
-            row = cursor.fetchone()
-            
-            if not row or not row[0]:
-                return JsonResponse({
-                    'success': False,
-                    'error': '需要管理员权限',
-                    'code': 'ADMIN_REQUIRED'
-                }, status=403)
-        
-        return view_func(request, *args, **kwargs)
-    
-    return _wrapped_view
+# 反馈查询统一 LEFT JOIN users 取用户名，避免逐行查询
+FEEDBACK_SELECT_SQL = """
+    SELECT f.id, f.user_id, f.issue_type, f.description, f.created_at,
+           f.is_resolved, f.resolved_at, f.author_reply, u.username
+    FROM feedbacks f
+    LEFT JOIN users u ON u.id = f.user_id
+"""
+
+
+def feedback_row_to_dict(row, anonymous_name=None):
+    """把 FEEDBACK_SELECT_SQL 查询出的一行转换为字典"""
+    return {
+        'id': row[0],
+        'user_id': row[1],
+        'username': row[8] or anonymous_name,
+        'issue_type': row[2],
+        'description': row[3],
+        'created_at': row[4].isoformat() if row[4] else None,
+        'is_resolved': row[5],
+        'resolved_at': row[6].isoformat() if row[6] else None,
+        'author_reply': row[7]
+    }
 
 
 @csrf_exempt
@@ -44,58 +41,68 @@ def admin_required(view_func):
 def get_feedback_list(request):
     """
     获取反馈列表（公开接口，不需要登录）
-    支持按问题类型筛选
+    支持按问题类型筛选，按 (created_at, id) 倒序游标分页：
+    ?limit=20&cursor=上一页返回的 next_cursor
     """
     try:
         issue_type = request.GET.get('issue_type', '')
+        limit = parse_limit(request.GET.get('limit'), default=20, maximum=100)
+        cursor_param = request.GET.get('cursor', '').strip()
+        
+        # 构建查询条件
+        where_conditions = []
+        params = []
+        
+        if issue_type and issue_type in ['使用错误', '功能建议']:
+            where_conditions.append("f.issue_type = %s")
+            params.append(issue_type)
+        
+        if cursor_param:
+            try:
+                cursor_values = decode_cursor(
+                    cursor_param,
+                    required_keys=('created_at', 'id'),
+                    key_types={'created_at': datetime, 'id': int},
+                )
+            except ValueError as e:
+                return JsonResponse({
+                    'success': False,
+                    'error': str(e)
+                }, status=400)
+            # 从上一页最后一条之后继续取
+            where_conditions.append("(f.created_at < %s OR (f.created_at = %s AND f.id < %s))")
+            params.extend([cursor_values['created_at'], cursor_values['created_at'], cursor_values['id']])
+        
+        where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
         
         with connection.cursor() as cursor:
-            # 构建查询条件
-            where_conditions = []
-            params = []
-            
-            if issue_type and issue_type in ['使用错误', '功能建议']:
-                where_conditions.append("issue_type = %s")
-                params.append(issue_type)
-            
-            where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
-            
-            # 获取列表（按时间倒序）
+            # 获取列表（按时间倒序），多取一条用于判断是否还有下一页
             cursor.execute(f"""
-                SELECT id, user_id, issue_type, description, created_at, is_resolved, resolved_at, author_reply
-                FROM feedbacks 
+                {FEEDBACK_SELECT_SQL}
                 WHERE {where_clause}
-                ORDER BY created_at DESC
-            """, params)
+                ORDER BY f.created_at DESC, f.id DESC
+                LIMIT %s
+            """, params + [limit + 1])
             rows = cursor.fetchall()
-            
-            feedback_list = []
-            for row in rows:
-                # 获取用户名（不显示用户ID，只显示用户名或匿名）
-                username = None
-                if row[1]:
-                    cursor.execute("SELECT username FROM users WHERE id = %s", [row[1]])
-                    user_row = cursor.fetchone()
-                    username = user_row[0] if user_row else None
-                
-                feedback_list.append({
-                    'id': row[0],
-                    'user_id': row[1],  # 返回user_id，用于前端判断是否是自己的反馈
-                    'username': username or '匿名用户',
-                    'issue_type': row[2],
-                    'description': row[3],
-                    'created_at': row[4].isoformat() if row[4] else None,
-                    'is_resolved': row[5],
-                    'resolved_at': row[6].isoformat() if row[6] else None,
-                    'author_reply': row[7] if len(row) > 7 else None
-                })
-            
-            return JsonResponse({
-                'success': True,
-                'data': {
-                    'feedbacks': feedback_list
-                }
-            })
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        # 匿名反馈显示为“匿名用户”
+        feedback_list = [feedback_row_to_dict(row, '匿名用户') for row in rows]
+        
+        next_cursor = None
+        if has_more and rows:
+            next_cursor = encode_cursor({'created_at': rows[-1][4], 'id': rows[-1][0]})
+        
+        return JsonResponse({
+            'success': True,
+            'data': {
+                'feedbacks': feedback_list,
+                'next_cursor': next_cursor,
+                'has_more': has_more
+            }
+        })
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -195,52 +202,32 @@ def admin_get_feedback_list(request):
             params = []
             
             if issue_type:
-                where_conditions.append("issue_type = %s")
+                where_conditions.append("f.issue_type = %s")
                 params.append(issue_type)
             
             if is_resolved:
-                where_conditions.append("is_resolved = %s")
+                where_conditions.append("f.is_resolved = %s")
                 params.append(is_resolved)
             
             where_clause = " AND ".join(where_conditions) if where_conditions else "1=1"
             
             # 获取总数
             cursor.execute(f"""
-                SELECT COUNT(*) FROM feedbacks WHERE {where_clause}
+                SELECT COUNT(*) FROM feedbacks f WHERE {where_clause}
             """, params)
             total = cursor.fetchone()[0]
             
             # 获取列表
             params_with_limit = params + [page_size, offset]
             cursor.execute(f"""
-                SELECT id, user_id, issue_type, description, created_at, is_resolved, resolved_at, author_reply
-                FROM feedbacks 
+                {FEEDBACK_SELECT_SQL}
                 WHERE {where_clause}
-                ORDER BY created_at DESC
+                ORDER BY f.created_at DESC, f.id DESC
                 LIMIT %s OFFSET %s
             """, params_with_limit)
             rows = cursor.fetchall()
             
-            feedback_list = []
-            for row in rows:
-                # 获取用户名
-                username = None
-                if row[1]:
-                    cursor.execute("SELECT username FROM users WHERE id = %s", [row[1]])
-                    user_row = cursor.fetchone()
-                    username = user_row[0] if user_row else None
-                
-                feedback_list.append({
-                    'id': row[0],
-                    'user_id': row[1],
-                    'username': username,
-                    'issue_type': row[2],
-                    'description': row[3],
-                    'created_at': row[4].isoformat() if row[4] else None,
-                    'is_resolved': row[5],
-                    'resolved_at': row[6].isoformat() if row[6] else None,
-                    'author_reply': row[7] if len(row) > 7 else None
-                })
+            feedback_list = [feedback_row_to_dict(row) for row in rows]
             
             return JsonResponse({
                 'success': True,
@@ -267,10 +254,9 @@ def admin_get_feedback(request, feedback_id):
     """
     try:
         with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT id, user_id, issue_type, description, created_at, is_resolved, resolved_at, author_reply
-                FROM feedbacks 
-                WHERE id = %s
+            cursor.execute(f"""
+                {FEEDBACK_SELECT_SQL}
+                WHERE f.id = %s
             """, [feedback_id])
             row = cursor.fetchone()
             
@@ -280,26 +266,9 @@ def admin_get_feedback(request, feedback_id):
                     'error': '反馈不存在'
                 }, status=404)
             
-            # 获取用户名
-            username = None
-            if row[1]:
-                cursor.execute("SELECT username FROM users WHERE id = %s", [row[1]])
-                user_row = cursor.fetchone()
-                username = user_row[0] if user_row else None
-            
             return JsonResponse({
                 'success': True,
-                'data': {
-                    'id': row[0],
-                    'user_id': row[1],
-                    'username': username,
-                    'issue_type': row[2],
-                    'description': row[3],
-                    'created_at': row[4].isoformat() if row[4] else None,
-                    'is_resolved': row[5],
-                    'resolved_at': row[6].isoformat() if row[6] else None,
-                    'author_reply': row[7] if len(row) > 7 else None
-                }
+                'data': feedback_row_to_dict(row)
             })
     except Exception as e:
         return JsonResponse({
@@ -371,34 +340,16 @@ def admin_update_feedback_status(request, feedback_id):
                         WHERE id = %s
                     """, [is_resolved, author_reply, feedback_id])
             
-            # 获取更新后的记录
-            cursor.execute("""
-                SELECT id, user_id, issue_type, description, created_at, is_resolved, resolved_at, author_reply
-                FROM feedbacks 
-                WHERE id = %s
+            # 获取更新后的记录（连同用户名）
+            cursor.execute(f"""
+                {FEEDBACK_SELECT_SQL}
+                WHERE f.id = %s
             """, [feedback_id])
             row = cursor.fetchone()
             
-            # 获取用户名
-            username = None
-            if row[1]:
-                cursor.execute("SELECT username FROM users WHERE id = %s", [row[1]])
-                user_row = cursor.fetchone()
-                username = user_row[0] if user_row else None
-            
             return JsonResponse({
                 'success': True,
-                'data': {
-                    'id': row[0],
-                    'user_id': row[1],
-                    'username': username,
-                    'issue_type': row[2],
-                    'description': row[3],
-                    'created_at': row[4].isoformat() if row[4] else None,
-                    'is_resolved': row[5],
-                    'resolved_at': row[6].isoformat() if row[6] else None,
-                    'author_reply': row[7] if len(row) > 7 else None
-                },
+                'data': feedback_row_to_dict(row),
                 'message': '反馈状态更新成功'
             })
     except Exception as e:
@@ -509,33 +460,16 @@ def update_my_feedback(request, feedback_id):
             """
             cursor.execute(update_sql, params)
             
-            # 获取更新后的记录
-            cursor.execute("""
-                SELECT id, user_id, issue_type, description, created_at, is_resolved, resolved_at
-                FROM feedbacks 
-                WHERE id = %s
+            # 获取更新后的记录（连同用户名）
+            cursor.execute(f"""
+                {FEEDBACK_SELECT_SQL}
+                WHERE f.id = %s
             """, [feedback_id])
             row = cursor.fetchone()
             
-            # 获取用户名
-            username = None
-            if row[1]:
-                cursor.execute("SELECT username FROM users WHERE id = %s", [row[1]])
-                user_row = cursor.fetchone()
-                username = user_row[0] if user_row else None
-            
             return JsonResponse({
                 'success': True,
-                'data': {
-                    'id': row[0],
-                    'user_id': row[1],
-                    'username': username or '匿名用户',
-                    'issue_type': row[2],
-                    'description': row[3],
-                    'created_at': row[4].isoformat() if row[4] else None,
-                    'is_resolved': row[5],
-                    'resolved_at': row[6].isoformat() if row[6] else None
-                },
+                'data': feedback_row_to_dict(row, '匿名用户'),
                 'message': '反馈更新成功'
             })
     except Exception as e:
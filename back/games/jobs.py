@@ -0,0 +1,98 @@
+"""
+游戏后台任务
+deploy_web_zip：解压管理员上传的 Web 压缩包（由 admin_upload_web_zip 视图提交），解析入口 HTML 并写回 games.web_entry。
+解压和切换由 web_bundle.deploy_bundle 完成，失败或取消时当前已部署的版本不受影响。
+压缩包在成功、不可重试的失败、取消或最后一次尝试后删除；可重试的失败保留压缩包等待下一次尝试。
+排队时就被取消的任务不会执行，其压缩包在之后的部署任务中按 STALE_ARCHIVE_SECONDS 清理。
+"""
+import time
+
+from django.db import connection
+
+from common.job_queue import JobCancelled, JobError
+from . import web_bundle
+from .views import WEB_ZIP_UPLOAD_DIR, _row_to_game, _safe_basename
+
+
+# 超过该时间仍未处理的压缩包视为遗留文件（秒）
+STALE_ARCHIVE_SECONDS = 24 * 60 * 60
+
+
+def _purge_stale_archives():
+    cutoff = time.time() - STALE_ARCHIVE_SECONDS
+    try:
+        for path in WEB_ZIP_UPLOAD_DIR.iterdir():
+            try:
+                if path.is_file() and path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+    except OSError:
+        pass
+
+
+def _deploy(job, archive_path, game_id, ext):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT id, title FROM games WHERE id = %s', [game_id])
+        row = cursor.fetchone()
+        if not row:
+            raise JobError('游戏不存在')
+        game_title = row[1]
+
+    if ext.lower() != '.zip':
+        raise JobError('仅支持 .zip 压缩包')
+
+    def _on_progress(stage, done, total):
+        if stage == 'extract':
+            job.set_progress(done * 70 // max(total, 1), f'已解压 {done}/{total} 个文件')
+        else:
+            job.set_progress(70 + done * 25 // max(total, 1), f'正在生成压缩副本 {done}/{total}')
+        job.check_cancelled()
+
+    job.set_progress(0, '正在解压', force=True)
+    try:
+        entry = web_bundle.deploy_bundle(archive_path, game_id, game_title, _on_progress)
+    except web_bundle.BundleError as e:
+        raise JobError(str(e))
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE games SET web_entry = %s WHERE id = %s',
+            [entry, game_id],
+        )
+        cursor.execute(
+            """
+            SELECT id, title, content, introduction, detail, web_entry,
+                   windows, linux, android
+            FROM games WHERE id = %s
+            """,
+            [game_id],
+        )
+        row = cursor.fetchone()
+    return {'game': _row_to_game(row)}
+
+
+def deploy_web_zip(job):
+    """
+    部署 Web 压缩包
+    payload: game_id、archive（WEB_ZIP_UPLOAD_DIR 下的文件名）、ext
+    """
+    archive_name = _safe_basename(job.payload.get('archive'))
+    if not archive_name:
+        raise JobError('无效的压缩包')
+    archive_path = WEB_ZIP_UPLOAD_DIR / archive_name
+    if not archive_path.is_file():
+        raise JobError('压缩包已失效，请重新上传')
+
+    keep_archive = False
+    try:
+        return _deploy(job, archive_path, int(job.payload['game_id']), job.payload.get('ext') or '.zip')
+    except (JobError, JobCancelled):
+        raise
+    except Exception:
+        keep_archive = not job.is_last_attempt
+        raise
+    finally:
+        if not keep_archive:
+            archive_path.unlink(missing_ok=True)
+        _purge_stale_archives()
@@ -0,0 +1,52 @@
+"""
+为已部署的游戏 Web 包补齐预压缩副本和内容哈希清单
+新上传的 Web 包在部署任务中自动处理；该命令用于升级前部署的游戏：
+版本目录原地补齐，旧方式部署的普通 web/ 目录复制为版本目录后切换（之后才能通过版本化地址长期缓存）
+
+使用方法：
+python manage.py precompress_game_bundles             # 所有已部署 Web 包的游戏
+python manage.py precompress_game_bundles --game 3
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from games import web_bundle
+
+
+class Command(BaseCommand):
+    help = '为已部署的游戏 Web 包生成预压缩副本和内容哈希清单'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--game',
+            type=int,
+            default=None,
+            help='只处理指定ID的游戏'
+        )
+
+    def handle(self, *args, **options):
+        sql = "SELECT id, title, web_entry FROM games WHERE web_entry IS NOT NULL AND web_entry <> ''"
+        params = []
+        if options['game'] is not None:
+            sql += ' AND id = %s'
+            params.append(options['game'])
+        with connection.cursor() as cursor:
+            cursor.execute(sql + ' ORDER BY id', params)
+            rows = cursor.fetchall()
+
+        encodings = '、'.join(web_bundle.available_encodings())
+        self.stdout.write(f'共 {len(rows)} 个游戏，生成编码: {encodings}')
+        done = 0
+        for game_id, title, web_entry in rows:
+            try:
+                version, converted = web_bundle.backfill_bundle(game_id, web_entry)
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'#{game_id} {title} 处理失败: {str(e)}'))
+                continue
+            if not version:
+                self.stdout.write(self.style.WARNING(f'#{game_id} {title} 未找到 Web 包目录，跳过'))
+                continue
+            done += 1
+            suffix = '（已从旧目录转换）' if converted else ''
+            self.stdout.write(f'#{game_id} {title} -> {version}{suffix}')
+        self.stdout.write(self.style.SUCCESS(f'处理完成: {done}/{len(rows)}'))
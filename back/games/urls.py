@@ -13,6 +13,11 @@ urlpatterns = [
         views.download_platform_file,
         name='download_platform_file',
     ),
+    path(
+        'play/<int:game_id>/<str:version>/<path:asset_path>',
+        views.serve_web_asset,
+        name='serve_web_asset',
+    ),
     path('admin/list/', views.admin_get_games_list, name='admin_get_games_list'),
     path('admin/create/', views.admin_create_game, name='admin_create_game'),
     path('admin/<int:game_id>/', views.admin_get_game, name='admin_get_game'),
@@ -2,7 +2,8 @@
 游戏相关视图
 
 Web：上传 .zip，解压至 api/static/games/game_files/{id}/web/；web_entry 为该目录下相对路径（当前策略：按游戏标题推导 {标题}.html，
-或仅含一个 html 时自动采用）。
+或仅含一个 html 时自动采用）。解压由后台任务（games/jobs.py）执行，
+流式解压到暂存目录后原子切换为 web/（见 games/web_bundle.py）。
 其它平台单文件：game_files/{id}/{platform}{扩展名}。
 """
 import json
@@ -11,20 +12,25 @@ import os
 import re
 import shutil
 import tempfile
-import zipfile
 from pathlib import Path
 
 from django.conf import settings
 from django.db import connection
-from django.http import FileResponse, Http404, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_GET, require_POST, require_http_methods
+from django.views.decorators.http import require_GET, require_POST, require_http_methods, require_safe
 
+from common import job_queue
+from common.file_streaming import build_offload_header, get_offload_settings, serve_file
 from history.views import admin_required
+from . import web_bundle
 
 BASE_DIR = Path(settings.BASE_DIR)
 GAME_IMAGES_DIR = BASE_DIR / 'api' / 'static' / 'games' / 'game_images'
 GAME_FILES_DIR = BASE_DIR / 'api' / 'static' / 'games' / 'game_files'
+# 待后台任务解压的 Web 压缩包（不在静态目录下）
+WEB_ZIP_UPLOAD_DIR = BASE_DIR / 'api' / 'upload_tmp' / 'games'
 
 ALLOWED_ARCHIVE_EXT = ('.zip',)
 ALLOWED_IMAGE_EXT = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
@@ -34,6 +40,9 @@ MAX_PLATFORM_FILE_BYTES = 600 * 1024 * 1024
 
 PLATFORM_NAMES = ('windows', 'linux', 'android')
 
+# 版本化地址下的 Web 包资源内容不会变化，允许浏览器长期缓存
+WEB_ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
 
 def _safe_basename(name):
     if not name or not isinstance(name, str):
@@ -71,10 +80,6 @@ def _game_files_root(game_id):
     return (GAME_FILES_DIR / str(int(game_id))).resolve()
 
 
-def _web_bundle_root(game_id):
-    return (_game_files_root(game_id) / 'web').resolve()
-
-
 def _rmtree_game_assets(game_id):
     base = GAME_FILES_DIR / str(int(game_id))
     try:
@@ -106,6 +111,8 @@ def _row_to_game_public(row):
     d['has_linux'] = bool((d.get('linux') or '').strip())
     d['has_android'] = bool((d.get('android') or '').strip())
     d['play_route'] = f'/games/play/{gid}'
+    # 版本化的游玩地址所用的版本号；旧方式部署的 Web 包为空，前端回退到静态地址
+    d['web_version'] = (web_bundle.current_version(gid) or '') if d['has_web'] else ''
     return d
 
 
@@ -116,55 +123,6 @@ def _normalize_optional_str(value):
     return s if s else None
 
 
-def _safe_extract_zip(zf: zipfile.ZipFile, dest: Path):
-    dest.mkdir(parents=True, exist_ok=True)
-    dest_r = dest.resolve()
-    for m in zf.infolist():
-        out = (dest / m.filename).resolve()
-        if dest_r not in out.parents and out != dest_r:
-            raise ValueError('ZIP 内包含非法路径')
-    zf.extractall(dest)
-
-
-def _expected_web_html_basename(title: str) -> str:
-    t = (title or '').strip() or 'game'
-    invalid = '<>:"/\\|?*'
-    s = ''.join('_' if c in invalid else c for c in t)
-    s = s.rstrip('. ') or 'game'
-    return f'{s}.html'
-
-
-def _resolve_web_entry(web_root: Path, title: str) -> str | None:
-    """
-    当前约定：入口为「与游戏标题同名的单个 .html」（经非法字符替换），否则若 web/
-    目录下仅此一个 html 则采用。
-    """
-    exp = _expected_web_html_basename(title)
-    p = web_root / exp
-    if p.is_file():
-        return exp
-
-    shallow = sorted(
-        [x for x in web_root.iterdir() if x.is_file() and x.suffix.lower() == '.html']
-    )
-    if len(shallow) == 1:
-        return shallow[0].name
-
-    all_html = sorted([x for x in web_root.rglob('*.html') if x.is_file()])
-    if len(all_html) == 1:
-        return str(all_html[0].relative_to(web_root)).replace('\\', '/')
-
-    return None
-
-
-def _extract_archive_disk(tmp_path: Path, dest_root: Path, ext: str):
-    if ext.lower() != '.zip':
-        raise ValueError('仅支持 .zip 压缩包')
-    dest_root.mkdir(parents=True, exist_ok=True)
-    with zipfile.ZipFile(str(tmp_path), 'r') as zf:
-        _safe_extract_zip(zf, dest_root)
-
-
 def _delete_old_platform_file(game_id, platform: str):
     root = _game_files_root(game_id)
     if not root.is_dir():
@@ -331,11 +289,11 @@ def admin_upload_game_image(request, game_id):
 @require_POST
 def admin_upload_web_zip(request, game_id):
     """
-    上传 Web 端 .zip，解压到 game_files/{id}/web/。
+    上传 Web 端 .zip，保存后提交后台任务解压到 game_files/{id}/web/，返回 202 和 job_id；
+    任务完成后结果中的 game 为更新后的游戏数据（通过 /api/jobs/<job_id>/ 查询）。
     入口 HTML：当前默认为「游戏标题」（非法字符替换后）+.html；若解压结果中仅此一个 html 则自动采纳。
     """
-    tmp_written = None
-    tmp_path = None
+    archive_path = None
     try:
         if 'file' not in request.FILES:
             return JsonResponse({'success': False, 'error': '没有上传文件'}, status=400)
@@ -356,78 +314,36 @@ def admin_upload_web_zip(request, game_id):
             return JsonResponse({'success': False, 'error': '压缩包过大'}, status=400)
 
         with connection.cursor() as cursor:
-            cursor.execute('SELECT id, title FROM games WHERE id = %s', [game_id])
-            row = cursor.fetchone()
-            if not row:
+            cursor.execute('SELECT id FROM games WHERE id = %s', [game_id])
+            if not cursor.fetchone():
                 return JsonResponse({'success': False, 'error': '游戏不存在'}, status=404)
-            game_title = row[1]
-
-        dest_root = _web_bundle_root(game_id)
-        if dest_root.is_dir():
-            shutil.rmtree(dest_root, ignore_errors=True)
-        dest_root.parent.mkdir(parents=True, exist_ok=True)
 
-        fd, tmp_written = tempfile.mkstemp(suffix=ext)
+        # 压缩包保存到 worker 可以访问的目录，由后台任务解压后删除
+        WEB_ZIP_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_written = tempfile.mkstemp(suffix=ext, dir=WEB_ZIP_UPLOAD_DIR)
         os.close(fd)
-        tmp_path = Path(tmp_written)
-        try:
-            with open(tmp_path, 'wb') as out:
-                for chunk in uploaded.chunks():
-                    out.write(chunk)
-            _extract_archive_disk(tmp_path, dest_root, ext)
-        except zipfile.BadZipFile:
-            shutil.rmtree(dest_root, ignore_errors=True)
-            return JsonResponse({'success': False, 'error': '无效的 zip 文件'}, status=400)
-        except ValueError as ve:
-            shutil.rmtree(dest_root, ignore_errors=True)
-            return JsonResponse({'success': False, 'error': str(ve)}, status=400)
-        finally:
-            tmp_path.unlink(missing_ok=True)
-            tmp_written = None
-            tmp_path = None
-
-        entry = _resolve_web_entry(dest_root, game_title)
-        if not entry:
-            shutil.rmtree(dest_root, ignore_errors=True)
-            exp = _expected_web_html_basename(game_title)
-            return JsonResponse(
-                {
-                    'success': False,
-                    'error': (
-                        f'未解析到可用 HTML（请保证解压后仅此一个 .html，'
-                        f'或存在入口文件「{exp}」与当前游戏标题一致）'
-                    ),
-                },
-                status=400,
-            )
-
-        entry = entry.replace('\\', '/')
-        with connection.cursor() as cursor:
-            cursor.execute(
-                'UPDATE games SET web_entry = %s WHERE id = %s',
-                [entry, game_id],
-            )
-            cursor.execute(
-                """
-                SELECT id, title, content, introduction, detail, web_entry,
-                       windows, linux, android
-                FROM games WHERE id = %s
-                """,
-                [game_id],
-            )
-            row = cursor.fetchone()
+        archive_path = Path(tmp_written)
+        with open(archive_path, 'wb') as out:
+            for chunk in uploaded.chunks():
+                out.write(chunk)
 
+        job_id = job_queue.enqueue(
+            'games.deploy_web_zip',
+            {'game_id': int(game_id), 'archive': archive_path.name, 'ext': ext},
+            created_by=request.user_id,
+        )
         return JsonResponse(
             {
                 'success': True,
-                'message': 'Web 资源已部署',
-                'data': _row_to_game(row),
-            }
+                'message': '已提交部署任务',
+                'data': {'job_id': job_id},
+            },
+            status=202,
         )
     except Exception as e:
-        if tmp_written:
+        if archive_path:
             try:
-                Path(tmp_written).unlink(missing_ok=True)
+                archive_path.unlink(missing_ok=True)
             except Exception:
                 pass
         return JsonResponse(
@@ -516,9 +432,9 @@ def admin_upload_platform_file(request, game_id):
 
 
 @csrf_exempt
-@require_GET
+@require_safe
 def download_platform_file(request, game_id, platform):
-    """公开下载（管理员上传的安装包）"""
+    """公开下载（管理员上传的安装包），支持 Range 断点续传与条件请求"""
     if platform not in PLATFORM_NAMES:
         raise Http404()
     try:
@@ -536,23 +452,99 @@ def download_platform_file(request, game_id, platform):
         path = _game_files_root(game_id) / fname
         if not path.is_file() or path.resolve().parent != _game_files_root(game_id):
             raise Http404()
-        ctype, _ = mimetypes.guess_type(path.name)
         try:
-            f = open(path, 'rb')
+            return serve_file(request, path, filename=path.name)
         except OSError:
             raise Http404()
-        resp = FileResponse(
-            f,
-            content_type=ctype or 'application/octet-stream',
-        )
-        resp['Content-Disposition'] = f'attachment; filename="{path.name}"'
-        return resp
     except Http404:
         raise
     except Exception:
         raise Http404()
 
 
+def _accepted_encodings(request):
+    """解析 Accept-Encoding，返回 q 值大于 0 的编码集合"""
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(name)
+    return accepted
+
+
+@csrf_exempt
+@require_safe
+def serve_web_asset(request, game_id, version, asset_path):
+    """
+    按版本号提供 Web 包资源：/api/games/play/{id}/{版本}/{路径}
+    只提供清单中的文件；根据 Accept-Encoding 优先返回 .br / .gz 预压缩副本，
+    以内容哈希作为 ETag，并设置长期不可变缓存（新部署会产生新的版本号和地址）
+    开启 download_offload 时，选定的文件（含预压缩副本）通过内部重定向交给前端代理发送，
+    wasm / data 等大文件不占用 uwsgi 进程
+    """
+    if not web_bundle.is_version_name(version):
+        raise Http404()
+    bundle_dir = web_bundle.game_root(game_id) / version
+    index = web_bundle.get_manifest_index(bundle_dir)
+    item = index.get(asset_path) if index else None
+    if not item:
+        raise Http404()
+
+    path = bundle_dir.joinpath(*asset_path.split('/'))
+    accepted = _accepted_encodings(request)
+    encoding = None
+    for candidate in web_bundle.available_encodings():
+        if candidate in item.get('encodings', {}) and candidate in accepted:
+            encoding = candidate
+            break
+    if encoding:
+        path = path.with_name(path.name + web_bundle.ENCODING_SUFFIXES[encoding])
+
+    # 同一资源的不同编码是不同的表示，ETag 需要区分
+    etag = f'"{item.get("sha256", "")[:32]}{"-" + encoding if encoding else ""}"'
+    content_type = mimetypes.guess_type(asset_path)[0] or 'application/octet-stream'
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and item.get('sha256') and etag in parse_etags(if_none_match):
+        response = HttpResponse(status=304)
+    else:
+        try:
+            size = path.stat().st_size
+        except OSError:
+            raise Http404()
+        offload_header = build_offload_header(path, get_offload_settings()) if request.method == 'GET' else None
+        if offload_header:
+            # 由代理发送文件并设置长度；Content-Encoding / Vary 需要代理按副本后缀补上（见 README）
+            response = HttpResponse(content_type=content_type)
+            response[offload_header[0]] = offload_header[1]
+        else:
+            if request.method == 'HEAD':
+                response = HttpResponse(content_type=content_type)
+            else:
+                response = FileResponse(open(path, 'rb'), content_type=content_type)
+                # 页面内加载的资源，不需要 FileResponse 自动添加的 Content-Disposition
+                response.headers.pop('Content-Disposition', None)
+            response['Content-Length'] = str(size)
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    if item.get('sha256'):
+        response['ETag'] = etag
+    response['Cache-Control'] = WEB_ASSET_CACHE_CONTROL
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
 @csrf_exempt
 @admin_required
 @require_POST
@@ -689,7 +681,7 @@ def admin_update_game(request, game_id):
 
             # 清空 Web：删解压目录
             if not (web_entry or '').strip() and (old_web_entry or '').strip():
-                shutil.rmtree(_web_bundle_root(game_id), ignore_errors=True)
+                web_bundle.remove_bundle(game_id)
 
             # 清空各平台文件
             def _sync_plat(old_name, new_name, plat):
@@ -0,0 +1,529 @@
+"""
+游戏 Web 包部署
+把上传的 .zip 流式解压到暂存目录，再原子切换为 game_files/{id}/web/：
+- 解压前逐个校验成员路径（绝对路径、..、盘符、符号链接），以及成员数、解压后总大小和压缩比（防 zip 炸弹）
+- 每个成员用固定大小的缓冲区边读边写，并按实际写入字节数再次检查大小和压缩比（不信任 zip 中声明的大小）
+- 解压时记录文件清单（写入 .bundle-manifest.json），入口 HTML 直接从清单中查找，不再对解压结果 rglob
+- 解压后为可压缩的文件生成 .gz（安装了 brotli 时还有 .br）预压缩副本，清单中记录每个文件的 sha256 与各编码大小，
+  由 serve_web_asset 视图按 Accept-Encoding 选择副本，并以内容哈希作为 ETag
+- web 是指向版本目录 web-<版本号> 的符号链接，切换时用 os.replace 原子替换链接，
+  切换前旧版本一直可用。版本号出现在游玩地址中，因此资源可以长期缓存；
+  已经打开旧版本入口页的玩家还会继续按旧地址加载资源，所以切换后保留上一个版本，
+  下一次部署时再删除（任何时候最多保留当前和上一个两个版本）
+- 不能创建符号链接时（Windows 未开启开发者模式且不是管理员）退化为把版本目录改名为 web：
+  切换不再是原子的，也没有版本化地址（与旧方式部署的普通目录相同）
+"""
+import gzip
+import hashlib
+import json
+import os
+import secrets
+import shutil
+import stat
+import time
+import threading
+import zipfile
+from collections import OrderedDict
+from pathlib import Path, PurePosixPath
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # 可选依赖，未安装时只生成 .gz
+    brotli = None
+
+
+GAME_FILES_DIR = Path(settings.BASE_DIR) / 'api' / 'static' / 'games' / 'game_files'
+
+# web 链接名与版本目录前缀
+BUNDLE_LINK_NAME = 'web'
+BUNDLE_VERSION_PREFIX = 'web-'
+STAGING_PREFIX = '.web-staging-'
+# 包内文件清单
+BUNDLE_MANIFEST_NAME = '.bundle-manifest.json'
+
+# 解压限制
+MAX_MEMBERS = 20000
+MAX_UNCOMPRESSED_BYTES = 2 * 1024 * 1024 * 1024  # 解压后总大小上限 2GB
+MAX_COMPRESSION_RATIO = 200  # 单个成员的解压后大小 / 压缩后大小
+RATIO_CHECK_MIN_BYTES = 1024 * 1024  # 小于该大小的成员不检查压缩比（小文本文件压缩比天然很高）
+MAX_PATH_DEPTH = 32
+# 复制缓冲区大小
+COPY_BUFFER_SIZE = 256 * 1024
+
+# 预压缩：只处理这些扩展名、且不小于 PRECOMPRESS_MIN_BYTES 的文件；压缩后没有明显变小时不保留副本
+COMPRESSIBLE_EXTENSIONS = (
+    '.html', '.htm', '.js', '.mjs', '.css', '.json', '.map', '.wasm', '.svg', '.xml', '.txt',
+    '.csv', '.data', '.mem', '.pck', '.bundle', '.unityweb', '.ttf', '.otf', '.ico', '.glsl',
+)
+PRECOMPRESS_MIN_BYTES = 1024
+PRECOMPRESS_MAX_RATIO = 0.9
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+# Content-Encoding -> 副本扩展名
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# 已读取的清单（版本目录内容不再变化，按 (目录, 清单修改时间) 缓存）
+MANIFEST_CACHE_SIZE = 64
+_manifest_cache = OrderedDict()
+_manifest_cache_lock = threading.Lock()
+
+
+class BundleError(ValueError):
+    """压缩包无效或超出限制，message 可直接返回给管理员"""
+
+
+def game_root(game_id):
+    return GAME_FILES_DIR / str(int(game_id))
+
+
+def bundle_link(game_id):
+    """web 链接（或旧版本部署留下的普通目录）的路径，不解析符号链接"""
+    return game_root(game_id) / BUNDLE_LINK_NAME
+
+
+def expected_entry_name(title):
+    """按游戏标题推导的入口 HTML 文件名（非法字符替换为 _）"""
+    t = (title or '').strip() or 'game'
+    invalid = '<>:"/\\|?*'
+    s = ''.join('_' if c in invalid else c for c in t)
+    s = s.rstrip('. ') or 'game'
+    return f'{s}.html'
+
+
+def _member_path(info):
+    """校验成员路径，返回规范化的相对路径（目录成员返回 None）"""
+    name = info.filename.replace('\\', '/')
+    if info.is_dir() or name.endswith('/'):
+        return None
+    mode = info.external_attr >> 16
+    if stat.S_ISLNK(mode):
+        raise BundleError(f'ZIP 内包含符号链接: {info.filename}')
+    path = PurePosixPath(name)
+    parts = path.parts
+    if (
+        not parts
+        or path.is_absolute()
+        or ':' in parts[0]
+        or any(part in ('', '.', '..') for part in parts)
+        or len(parts) > MAX_PATH_DEPTH
+    ):
+        raise BundleError('ZIP 内包含非法路径')
+    if path.name == BUNDLE_MANIFEST_NAME:
+        raise BundleError(f'ZIP 内不能包含 {BUNDLE_MANIFEST_NAME}')
+    return path.as_posix()
+
+
+def _check_ratio(info, size):
+    if size >= RATIO_CHECK_MIN_BYTES and size > MAX_COMPRESSION_RATIO * max(info.compress_size, 1):
+        raise BundleError(f'压缩比异常: {info.filename}')
+
+
+def _validate_members(zf):
+    """按中央目录做第一轮检查，返回 [(info, 相对路径)]"""
+    infos = zf.infolist()
+    if len(infos) > MAX_MEMBERS:
+        raise BundleError(f'压缩包内文件过多（超过 {MAX_MEMBERS} 个）')
+    members = []
+    seen = set()
+    # 所有文件的上级目录，用于发现同一路径既是文件又是目录（如 a 与 a/b）
+    parents = set()
+    declared_total = 0
+    for info in infos:
+        relative = _member_path(info)
+        if relative is None:
+            continue
+        # 路径区分大小写：A.js 与 a.js 是两个文件
+        if relative in seen:
+            raise BundleError(f'ZIP 内包含重复文件: {info.filename}')
+        parts = relative.split('/')
+        prefixes = ['/'.join(parts[:i]) for i in range(1, len(parts))]
+        if relative in parents or any(prefix in seen for prefix in prefixes):
+            raise BundleError(f'ZIP 内路径冲突（同一路径既是文件又是目录）: {info.filename}')
+        seen.add(relative)
+        parents.update(prefixes)
+        declared_total += info.file_size
+        if declared_total > MAX_UNCOMPRESSED_BYTES:
+            raise BundleError('解压后总大小超过限制')
+        _check_ratio(info, info.file_size)
+        members.append((info, relative))
+    return members
+
+
+def _extract_to(zf, members, staging_dir, on_progress=None):
+    """流式解压到暂存目录，返回文件清单 [{'path', 'size', 'sha256'}]"""
+    files = []
+    total_written = 0
+    buffer = bytearray(COPY_BUFFER_SIZE)
+    view = memoryview(buffer)
+    for index, (info, relative) in enumerate(members, 1):
+        dest = staging_dir.joinpath(*relative.split('/'))
+        written = 0
+        digest = hashlib.sha256()
+        try:
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            out = open(dest, 'wb')
+        except (FileExistsError, IsADirectoryError, NotADirectoryError) as e:
+            # 路径冲突是压缩包本身的问题，重试也不会成功
+            raise BundleError(f'ZIP 内路径冲突: {info.filename}') from e
+        with zf.open(info) as src, out:
+            while True:
+                n = src.readinto(buffer)
+                if not n:
+                    break
+                written += n
+                total_written += n
+                if written > info.file_size:
+                    raise BundleError(f'文件大小与声明不符: {info.filename}')
+                if total_written > MAX_UNCOMPRESSED_BYTES:
+                    raise BundleError('解压后总大小超过限制')
+                out.write(view[:n])
+                digest.update(view[:n])
+        _check_ratio(info, written)
+        files.append({'path': relative, 'size': written, 'sha256': digest.hexdigest()})
+        if on_progress:
+            on_progress(index, len(members))
+    return files
+
+
+def _compress_file(src_path, dest_path, encoding):
+    """按块压缩单个文件，返回压缩后大小"""
+    buffer = bytearray(COPY_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(src_path, 'rb') as src:
+        if encoding == 'gzip':
+            # mtime=0：同样的内容生成同样的副本
+            with open(dest_path, 'wb') as raw, gzip.GzipFile(
+                filename='', mode='wb', compresslevel=GZIP_LEVEL, fileobj=raw, mtime=0
+            ) as out:
+                while True:
+                    n = src.readinto(buffer)
+                    if not n:
+                        break
+                    out.write(view[:n])
+        else:
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            with open(dest_path, 'wb') as out:
+                while True:
+                    n = src.readinto(buffer)
+                    if not n:
+                        break
+                    out.write(compressor.process(bytes(view[:n])))
+                out.write(compressor.finish())
+    return os.path.getsize(dest_path)
+
+
+def available_encodings():
+    """可以生成的预压缩编码（按优先级）"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def precompress(bundle_dir, files, on_progress=None):
+    """
+    为清单中可压缩的文件生成预压缩副本（path.gz / path.br），
+    在清单项中记录 encodings {编码: 大小}；已有的副本直接复用
+    """
+    bundle_dir = Path(bundle_dir)
+    encodings = available_encodings()
+    # 包内自带的同名文件（如 Unity 构建中的 *.js.gz）不能被覆盖
+    existing = {item['path'] for item in files}
+    for index, item in enumerate(files, 1):
+        item.setdefault('encodings', {})
+        if item['size'] >= PRECOMPRESS_MIN_BYTES and item['path'].lower().endswith(COMPRESSIBLE_EXTENSIONS):
+            src_path = bundle_dir.joinpath(*item['path'].split('/'))
+            for encoding in encodings:
+                if encoding in item['encodings'] or item['path'] + ENCODING_SUFFIXES[encoding] in existing:
+                    continue
+                dest_path = src_path.with_name(src_path.name + ENCODING_SUFFIXES[encoding])
+                size = _compress_file(src_path, dest_path, encoding)
+                if size <= item['size'] * PRECOMPRESS_MAX_RATIO:
+                    item['encodings'][encoding] = size
+                else:
+                    dest_path.unlink(missing_ok=True)
+        if on_progress:
+            on_progress(index, len(files))
+    return files
+
+
+def resolve_entry(files, title):
+    """
+    从文件清单中确定入口 HTML：
+    与游戏标题同名的 .html（位于根目录），否则根目录下唯一的 .html，否则整个包中唯一的 .html
+    """
+    html_files = sorted(f['path'] for f in files if f['path'].lower().endswith('.html'))
+    expected = expected_entry_name(title)
+    if expected in html_files:
+        return expected
+    shallow = [p for p in html_files if '/' not in p]
+    if len(shallow) == 1:
+        return shallow[0]
+    if len(html_files) == 1:
+        return html_files[0]
+    return None
+
+
+def read_manifest(bundle_dir):
+    """读取包内文件清单，不存在（旧版本部署）时返回 None"""
+    try:
+        with open(Path(bundle_dir) / BUNDLE_MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(bundle_dir, manifest):
+    """写入清单（先写临时文件再替换，正在服务的版本目录也可以安全更新）"""
+    path = Path(bundle_dir) / BUNDLE_MANIFEST_NAME
+    temp_path = path.with_name(f'{path.name}.{secrets.token_hex(4)}.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def get_manifest_index(bundle_dir):
+    """
+    读取清单并按路径建立索引 {路径: 清单项}，结果在进程内缓存
+    清单不存在时返回 None
+    """
+    path = Path(bundle_dir) / BUNDLE_MANIFEST_NAME
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    key = str(path)
+    with _manifest_cache_lock:
+        cached = _manifest_cache.get(key)
+        if cached and cached[0] == mtime_ns:
+            _manifest_cache.move_to_end(key)
+            return cached[1]
+
+    manifest = read_manifest(bundle_dir)
+    if not manifest:
+        return None
+    index = {item['path']: item for item in manifest.get('files', [])}
+    with _manifest_cache_lock:
+        _manifest_cache[key] = (mtime_ns, index)
+        _manifest_cache.move_to_end(key)
+        while len(_manifest_cache) > MANIFEST_CACHE_SIZE:
+            _manifest_cache.popitem(last=False)
+    return index
+
+
+def _remove_path(path):
+    try:
+        if path.is_symlink() or path.is_file():
+            path.unlink()
+        elif path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+    except OSError:
+        pass
+
+
+def _swap_in(game_dir, version_dir):
+    """把 web 链接原子地指向新版本目录，返回被替换的旧目录（没有时返回 None）"""
+    link = game_dir / BUNDLE_LINK_NAME
+    old_dir = None
+    if link.is_symlink():
+        old_dir = game_dir / os.readlink(link)
+    elif link.exists():
+        # 旧方式部署的普通目录：先改名（仅此一次存在极短的空窗）
+        old_dir = game_dir / f'{BUNDLE_VERSION_PREFIX}legacy-{secrets.token_hex(4)}'
+        os.rename(link, old_dir)
+
+    temp_link = game_dir / f'.{BUNDLE_LINK_NAME}-{secrets.token_hex(4)}.link'
+    try:
+        os.symlink(version_dir.name, temp_link, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        # 没有创建符号链接的权限：直接把版本目录改名为 web
+        if link.is_symlink():
+            link.unlink()
+        os.rename(version_dir, link)
+        return old_dir
+    try:
+        os.replace(temp_link, link)
+    except OSError:
+        temp_link.unlink(missing_ok=True)
+        raise
+    return old_dir
+
+
+def _prune_versions(game_dir, keep):
+    """删除 keep 以外的版本目录（keep 为要保留的目录名集合）"""
+    for path in game_dir.iterdir():
+        if path.name.startswith(BUNDLE_VERSION_PREFIX) and path.name not in keep and not path.is_symlink():
+            _remove_path(path)
+
+
+def current_version(game_id):
+    """当前 Web 包的版本目录名；未部署或旧方式部署（普通目录，不支持版本化地址）时返回 None"""
+    try:
+        target = os.readlink(bundle_link(game_id))
+    except (OSError, ValueError):
+        return None
+    return target if is_version_name(target) else None
+
+
+def is_version_name(name):
+    return (
+        isinstance(name, str)
+        and name.startswith(BUNDLE_VERSION_PREFIX)
+        and '/' not in name
+        and '\\' not in name
+        and name not in ('.', '..')
+    )
+
+
+def deploy_bundle(archive_path, game_id, title, on_progress=None):
+    """
+    解压压缩包、生成预压缩副本并切换为当前 Web 包，返回入口 HTML（相对 web/ 的路径）
+    on_progress(阶段, 已处理数, 总数) 在每个文件解压 / 压缩后调用（阶段为 'extract' / 'compress'），
+    可抛出异常中止（暂存目录会被清理，当前版本不受影响）
+    压缩包无效或超出限制时抛出 BundleError
+    """
+    game_dir = game_root(game_id)
+    game_dir.mkdir(parents=True, exist_ok=True)
+    staging_dir = game_dir / f'{STAGING_PREFIX}{secrets.token_hex(6)}'
+    staging_dir.mkdir()
+    try:
+        try:
+            with zipfile.ZipFile(str(archive_path), 'r') as zf:
+                members = _validate_members(zf)
+                files = _extract_to(
+                    zf, members, staging_dir,
+                    (lambda done, total: on_progress('extract', done, total)) if on_progress else None,
+                )
+        except zipfile.BadZipFile:
+            raise BundleError('无效的 zip 文件')
+        except (NotImplementedError, RuntimeError) as e:
+            # 不支持的压缩算法、加密的压缩包
+            raise BundleError(f'无法解压: {str(e)}')
+
+        entry = resolve_entry(files, title)
+        if not entry:
+            raise BundleError(
+                f'未解析到可用 HTML（请保证解压后仅此一个 .html，'
+                f'或存在入口文件「{expected_entry_name(title)}」与当前游戏标题一致）'
+            )
+        precompress(
+            staging_dir, files,
+            (lambda done, total: on_progress('compress', done, total)) if on_progress else None,
+        )
+
+        version_dir = game_dir / f'{BUNDLE_VERSION_PREFIX}{time.strftime("%Y%m%d%H%M%S")}-{secrets.token_hex(4)}'
+        write_manifest(staging_dir, {
+            'version': version_dir.name,
+            'entry': entry,
+            'files': files,
+            'total_bytes': sum(f['size'] for f in files),
+            'created_at': int(time.time()),
+        })
+        os.rename(staging_dir, version_dir)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    try:
+        old_dir = _swap_in(game_dir, version_dir)
+    except BaseException:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+    # 保留上一个版本（旧方式部署的普通目录没有版本化地址，不需要保留），更早的版本删除
+    keep = {version_dir.name}
+    if old_dir is not None and read_manifest(old_dir) is not None:
+        keep.add(old_dir.name)
+    _prune_versions(game_dir, keep)
+    return entry
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    buffer = bytearray(COPY_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb') as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def _scan_files(bundle_dir):
+    """列出目录下的全部文件，生成清单项（用于旧方式部署、没有清单的 Web 包）"""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(bundle_dir):
+        dirnames.sort()
+        for name in sorted(filenames):
+            full_path = os.path.join(dirpath, name)
+            relative = os.path.relpath(full_path, bundle_dir).replace(os.sep, '/')
+            if relative == BUNDLE_MANIFEST_NAME or os.path.islink(full_path):
+                continue
+            files.append({'path': relative, 'size': os.path.getsize(full_path), 'sha256': _hash_file(full_path)})
+    return files
+
+
+def backfill_bundle(game_id, entry):
+    """
+    为已部署的 Web 包补齐内容哈希和预压缩副本
+    - 版本目录：在原目录中补齐，清单原子替换，正在访问的用户不受影响
+    - 旧方式部署的普通 web/ 目录：复制为新的版本目录后切换
+    返回 (版本号, 是否转换了旧目录)，没有 Web 包时返回 (None, False)
+    """
+    version = current_version(game_id)
+    game_dir = game_root(game_id)
+    if version:
+        bundle_dir = game_dir / version
+        manifest = read_manifest(bundle_dir) or {}
+        files = manifest.get('files')
+        if files is None:
+            files = _scan_files(bundle_dir)
+        for item in files:
+            if not item.get('sha256'):
+                item['sha256'] = _hash_file(bundle_dir.joinpath(*item['path'].split('/')))
+        precompress(bundle_dir, files)
+        manifest.update({
+            'version': version,
+            'entry': manifest.get('entry') or entry,
+            'files': files,
+            'total_bytes': sum(f['size'] for f in files),
+        })
+        manifest.setdefault('created_at', int(time.time()))
+        write_manifest(bundle_dir, manifest)
+        return version, False
+
+    link = bundle_link(game_id)
+    if link.is_symlink() or not link.is_dir():
+        return None, False
+    staging_dir = game_dir / f'{STAGING_PREFIX}{secrets.token_hex(6)}'
+    version_dir = game_dir / f'{BUNDLE_VERSION_PREFIX}{time.strftime("%Y%m%d%H%M%S")}-{secrets.token_hex(4)}'
+    try:
+        shutil.copytree(link, staging_dir, symlinks=True)
+        files = _scan_files(staging_dir)
+        precompress(staging_dir, files)
+        write_manifest(staging_dir, {
+            'version': version_dir.name,
+            'entry': entry,
+            'files': files,
+            'total_bytes': sum(f['size'] for f in files),
+            'created_at': int(time.time()),
+        })
+        os.rename(staging_dir, version_dir)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    old_dir = _swap_in(game_dir, version_dir)
+    if old_dir is not None:
+        _remove_path(old_dir)
+    return version_dir.name, True
+
+
+def remove_bundle(game_id):
+    """删除当前 Web 包（链接、版本目录以及中断遗留的暂存目录）"""
+    game_dir = game_root(game_id)
+    if not game_dir.is_dir():
+        return
+    _remove_path(game_dir / BUNDLE_LINK_NAME)
+    for path in game_dir.iterdir():
+        if path.name.startswith((BUNDLE_VERSION_PREFIX, STAGING_PREFIX)):
+            _remove_path(path)
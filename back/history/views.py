@@ -6,36 +6,7 @@ from django.http import JsonResponse
 from django.db import connection
 from django.views.decorators.http import require_GET, require_POST, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from common.jwt_utils import jwt_required
-from functools import wraps
-
-
-def admin_required(view_func):
-    """
-    管理员权限装饰器
-    需要先通过JWT认证，然后检查用户是否为管理员
-    """
-    @wraps(view_func)
-    @jwt_required
-    def _wrapped_view(request, *args, **kwargs):
-        # jwt_required 已经设置了 request.user_id
-        user_id = request.user_id
-        
-        # 检查用户是否为管理员
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT is_admin FROM users WHERE id = %s", [user_id])
-            row = cursor.fetchone()
-            
-            if not row or not row[0]:
-                return JsonResponse({
-                    'success': False,
-                    'error': '需要管理员权限',
-                    'code': 'ADMIN_REQUIRED'
-                }, status=403)
-        
-        return view_func(request, *args, **kwargs)
-    
-    return _wrapped_view
+from common.admin_auth import admin_required
 
 
 @csrf_exempt
@@ -0,0 +1,392 @@
+"""
+网盘内容去重存储
+开启 network_disk.dedup_enabled 后，上传完成的大文件按 SHA-256 存入 files/.blobs/ab/cd/<sha256>，
+用户目录中的文件是该 blob 的硬链接：同样内容上传多份时磁盘上只占一份。
+- 引用计数以 blob 的硬链接数为准（st_nlink - 1 即用户目录中的链接数），network_disk_blobs 表同步记录，
+  并按 inode 反查被删除的文件对应哪个 blob
+- 重命名不改变 inode，无需处理；删除（含目录删除、定时清理）前用 collect_linked 收集被删除的链接，
+  删除后用 settle_removed 更新引用计数，最后一个链接删除时回收 blob
+- 覆盖写入前必须先断开硬链接（break_link），否则会改写所有共享该 blob 的文件
+- 节省的字节数 = 每个 blob 的 (引用数 - 1) × 大小，记录在容量台账全局行的 saved_bytes
+- 硬链接共享同一个 inode 的 mtime，不能代表各副本的上传时间：链接时在 network_disk_link_times 按路径记录上传时间，
+  列表显示和定时清理对多链接文件使用该时间（get_upload_times），重命名时用 move_upload_times 同步路径
+同一个 blob 的链接与回收在 network_disk_blobs 行锁内完成；中途失败留下的不一致由 reconcile_blobs 校正。
+"""
+import hashlib
+import os
+import secrets
+from pathlib import Path
+
+from django.db import connection, transaction
+
+from . import usage_ledger
+
+
+# 去重存储目录（以 . 开头，列表、容量扫描和下载都会跳过）
+BLOB_DIR_NAME = '.blobs'
+BLOB_ROOT = usage_ledger.NETWORK_DISK_ROOT / BLOB_DIR_NAME
+
+# 小于该大小的文件不做去重（计算哈希和建立链接的开销大于节省的空间）
+MIN_DEDUP_SIZE = 1 * 1024 * 1024
+
+# 计算哈希时的读取块大小
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# 批量查询上传时间时每条 IN 查询的路径数
+UPLOAD_TIME_QUERY_BATCH = 500
+
+
+def is_enabled():
+    """是否开启了内容去重"""
+    from common.config_utils import get_config_value
+    return bool(get_config_value('network_disk.dedup_enabled', False))
+
+
+def is_internal_path(path_parts):
+    """路径（相对网盘根目录的各级名称）是否指向内部目录（去重存储等）"""
+    return bool(path_parts) and path_parts[0].startswith('.')
+
+
+def blob_path(sha256):
+    return BLOB_ROOT / sha256[:2] / sha256[2:4] / sha256
+
+
+def _saved(link_count, size):
+    """引用数为 link_count 的 blob 节省的字节数"""
+    return max(link_count - 1, 0) * size
+
+
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _relative_path(path):
+    """绝对路径转换为相对网盘根目录的路径，不在网盘内时返回 None"""
+    try:
+        return Path(path).resolve().relative_to(usage_ledger.NETWORK_DISK_ROOT.resolve()).as_posix()
+    except (OSError, ValueError):
+        return None
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _record_upload_time(cursor, path):
+    """记录（或刷新）某路径的上传时间"""
+    relative = _relative_path(path)
+    if relative is None:
+        return
+    cursor.execute(
+        """
+        INSERT INTO network_disk_link_times (path_hash, path, uploaded_at)
+        VALUES (SHA2(%s, 256), %s, NOW())
+        ON DUPLICATE KEY UPDATE path = VALUES(path), uploaded_at = NOW()
+        """,
+        [relative, relative]
+    )
+
+
+def get_upload_times(paths):
+    """
+    读取多链接（去重）文件各自的上传时间
+    paths 为绝对路径，只查询硬链接数大于 1 的文件；返回 {str(路径): 时间戳}，
+    没有记录的文件不出现在结果中（调用方使用文件自身的 mtime）
+    """
+    wanted = {}
+    for path in paths:
+        try:
+            if os.stat(path, follow_symlinks=False).st_nlink <= 1:
+                continue
+        except OSError:
+            continue
+        relative = _relative_path(path)
+        if relative is not None:
+            wanted[relative] = str(path)
+    if not wanted:
+        return {}
+
+    result = {}
+    relatives = list(wanted)
+    with connection.cursor() as cursor:
+        for start in range(0, len(relatives), UPLOAD_TIME_QUERY_BATCH):
+            batch = relatives[start:start + UPLOAD_TIME_QUERY_BATCH]
+            placeholders = ', '.join(['SHA2(%s, 256)'] * len(batch))
+            cursor.execute(
+                f"""
+                SELECT path, UNIX_TIMESTAMP(uploaded_at) FROM network_disk_link_times
+                WHERE path_hash IN ({placeholders})
+                """,
+                batch
+            )
+            for relative, timestamp in cursor.fetchall():
+                if relative in wanted and timestamp is not None:
+                    result[wanted[relative]] = float(timestamp)
+    return result
+
+
+def move_upload_times(old_path, new_path):
+    """重命名文件或目录后调用，把原路径（及其下所有文件）的上传时间记录移到新路径"""
+    old_relative = _relative_path(old_path)
+    new_relative = _relative_path(new_path)
+    if old_relative is None or new_relative is None or old_relative == new_relative:
+        return
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # 新路径上残留的记录（之前删除的文件）先清掉，避免主键冲突
+            cursor.execute(
+                "DELETE FROM network_disk_link_times WHERE path = %s OR path LIKE %s",
+                [new_relative, _escape_like(new_relative) + '/%']
+            )
+            # 先按原路径计算新哈希，再改路径（UPDATE 的赋值按顺序生效）
+            tail = len(old_relative) + 1
+            cursor.execute(
+                """
+                UPDATE network_disk_link_times
+                SET path_hash = SHA2(CONCAT(%s, SUBSTRING(path, %s)), 256),
+                    path = CONCAT(%s, SUBSTRING(path, %s))
+                WHERE path = %s OR path LIKE %s
+                """,
+                [new_relative, tail, new_relative, tail, old_relative, _escape_like(old_relative) + '/%']
+            )
+
+
+def forget_upload_times(paths):
+    """删除文件后调用，清除这些路径的上传时间记录（绝对路径）"""
+    relatives = [r for r in (_relative_path(path) for path in paths) if r is not None]
+    if not relatives:
+        return
+    with connection.cursor() as cursor:
+        for start in range(0, len(relatives), UPLOAD_TIME_QUERY_BATCH):
+            batch = relatives[start:start + UPLOAD_TIME_QUERY_BATCH]
+            placeholders = ', '.join(['SHA2(%s, 256)'] * len(batch))
+            cursor.execute(
+                f"DELETE FROM network_disk_link_times WHERE path_hash IN ({placeholders})",
+                batch
+            )
+
+
+def _lock_blob(cursor, sha256, size):
+    """确保 blob 记录存在并加行锁（需在事务内调用）"""
+    cursor.execute(
+        """
+        INSERT IGNORE INTO network_disk_blobs (sha256, size, device, inode, ref_count, created_at, last_linked_at)
+        VALUES (%s, %s, 0, 0, 0, NOW(), NOW())
+        """,
+        [sha256, size]
+    )
+    cursor.execute("SELECT sha256 FROM network_disk_blobs WHERE sha256 = %s FOR UPDATE", [sha256])
+
+
+def adopt_file(path, sha256=None):
+    """
+    将刚写入完成的用户文件纳入去重存储
+    已有相同内容的 blob 时，用指向 blob 的硬链接替换该文件；否则该文件本身成为新 blob
+    sha256 已知（如分片上传提交时校验过）可以传入，省去重新计算
+    未开启去重、文件太小或文件系统不支持硬链接时不做处理；返回本次节省的字节数
+    """
+    if not is_enabled():
+        return 0
+    path = Path(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 0
+    if stat.st_size < MIN_DEDUP_SIZE or stat.st_nlink > 1:
+        return 0
+
+    sha256 = (sha256 or file_sha256(path)).lower()
+    target = blob_path(sha256)
+    saved = 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            _lock_blob(cursor, sha256, stat.st_size)
+            try:
+                blob_stat = os.stat(target)
+            except FileNotFoundError:
+                blob_stat = None
+
+            try:
+                if blob_stat is not None and blob_stat.st_size == stat.st_size:
+                    # 已有相同内容：先链接到临时名再原子替换，任何时刻用户路径都是完整文件
+                    temp_link = path.with_name(f'.{path.name}.{secrets.token_hex(4)}.link')
+                    os.link(target, temp_link)
+                    try:
+                        os.replace(temp_link, path)
+                    except OSError:
+                        os.unlink(temp_link)
+                        raise
+                    links_before = blob_stat.st_nlink - 1
+                    saved = _saved(links_before + 1, stat.st_size) - _saved(links_before, stat.st_size)
+                    links_after = links_before + 1
+                    blob_stat = os.stat(target)
+                else:
+                    if blob_stat is not None:
+                        # 同名 blob 大小不一致（之前写入中断），以新文件为准
+                        os.unlink(target)
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    os.link(path, target)
+                    blob_stat = os.stat(target)
+                    links_after = 1
+            except OSError:
+                # 文件系统不支持硬链接等情况，保持普通文件
+                return 0
+
+            cursor.execute(
+                """
+                UPDATE network_disk_blobs
+                SET size = %s, device = %s, inode = %s, ref_count = %s, last_linked_at = NOW()
+                WHERE sha256 = %s
+                """,
+                [blob_stat.st_size, blob_stat.st_dev, blob_stat.st_ino, links_after, sha256]
+            )
+            # 不修改 mtime（会改到所有共享该 inode 的副本），上传时间按路径单独记录
+            _record_upload_time(cursor, path)
+
+    if saved:
+        usage_ledger.apply_delta(None, saved=saved)
+    return saved
+
+
+def collect_linked(path):
+    """
+    删除文件或目录前调用，收集其中有多个硬链接的文件
+    返回 {(st_dev, st_ino): [大小, 链接数]}，删除完成后传给 settle_removed
+    """
+    linked = {}
+    try:
+        stat = os.stat(path, follow_symlinks=False)
+    except OSError:
+        return linked
+    if os.path.isdir(path) and not os.path.islink(path):
+        usage_ledger.summarize_tree(path, linked)
+    elif stat.st_nlink > 1:
+        linked[(stat.st_dev, stat.st_ino)] = [stat.st_size, 1]
+    return linked
+
+
+def settle_removed(linked):
+    """
+    文件删除后更新对应 blob 的引用计数，没有引用的 blob 被回收
+    linked 为 collect_linked（或 summarize_tree 的 linked_inodes）的结果；返回节省字节数的变化（≤ 0）
+    """
+    if not linked:
+        return 0
+    inodes = sorted({inode for _, inode in linked})
+    placeholders = ', '.join(['%s'] * len(inodes))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT sha256, device, inode FROM network_disk_blobs WHERE inode IN ({placeholders})",
+            inodes
+        )
+        blobs = [(row[0], (row[1], row[2])) for row in cursor.fetchall() if (row[1], row[2]) in linked]
+
+    saved = 0
+    for sha256, key in blobs:
+        size, removed = linked[key]
+        target = blob_path(sha256)
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT inode FROM network_disk_blobs WHERE sha256 = %s FOR UPDATE", [sha256])
+                try:
+                    blob_stat = os.stat(target)
+                except FileNotFoundError:
+                    cursor.execute("DELETE FROM network_disk_blobs WHERE sha256 = %s", [sha256])
+                    continue
+                if (blob_stat.st_dev, blob_stat.st_ino) != key:
+                    continue
+
+                links_after = blob_stat.st_nlink - 1
+                saved += _saved(links_after, size) - _saved(links_after + removed, size)
+                if links_after <= 0:
+                    os.unlink(target)
+                    cursor.execute("DELETE FROM network_disk_blobs WHERE sha256 = %s", [sha256])
+                else:
+                    cursor.execute(
+                        "UPDATE network_disk_blobs SET ref_count = %s WHERE sha256 = %s",
+                        [links_after, sha256]
+                    )
+
+    if saved:
+        usage_ledger.apply_delta(None, saved=saved)
+    return saved
+
+
+def break_link(path):
+    """
+    覆盖写入前调用：文件是 blob 的硬链接时先删除该链接并更新引用计数，
+    之后以 'wb' 打开会创建新文件，不会改写共享的 blob
+    返回删除的文件大小（未删除时为 0）
+    """
+    linked = collect_linked(path)
+    if not linked:
+        return 0
+    os.unlink(path)
+    settle_removed(linked)
+    forget_upload_times([path])
+    return next(iter(linked.values()))[0]
+
+
+def reconcile_blobs():
+    """
+    全量校正去重存储（由容量台账的 reconcile 调用）：
+    按硬链接数重写引用计数，回收没有引用的 blob，删除磁盘上已不存在的记录，
+    并清除已删除（或不再是多链接）文件的上传时间记录
+    返回全部 blob 节省的字节数
+    """
+    found = {}
+    if BLOB_ROOT.is_dir():
+        for dirpath, _, filenames in os.walk(BLOB_ROOT):
+            for name in filenames:
+                full_path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(full_path, follow_symlinks=False)
+                except OSError:
+                    continue
+                if stat.st_nlink <= 1:
+                    # 没有用户文件引用（或中断留下的临时文件）
+                    try:
+                        os.unlink(full_path)
+                    except OSError:
+                        pass
+                    continue
+                found[name] = stat
+
+    saved = sum(_saved(stat.st_nlink - 1, stat.st_size) for stat in found.values())
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM network_disk_blobs")
+            if found:
+                cursor.executemany(
+                    """
+                    INSERT INTO network_disk_blobs (sha256, size, device, inode, ref_count, created_at, last_linked_at)
+                    VALUES (%s, %s, %s, %s, %s, NOW(), NOW())
+                    """,
+                    [
+                        (sha256, stat.st_size, stat.st_dev, stat.st_ino, stat.st_nlink - 1)
+                        for sha256, stat in found.items()
+                    ]
+                )
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT path_hash, path FROM network_disk_link_times")
+        rows = cursor.fetchall()
+    stale = []
+    for path_hash, relative in rows:
+        try:
+            if os.stat(usage_ledger.NETWORK_DISK_ROOT / relative, follow_symlinks=False).st_nlink > 1:
+                continue
+        except OSError:
+            pass
+        stale.append(path_hash)
+    if stale:
+        with connection.cursor() as cursor:
+            for start in range(0, len(stale), UPLOAD_TIME_QUERY_BATCH):
+                batch = stale[start:start + UPLOAD_TIME_QUERY_BATCH]
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(f"DELETE FROM network_disk_link_times WHERE path_hash IN ({placeholders})", batch)
+    return saved
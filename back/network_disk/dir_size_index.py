@@ -0,0 +1,125 @@
+"""
+网盘目录大小索引
+以相对网盘根目录的路径为键，把目录总大小连同目录自身的 mtime 缓存起来：
+- 列表页只读缓存，每个条目 O(1)，不再对每个子目录递归 stat
+- 目录自身 mtime 变化（直接子项增删改名）时缓存自动失效
+- 网盘自身的写操作（上传、删除、建目录、重命名、清理）调用 invalidate 让该路径及所有上级目录失效
+- 尚未计算的目录交给后台线程统计，本次返回 None，由调用方标记为“计算中”
+  （uwsgi 下依赖 enable-threads，见 depend_manage/uwsgi.ini，否则空闲时线程不运行，目录一直显示“计算中”）
+"""
+import hashlib
+import os
+import queue
+import threading
+from pathlib import Path
+
+from django.core.cache import cache
+
+from .usage_ledger import NETWORK_DISK_ROOT, summarize_tree
+
+
+# 缓存有效期（秒）：兜底过期，防止磁盘被外部深层修改后长期不刷新
+CACHE_TIMEOUT = 60 * 60
+CACHE_KEY_PREFIX = 'network_disk:dir_size:'
+
+
+def _relative_key(directory_path):
+    """把目录路径转换为相对网盘根目录的规范键，不在网盘内时返回 None"""
+    try:
+        relative = Path(directory_path).resolve().relative_to(NETWORK_DISK_ROOT.resolve())
+    except (OSError, ValueError):
+        return None
+    return relative.as_posix()
+
+
+def _cache_key(relative_key):
+    digest = hashlib.md5(relative_key.encode('utf-8')).hexdigest()
+    return f'{CACHE_KEY_PREFIX}{digest}'
+
+
+def _dir_mtime_ns(directory_path):
+    try:
+        return os.stat(directory_path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class _SizeWorker:
+    """后台目录大小统计线程，同一路径排队期间只统计一次"""
+    _queue = queue.Queue()
+    _pending = set()
+    _lock = threading.Lock()
+    _started = False
+
+    @classmethod
+    def start(cls):
+        with cls._lock:
+            if cls._started:
+                return
+            cls._started = True
+
+        def _loop():
+            while True:
+                relative_key = cls._queue.get()
+                try:
+                    compute(relative_key)
+                except Exception:
+                    pass
+                finally:
+                    with cls._lock:
+                        cls._pending.discard(relative_key)
+
+        t = threading.Thread(target=_loop, name="DirSizeIndexer", daemon=True)
+        t.start()
+
+    @classmethod
+    def submit(cls, relative_key):
+        cls.start()
+        with cls._lock:
+            if relative_key in cls._pending:
+                return
+            cls._pending.add(relative_key)
+        cls._queue.put(relative_key)
+
+
+def compute(relative_key):
+    """同步统计目录大小并写入缓存，返回字节数"""
+    directory_path = NETWORK_DISK_ROOT / relative_key if relative_key else NETWORK_DISK_ROOT
+    # 先记录 mtime 再统计，统计期间若有变化，下次读取时 mtime 不一致会重新统计
+    mtime_ns = _dir_mtime_ns(directory_path)
+    if mtime_ns is None:
+        return None
+    _, _, total_bytes = summarize_tree(directory_path)
+    cache.set(_cache_key(relative_key), (total_bytes, mtime_ns), CACHE_TIMEOUT)
+    return total_bytes
+
+
+def get_directory_size(directory_path, mtime_ns=None):
+    """
+    读取目录大小
+    命中且 mtime 未变化时返回字节数；否则提交后台统计并返回 None（计算中）
+    mtime_ns: 调用方已 stat 过目录时传入，避免重复 stat
+    """
+    relative_key = _relative_key(directory_path)
+    if relative_key is None:
+        return None
+    if mtime_ns is None:
+        mtime_ns = _dir_mtime_ns(directory_path)
+
+    cached = cache.get(_cache_key(relative_key))
+    if cached is not None and cached[1] == mtime_ns:
+        return cached[0]
+
+    _SizeWorker.submit(relative_key)
+    return None
+
+
+def invalidate(path):
+    """使某路径（文件或目录）及其所有上级目录的大小缓存失效"""
+    relative_key = _relative_key(path)
+    if relative_key is None:
+        return
+    parts = relative_key.split('/') if relative_key not in ('', '.') else []
+    keys = [_cache_key('/'.join(parts[:i])) for i in range(len(parts), 0, -1)]
+    if keys:
+        cache.delete_many(keys)
@@ -0,0 +1,83 @@
+"""
+网盘后台任务
+delete_tree：删除目录（由 delete_file 视图提交），自底向上逐个删除并上报进度，支持中途取消和失败重试。
+无论正常结束、取消还是出错，都按删除前后两次统计的差值扣减容量台账、结算去重存储的引用计数，
+重试时从剩余部分继续删除。
+"""
+import os
+
+from common.job_queue import JobError
+from . import usage_ledger, dir_size_index, blob_store
+
+
+def _remove_tree(job, target, total_files):
+    """自底向上删除目录，每个文件之后上报进度并检查取消"""
+    removed_files = 0
+    for dirpath, dirnames, filenames in os.walk(target, topdown=False):
+        for name in filenames:
+            os.unlink(os.path.join(dirpath, name))
+            removed_files += 1
+            job.set_progress(removed_files * 99 // max(total_files, 1), f'已删除 {removed_files}/{total_files} 个文件')
+            job.check_cancelled()
+        for name in dirnames:
+            path = os.path.join(dirpath, name)
+            if os.path.islink(path):
+                os.unlink(path)
+            else:
+                os.rmdir(path)
+    os.rmdir(target)
+
+
+def delete_tree(job):
+    """
+    删除网盘目录
+    payload: path（相对网盘根目录）、owner_id（台账所属用户）、is_user_root（用户根目录自身不计入目录数）
+    """
+    relative_path = job.payload['path']
+    owner_id = job.payload.get('owner_id')
+    path_parts = [p for p in relative_path.split('/') if p]
+    if not path_parts or blob_store.is_internal_path(path_parts):
+        raise JobError('无效的路径')
+    target = usage_ledger.NETWORK_DISK_ROOT / '/'.join(path_parts)
+    try:
+        target.resolve().relative_to(usage_ledger.NETWORK_DISK_ROOT.resolve())
+    except ValueError:
+        raise JobError('访问被拒绝')
+    if not target.is_dir():
+        # 已被删除（如上一次尝试已完成删除）
+        return {'path': relative_path, 'deleted_files': 0, 'deleted_dirs': 0, 'freed_bytes': 0}
+
+    job.set_progress(0, '正在统计目录内容', force=True)
+    linked_before = {}
+    files_before, dirs_before, bytes_before = usage_ledger.summarize_tree(target, linked_before)
+
+    try:
+        _remove_tree(job, target, files_before)
+    finally:
+        # 按删除前后的差值结算（取消或出错时只扣除实际删除的部分）
+        linked_after = {}
+        if target.is_dir():
+            files_after, dirs_after, bytes_after = usage_ledger.summarize_tree(target, linked_after)
+            root_removed = 0
+        else:
+            files_after, dirs_after, bytes_after = 0, 0, 0
+            root_removed = 0 if job.payload.get('is_user_root') else 1
+        deleted_files = files_before - files_after
+        deleted_dirs = dirs_before - dirs_after + root_removed
+        freed_bytes = bytes_before - bytes_after
+        usage_ledger.apply_delta(owner_id, files=-deleted_files, dirs=-deleted_dirs, size=-freed_bytes)
+
+        removed_links = {}
+        for key, (size, count) in linked_before.items():
+            removed = count - linked_after.get(key, [size, 0])[1]
+            if removed > 0:
+                removed_links[key] = [size, removed]
+        blob_store.settle_removed(removed_links)
+        dir_size_index.invalidate(target)
+
+    return {
+        'path': relative_path,
+        'deleted_files': deleted_files,
+        'deleted_dirs': deleted_dirs,
+        'freed_bytes': freed_bytes,
+    }
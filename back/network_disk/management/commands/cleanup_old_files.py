@@ -2,19 +2,231 @@
 网盘文件定时清理管理命令
 每天0:00执行，删除files文件夹下最近修改时间超过配置天数的文件和文件夹
 
+扫描为自底向上的单遍 os.scandir：每个目录只读取一次，先处理子目录，再批量删除本目录的过期文件，
+最后根据剩余条目数判断本目录是否为空（不再对每个候选目录重复 iterdir）。
+去重文件（共享 blob 的硬链接）的 mtime 属于所有副本，按各路径记录的上传时间判断是否过期。
+存储较慢（如网络盘）时可以用 --workers 开启线程池并行 stat / 删除。
+删除记录按批写入日志文件，控制台只显示进度和汇总，--json-summary 输出机器可读的统计结果。
+
 使用方法：
 python manage.py cleanup_old_files
+python manage.py cleanup_old_files --dry-run                  # 预览，不实际删除
+python manage.py cleanup_old_files --workers 16               # 16 个线程并行 stat / 删除
+python manage.py cleanup_old_files --json-summary summary.json
 
 可以设置cron任务每天0:00执行：
 0 0 * * * cd /webproject/my-blog/back && python3 manage.py cleanup_old_files
 """
 import os
+import json
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from common.config_utils import get_config_value
+from network_disk import usage_ledger, upload_sessions, blob_store
+
+
+# 每批删除的文件数
+DEFAULT_BATCH_SIZE = 256
+# 进度输出间隔（秒）
+DEFAULT_PROGRESS_INTERVAL = 5.0
+
+
+def _lstat_entry(entry):
+    try:
+        return entry.stat(follow_symlinks=False)
+    except OSError as e:
+        return e
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+        return None
+    except OSError as e:
+        return e
+
+
+class CleanupScanner:
+    """
+    自底向上的单遍扫描
+    目录的修改时间在其中的文件删除之后才读取，与逐步删除时的判断一致：
+    刚删空的目录修改时间会更新，要等下一个周期才会被删除
+    """
+
+    def __init__(self, root, cutoff_timestamp, dry_run=False, executor=None,
+                 batch_size=DEFAULT_BATCH_SIZE, progress_interval=DEFAULT_PROGRESS_INTERVAL,
+                 on_deleted=None, on_error=None, on_progress=None):
+        self.root = Path(root)
+        self.cutoff = cutoff_timestamp
+        self.dry_run = dry_run
+        self.executor = executor
+        self.batch_size = max(batch_size, 1)
+        self.progress_interval = progress_interval
+        self.on_deleted = on_deleted
+        self.on_error = on_error
+        self.on_progress = on_progress
+
+        self.stats = {
+            'scanned_files': 0,
+            'scanned_dirs': 0,
+            'deleted_files': 0,
+            'deleted_dirs': 0,
+            'freed_bytes': 0,
+        }
+        self.deleted_files = []
+        self.deleted_dirs = []
+        self.errors = []
+        # 按用户累计的台账扣减量：{owner_id: [文件数, 目录数, 字节数]}
+        self.ledger_deltas = {}
+        # 被删除的去重文件链接，删除完成后统一更新 blob 引用计数
+        self.removed_links = {}
+        # 被删除的去重文件路径，删除完成后统一清除上传时间记录
+        self.removed_link_paths = []
+        # 待删除的文件：[(路径, 相对路径各级名称, stat)]，只包含当前目录的文件
+        self._pending = []
+        self._started = time.monotonic()
+        self._last_progress = self._started
+
+    def run(self):
+        self._scan_dir(self.root, ())
+        self._flush()
+
+    def error(self, message):
+        self.errors.append(message)
+        if self.on_error:
+            self.on_error(message)
+
+    def _map(self, fn, items):
+        if self.executor is None or len(items) < 2:
+            return [fn(item) for item in items]
+        return list(self.executor.map(fn, items))
+
+    def _scan_dir(self, path, parts):
+        """
+        处理一个目录（先子目录后文件），返回处理后目录中剩余的条目数，无法读取时返回 None
+        网盘根目录下以 . 开头的内部目录（去重存储等）由引用计数管理，不按时间清理
+        """
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError as e:
+            self.error(f'读取文件夹失败 {path}: {str(e)}')
+            return None
+        self.stats['scanned_dirs'] += 1
+
+        remaining = len(entries)
+        files = []
+        for entry in entries:
+            child_parts = parts + (entry.name,)
+            if not parts and blob_store.is_internal_path(child_parts):
+                continue
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if self._scan_subdir(entry.path, child_parts):
+                    remaining -= 1
+            else:
+                files.append((entry, child_parts))
+
+        file_stats = self._map(_lstat_entry, [entry for entry, _ in files])
+        # 去重文件按路径记录的上传时间判断（本目录没有多链接文件时不查库）
+        linked_paths = [
+            entry.path for (entry, _), stat in zip(files, file_stats)
+            if not isinstance(stat, OSError) and stat.st_nlink > 1
+        ]
+        upload_times = blob_store.get_upload_times(linked_paths) if linked_paths else {}
+        for (entry, child_parts), stat in zip(files, file_stats):
+            if isinstance(stat, OSError):
+                self.error(f'读取文件信息失败 {entry.path}: {str(stat)}')
+                continue
+            self.stats['scanned_files'] += 1
+            if upload_times.get(entry.path, stat.st_mtime) < self.cutoff:
+                self._pending.append((entry.path, child_parts, stat))
+                if len(self._pending) >= self.batch_size:
+                    remaining -= self._flush()
+        # 本目录的过期文件先删除，目录的修改时间和是否为空才准确
+        remaining -= self._flush()
+
+        self._maybe_report_progress()
+        return remaining
+
+    def _scan_subdir(self, path, parts):
+        """处理子目录，处理后为空且超过天数时删除，返回是否已删除"""
+        if self._scan_dir(path, parts) != 0:
+            return False
+        try:
+            if os.stat(path, follow_symlinks=False).st_mtime >= self.cutoff:
+                return False
+            if not self.dry_run:
+                os.rmdir(path)
+        except OSError as e:
+            # 文件夹可能已被删除、刚写入新文件或无法访问
+            if os.path.exists(path):
+                self.error(f'删除文件夹失败 {path}: {str(e)}')
+            return False
+
+        relative = '/'.join(parts)
+        self.stats['deleted_dirs'] += 1
+        self.deleted_dirs.append(relative)
+        if self.on_deleted:
+            self.on_deleted('dir', [relative])
+        if self.dry_run:
+            return False
+        # 用户根目录自身不计入目录数
+        if len(parts) > 1:
+            owner_id = usage_ledger.owner_id_from_parts(parts)
+            self.ledger_deltas.setdefault(owner_id, [0, 0, 0])[1] -= 1
+        return True
+
+    def _flush(self):
+        """批量删除待删除的文件，返回实际删除的数量（DRY RUN 时为 0）"""
+        batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        if self.dry_run:
+            results = [None] * len(batch)
+        else:
+            results = self._map(_unlink, [path for path, _, _ in batch])
+
+        deleted = []
+        for (path, parts, stat), result in zip(batch, results):
+            if result is not None:
+                self.error(f'删除文件失败 {path}: {str(result)}')
+                continue
+            relative = '/'.join(parts)
+            deleted.append(relative)
+            self.stats['deleted_files'] += 1
+            self.stats['freed_bytes'] += stat.st_size
+            if self.dry_run:
+                continue
+            owner_id = usage_ledger.owner_id_from_parts(parts)
+            delta = self.ledger_deltas.setdefault(owner_id, [0, 0, 0])
+            delta[0] -= 1
+            delta[2] -= stat.st_size
+            if stat.st_nlink > 1:
+                link = self.removed_links.setdefault((stat.st_dev, stat.st_ino), [stat.st_size, 0])
+                link[1] += 1
+                self.removed_link_paths.append(path)
+
+        self.deleted_files.extend(deleted)
+        if deleted and self.on_deleted:
+            self.on_deleted('file', deleted)
+        return 0 if self.dry_run else len(deleted)
+
+    def _maybe_report_progress(self):
+        if not self.on_progress or self.progress_interval <= 0:
+            return
+        now = time.monotonic()
+        if now - self._last_progress >= self.progress_interval:
+            self._last_progress = now
+            self.on_progress(self.stats, now - self._started)
 
 
 class Command(BaseCommand):
@@ -23,6 +235,8 @@ class Command(BaseCommand):
     def __init__(self):
         super().__init__()
         self.logger = None
+        self.quiet = False
+        self.verbosity = 1
         self.log_file_path = Path(settings.BASE_DIR/'..'/'log'/'back.log')
         self.max_log_size = 50 * 1024 * 1024  # 50MB
 
@@ -118,8 +332,10 @@ class Command(BaseCommand):
 
     def log_message(self, message, level='info', style=None):
         """将消息同时输出到控制台和日志文件"""
-        # 输出到控制台
-        if style:
+        # 输出到控制台（JSON 统计输出到标准输出时不输出）
+        if self.quiet:
+            pass
+        elif style:
             self.stdout.write(style(message))
         else:
             self.stdout.write(message)
@@ -154,6 +370,30 @@ class Command(BaseCommand):
             action='store_true',
             help='不写入日志文件，仅输出到控制台'
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='并行 stat / 删除的线程数（默认0：在当前线程执行，存储较慢时可设为 8~32）'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'每批删除的文件数（默认{DEFAULT_BATCH_SIZE}）'
+        )
+        parser.add_argument(
+            '--progress-interval',
+            type=float,
+            default=DEFAULT_PROGRESS_INTERVAL,
+            help=f'进度输出间隔（秒，默认{DEFAULT_PROGRESS_INTERVAL:g}，0 表示不输出进度）'
+        )
+        parser.add_argument(
+            '--json-summary',
+            metavar='FILE',
+            default=None,
+            help='将统计结果以 JSON 写入指定文件；为 - 时输出到标准输出（此时不输出其他控制台信息）'
+        )
 
     def handle(self, *args, **options):
         # 优先使用命令行参数，如果没有则从配置文件读取
@@ -163,6 +403,10 @@ class Command(BaseCommand):
         
         dry_run = options['dry_run']
         no_log = options.get('no_log', False)
+        workers = max(options['workers'], 0)
+        json_summary = options['json_summary']
+        self.quiet = json_summary == '-'
+        self.verbosity = options.get('verbosity', 1)
         
         # 初始化日志（除非指定了 --no-log）
         if not no_log:
@@ -172,174 +416,134 @@ class Command(BaseCommand):
         network_disk_root = Path(settings.BASE_DIR) / 'api' / 'static' / 'files'
         
         if not network_disk_root.exists():
-            msg = f'网盘目录不存在: {network_disk_root}'
-            if no_log:
-                self.stdout.write(self.style.WARNING(msg))
-            else:
-                self.log_message(msg, 'warning', self.style.WARNING)
+            self.log_message(f'网盘目录不存在: {network_disk_root}', 'warning', self.style.WARNING)
             return
         
         # 计算截止时间（当前时间减去指定天数）
         cutoff_time = datetime.now() - timedelta(days=days)
         
-        start_msg = f'开始清理 {days} 天前修改的文件...'
-        cutoff_msg = f'截止时间: {cutoff_time.strftime("%Y-%m-%d %H:%M:%S")}'
-        
-        if no_log:
-            self.stdout.write(self.style.SUCCESS(start_msg))
-            self.stdout.write(cutoff_msg)
-        else:
-            self.log_message(start_msg, 'info', self.style.SUCCESS)
-            self.log_message(cutoff_msg, 'info')
-        
+        self.log_message(f'开始清理 {days} 天前修改的文件和空文件夹...', 'info', self.style.SUCCESS)
+        self.log_message(f'截止时间: {cutoff_time.strftime("%Y-%m-%d %H:%M:%S")}', 'info')
         if dry_run:
-            dry_run_msg = 'DRY RUN 模式：仅显示，不删除'
-            if no_log:
-                self.stdout.write(self.style.WARNING(dry_run_msg))
-            else:
-                self.log_message(dry_run_msg, 'warning', self.style.WARNING)
-        
-        deleted_files = []
-        deleted_dirs = []
-        errors = []
-        
-        # 第一步：删除所有超过指定天数的文件
-        step1_msg = f'删除超过{days}天的文件...'
-        if no_log:
-            self.stdout.write(step1_msg)
-        else:
-            self.log_message(step1_msg, 'info')
+            self.log_message('DRY RUN 模式：仅显示，不删除', 'warning', self.style.WARNING)
+        if workers:
+            self.log_message(f'并行线程数: {workers}', 'info')
         
+        started = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cleanup') if workers else None
+        scanner = CleanupScanner(
+            network_disk_root,
+            cutoff_time.timestamp(),
+            dry_run=dry_run,
+            executor=executor,
+            batch_size=options['batch_size'],
+            progress_interval=options['progress_interval'],
+            on_deleted=lambda kind, paths: self.report_deleted(kind, paths, dry_run),
+            on_error=lambda message: self.log_message(message, 'error', self.style.ERROR),
+            on_progress=self.report_progress,
+        )
         try:
-            for item in network_disk_root.rglob('*'):
-                if item.is_file():
-                    try:
-                        # 获取最后修改时间
-                        mtime = datetime.fromtimestamp(item.stat().st_mtime)
-                        
-                        # 如果修改时间早于截止时间，删除文件
-                        if mtime < cutoff_time:
-                            if not dry_run:
-                                item.unlink()
-                            deleted_files.append(str(item.relative_to(network_disk_root)))
-                            delete_msg = f'{"[DRY RUN] " if dry_run else ""}删除文件: {item.relative_to(network_disk_root)}'
-                            if no_log:
-                                self.stdout.write(delete_msg)
-                            else:
-                                self.log_message(delete_msg, 'info')
-                    except (OSError, PermissionError) as e:
-                        error_msg = f'删除文件失败 {item}: {str(e)}'
-                        errors.append(error_msg)
-                        if no_log:
-                            self.stdout.write(self.style.ERROR(error_msg))
-                        else:
-                            self.log_message(error_msg, 'error', self.style.ERROR)
+            scanner.run()
         except Exception as e:
-            error_msg = f'扫描文件过程出错: {str(e)}'
-            errors.append(error_msg)
-            if no_log:
-                self.stdout.write(self.style.ERROR(error_msg))
-            else:
-                self.log_message(error_msg, 'error', self.style.ERROR)
+            scanner.error(f'扫描过程出错: {str(e)}')
+        finally:
+            if executor:
+                executor.shutdown()
+        errors = scanner.errors
         
-        # 第二步：删除空文件夹（从最深层的文件夹开始，向上删除）
-        step2_msg = f'删除超过{days}天且为空的文件夹...'
-        if no_log:
-            self.stdout.write('')
-            self.stdout.write(step2_msg)
-        else:
-            self.log_message('', 'info')
-            self.log_message(step2_msg, 'info')
+        # 将删除结果同步到网盘容量台账
+        for owner_id, (files_delta, dirs_delta, size_delta) in scanner.ledger_deltas.items():
+            try:
+                usage_ledger.apply_delta(owner_id, files=files_delta, dirs=dirs_delta, size=size_delta)
+            except Exception as e:
+                scanner.error(f'更新容量台账失败（用户 {owner_id}）: {str(e)}')
         
+        # 更新去重存储的引用计数，回收不再被引用的 blob
         try:
-            # 获取所有文件夹，按深度从深到浅排序
-            all_dirs = []
-            for item in network_disk_root.rglob('*'):
-                if item.is_dir():
-                    all_dirs.append(item)
-            
-            # 按路径深度排序（最深的在前）
-            all_dirs.sort(key=lambda x: len(x.parts), reverse=True)
-            
-            for item in all_dirs:
-                try:
-                    # 检查文件夹是否仍然存在（可能已被删除）
-                    if not item.exists():
-                        continue
-                    
-                    # 获取最后修改时间
-                    mtime = datetime.fromtimestamp(item.stat().st_mtime)
-                    
-                    # 如果修改时间早于截止时间
-                    if mtime < cutoff_time:
-                        # 检查文件夹是否为空
-                        try:
-                            contents = list(item.iterdir())
-                            if len(contents) == 0:
-                                # 空文件夹：删除
-                                if not dry_run:
-                                    item.rmdir()
-                                deleted_dirs.append(str(item.relative_to(network_disk_root)))
-                                delete_dir_msg = f'{"[DRY RUN] " if dry_run else ""}删除空文件夹: {item.relative_to(network_disk_root)}'
-                                if no_log:
-                                    self.stdout.write(delete_dir_msg)
-                                else:
-                                    self.log_message(delete_dir_msg, 'info')
-                        except OSError as e:
-                            # 文件夹可能已被删除或无法访问
-                            pass
-                except (OSError, PermissionError) as e:
-                    error_msg = f'处理文件夹失败 {item}: {str(e)}'
-                    errors.append(error_msg)
-                    if no_log:
-                        self.stdout.write(self.style.ERROR(error_msg))
-                    else:
-                        self.log_message(error_msg, 'error', self.style.ERROR)
-        
+            blob_store.settle_removed(scanner.removed_links)
+            blob_store.forget_upload_times(scanner.removed_link_paths)
         except Exception as e:
-            error_msg = f'扫描过程出错: {str(e)}'
-            errors.append(error_msg)
-            if no_log:
-                self.stdout.write(self.style.ERROR(error_msg))
-            else:
-                self.log_message(error_msg, 'error', self.style.ERROR)
+            scanner.error(f'更新去重存储引用计数失败: {str(e)}')
+        
+        # 清理过期的分片上传会话（释放预留容量、删除临时文件）
+        expired_sessions = 0
+        if not dry_run:
+            try:
+                expired_sessions = upload_sessions.cleanup_expired_sessions()
+                if expired_sessions:
+                    self.log_message(f'清理过期分片上传会话: {expired_sessions} 个', 'info')
+            except Exception as e:
+                scanner.error(f'清理分片上传会话失败: {str(e)}')
+        
+        elapsed = time.monotonic() - started
+        stats = scanner.stats
+        scanned_items = stats['scanned_files'] + stats['scanned_dirs']
+        items_per_second = scanned_items / elapsed if elapsed > 0 else float(scanned_items)
         
         # 输出统计信息
         summary_separator = '-' * 50
-        summary_complete = '清理完成'
-        summary_files = f'删除文件数: {len(deleted_files)}'
-        summary_dirs = f'删除文件夹数: {len(deleted_dirs)}'
-        summary_errors = f'错误数: {len(errors)}' if errors else None
+        self.log_message('', 'info')
+        self.log_message(summary_separator, 'info', self.style.SUCCESS)
+        self.log_message('清理完成', 'info', self.style.SUCCESS)
+        self.log_message(f'扫描文件数: {stats["scanned_files"]}，扫描文件夹数: {stats["scanned_dirs"]}', 'info')
+        self.log_message(f'删除文件数: {stats["deleted_files"]}（{stats["freed_bytes"] / 1024 / 1024:.2f}MB）', 'info')
+        self.log_message(f'删除文件夹数: {stats["deleted_dirs"]}', 'info')
+        self.log_message(f'耗时: {elapsed:.2f} 秒，扫描速度: {items_per_second:.0f} 项/秒', 'info')
+        if errors:
+            self.log_message(f'错误数: {len(errors)}', 'error', self.style.ERROR)
+        self.log_message(summary_separator, 'info', self.style.SUCCESS)
         
-        if no_log:
-            self.stdout.write('')
-            self.stdout.write(self.style.SUCCESS(summary_separator))
-            self.stdout.write(self.style.SUCCESS(summary_complete))
-            self.stdout.write(summary_files)
-            self.stdout.write(summary_dirs)
-            if errors:
-                self.stdout.write(self.style.ERROR(summary_errors))
-            self.stdout.write(self.style.SUCCESS(summary_separator))
-        else:
+        if errors:
             self.log_message('', 'info')
-            self.log_message(summary_separator, 'info', self.style.SUCCESS)
-            self.log_message(summary_complete, 'info', self.style.SUCCESS)
-            self.log_message(summary_files, 'info')
-            self.log_message(summary_dirs, 'info')
-            if errors:
-                self.log_message(summary_errors, 'error', self.style.ERROR)
-            self.log_message(summary_separator, 'info', self.style.SUCCESS)
+            self.log_message('错误详情:', 'error', self.style.ERROR)
+            for error in errors:
+                self.log_message(f'  - {error}', 'error', self.style.ERROR)
         
-        if errors:
-            error_detail_title = '错误详情:'
-            if no_log:
-                self.stdout.write('')
-                self.stdout.write(self.style.ERROR(error_detail_title))
-                for error in errors:
-                    self.stdout.write(self.style.ERROR(f'  - {error}'))
+        if json_summary:
+            summary = {
+                'days': days,
+                'cutoff_time': cutoff_time.isoformat(timespec='seconds'),
+                'dry_run': dry_run,
+                'workers': workers,
+                'scanned_files': stats['scanned_files'],
+                'scanned_dirs': stats['scanned_dirs'],
+                'deleted_files': stats['deleted_files'],
+                'deleted_dirs': stats['deleted_dirs'],
+                'freed_bytes': stats['freed_bytes'],
+                'expired_upload_sessions': expired_sessions,
+                'elapsed_seconds': round(elapsed, 3),
+                'items_per_second': round(items_per_second, 1),
+                'deleted_file_paths': scanner.deleted_files,
+                'deleted_dir_paths': scanner.deleted_dirs,
+                'errors': errors,
+            }
+            content = json.dumps(summary, ensure_ascii=False, indent=2)
+            if json_summary == '-':
+                self.stdout.write(content)
             else:
-                self.log_message('', 'info')
-                self.log_message(error_detail_title, 'error', self.style.ERROR)
-                for error in errors:
-                    self.log_message(f'  - {error}', 'error', self.style.ERROR)
+                Path(json_summary).write_text(content + '\n', encoding='utf-8')
 
+    def report_deleted(self, kind, paths, dry_run):
+        """
+        输出一批删除记录：写入日志文件时一批合并为一条记录；
+        控制台只在 DRY RUN 或 -v 2 时逐条显示
+        """
+        label = '删除文件' if kind == 'file' else '删除空文件夹'
+        lines = [f'{"[DRY RUN] " if dry_run else ""}{label}: {path}' for path in paths]
+        if not self.quiet and (dry_run or self.verbosity >= 2):
+            for line in lines:
+                self.stdout.write(line)
+        if self.logger:
+            self.logger.info('\n'.join(lines))
+
+    def report_progress(self, stats, elapsed):
+        """输出扫描进度与吞吐量"""
+        scanned_items = stats['scanned_files'] + stats['scanned_dirs']
+        rate = scanned_items / elapsed if elapsed > 0 else 0
+        message = (
+            f'进度: 已扫描 {stats["scanned_files"]} 个文件 / {stats["scanned_dirs"]} 个文件夹，'
+            f'删除 {stats["deleted_files"]} 个文件（{stats["freed_bytes"] / 1024 / 1024:.2f}MB）、'
+            f'{stats["deleted_dirs"]} 个文件夹，{rate:.0f} 项/秒'
+        )
+        if not self.quiet:
+            self.stdout.write(message)
@@ -0,0 +1,47 @@
+"""
+网盘容量台账校正管理命令
+全量扫描 files 文件夹，按用户重新统计文件数、目录数和占用字节数并覆盖 network_disk_usage 表，
+用于修正手工改动磁盘、进程异常退出等原因造成的台账漂移
+
+使用方法：
+python manage.py reconcile_disk_usage
+
+可以设置cron任务每天0:30执行（在 cleanup_old_files 之后）：
+30 0 * * * cd /webproject/my-blog/back && python3 manage.py reconcile_disk_usage
+"""
+from django.core.management.base import BaseCommand
+from network_disk import usage_ledger
+
+
+class Command(BaseCommand):
+    help = '全量扫描网盘目录，校正网盘容量台账'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='仅显示台账与磁盘的差异，不写入数据库'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        before = usage_ledger.get_usage()
+        if dry_run:
+            file_count, dir_count, total_bytes = usage_ledger.scan_usage()[usage_ledger.GLOBAL_OWNER_ID]
+            self.stdout.write(self.style.WARNING('DRY RUN 模式：仅显示，不写入'))
+        else:
+            file_count, dir_count, total_bytes = usage_ledger.reconcile()
+
+        self.stdout.write(
+            f'台账记录: 文件 {before["file_count"]} 个, 目录 {before["dir_count"]} 个, '
+            f'{before["total_bytes"]} 字节'
+        )
+        self.stdout.write(
+            f'磁盘实际: 文件 {file_count} 个, 目录 {dir_count} 个, {total_bytes} 字节'
+        )
+
+        drift = total_bytes - before['total_bytes']
+        if drift:
+            self.stdout.write(self.style.WARNING(f'容量漂移: {drift:+d} 字节'))
+        self.stdout.write(self.style.SUCCESS('校正完成' if not dry_run else '检查完成'))
@@ -0,0 +1,445 @@
+"""
+网盘分片上传会话
+大文件上传拆分为：初始化会话 → 并行上传分片 → 查询已收到的分片（断线续传）→ 提交
+- 初始化时按文件大小在容量台账上预留容量，会话取消或过期时释放
+- 临时文件在初始化时按文件大小预先分配，分片按偏移写入、互不重叠，同一客户端可以并行上传多个分片
+- 已收到的分片记录在 network_disk_upload_chunks 表，查询会话即可得到已收到的区间
+- 提交时校验分片齐全和 SHA-256（初始化时提供了才校验），再原子重命名到目标路径，
+  开启去重时直接用已校验的哈希纳入去重存储
+- 提交中的会话记录提交开始时间和覆盖前的目标文件大小，进程在提交途中退出时，
+  由 cleanup_expired_sessions 在 COMMIT_TIMEOUT_MINUTES 后回滚（临时文件还在）或结算（已重命名）
+临时文件放在 files 目录之外，不计入网盘列表和容量扫描，预留的容量由会话表记录。
+"""
+import hashlib
+import os
+import secrets
+import shutil
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import usage_ledger, dir_size_index, blob_store
+
+
+# 分片临时文件目录（不在 files 目录下）
+UPLOAD_TMP_DIR = Path(settings.BASE_DIR) / 'api' / 'upload_tmp'
+
+# 分片大小（字节）：默认 8MB，允许 1MB ~ 64MB，最后一个分片可以更小
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_CHUNK_SIZE = 1 * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# 会话有效期（小时），每收到一个分片顺延
+SESSION_TTL_HOURS = 24
+
+# 提交中状态的最长时间（分钟），超过后视为提交进程已退出，由清理任务回滚或结算
+COMMIT_TIMEOUT_MINUTES = 30
+
+# 读取请求体、写入临时文件的块大小
+WRITE_BLOCK_SIZE = 1024 * 1024
+
+_SESSION_COLUMNS = (
+    'id', 'user_id', 'owner_id', 'target_path', 'file_size', 'file_hash',
+    'chunk_size', 'total_chunks', 'reserved_bytes', 'status', 'created_at', 'expires_at',
+)
+
+
+class UploadSessionError(Exception):
+    """分片上传错误，status 为返回给前端的 HTTP 状态码"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _temp_path(upload_id):
+    return UPLOAD_TMP_DIR / f'{upload_id}.part'
+
+
+def _target_file(session):
+    return usage_ledger.NETWORK_DISK_ROOT / session['target_path']
+
+
+def _chunk_length(session, chunk_index):
+    """第 chunk_index 个分片应有的长度"""
+    start = chunk_index * session['chunk_size']
+    return min(session['chunk_size'], session['file_size'] - start)
+
+
+def _fetch_session(cursor, where_sql, params):
+    cursor.execute(
+        f"SELECT {', '.join(_SESSION_COLUMNS)} FROM network_disk_upload_sessions WHERE {where_sql}",
+        params
+    )
+    row = cursor.fetchone()
+    return dict(zip(_SESSION_COLUMNS, row)) if row else None
+
+
+def normalize_file_hash(file_hash):
+    """校验并规范化 SHA-256（64 位十六进制），为空时返回 None"""
+    if not file_hash:
+        return None
+    file_hash = str(file_hash).strip().lower()
+    if len(file_hash) != 64 or any(c not in '0123456789abcdef' for c in file_hash):
+        raise UploadSessionError('hash 必须是 SHA-256 十六进制字符串')
+    return file_hash
+
+
+def create_session(user_id, owner_id, target_file, file_size, file_hash=None, chunk_size=None):
+    """
+    创建（或恢复）上传会话
+    同一用户对同一目标路径、相同大小和哈希的未过期会话直接返回，便于刷新页面后续传
+    """
+    if not isinstance(file_size, int) or file_size < 0:
+        raise UploadSessionError('文件大小无效')
+    chunk_size = DEFAULT_CHUNK_SIZE if chunk_size is None else chunk_size
+    if not isinstance(chunk_size, int) or not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+        raise UploadSessionError(f'分片大小必须在 {MIN_CHUNK_SIZE} 到 {MAX_CHUNK_SIZE} 字节之间')
+    file_hash = normalize_file_hash(file_hash)
+    target_path = Path(target_file).relative_to(usage_ledger.NETWORK_DISK_ROOT).as_posix()
+
+    with connection.cursor() as cursor:
+        existing = _fetch_session(
+            cursor,
+            "user_id = %s AND target_path = %s AND file_size = %s AND file_hash <=> %s "
+            "AND status = 'uploading' AND expires_at > NOW() ORDER BY created_at DESC LIMIT 1",
+            [user_id, target_path, file_size, file_hash]
+        )
+    if existing and _temp_path(existing['id']).is_file():
+        return existing
+
+    # 覆盖同名文件时只需为增量部分预留容量
+    old_size = target_file.stat().st_size if target_file.is_file() else 0
+    reserved = max(file_size - old_size, 0)
+    if not usage_ledger.reserve_bytes(reserved):
+        used_size_bytes = usage_ledger.get_usage()['total_bytes']
+        raise UploadSessionError(
+            f'存储空间不足，无法上传。当前已用 {round(used_size_bytes / (1024 ** 3), 2)}G / '
+            f'{usage_ledger.TOTAL_CAPACITY_GB}G，上传此文件后将超过限制'
+        )
+
+    upload_id = secrets.token_hex(16)
+    temp_path = _temp_path(upload_id)
+    try:
+        UPLOAD_TMP_DIR.mkdir(parents=True, exist_ok=True)
+        # 预先分配到目标大小（稀疏文件），各分片直接按偏移写入
+        with open(temp_path, 'wb') as f:
+            f.truncate(file_size)
+        total_chunks = (file_size + chunk_size - 1) // chunk_size
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO network_disk_upload_sessions
+                    (id, user_id, owner_id, target_path, file_size, file_hash,
+                     chunk_size, total_chunks, reserved_bytes, status, created_at, expires_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'uploading', NOW(), NOW() + INTERVAL %s HOUR)
+                """,
+                [upload_id, user_id, owner_id, target_path, file_size, file_hash,
+                 chunk_size, total_chunks, reserved, SESSION_TTL_HOURS]
+            )
+            return _fetch_session(cursor, "id = %s", [upload_id])
+    except Exception:
+        usage_ledger.release_bytes(reserved)
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+def get_session(upload_id, user_id):
+    """获取当前用户的未过期会话，不存在时抛出 404"""
+    with connection.cursor() as cursor:
+        session = _fetch_session(
+            cursor,
+            "id = %s AND user_id = %s AND expires_at > NOW()",
+            [upload_id, user_id]
+        )
+    if not session:
+        raise UploadSessionError('上传会话不存在或已过期', status=404)
+    return session
+
+
+def get_received_chunks(session):
+    """已收到的分片序号（升序）"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT chunk_index FROM network_disk_upload_chunks WHERE upload_id = %s ORDER BY chunk_index",
+            [session['id']]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def describe_session(session, received=None):
+    """会话状态：已收到的分片序号、合并后的字节区间（闭区间）和已收到的字节数"""
+    if received is None:
+        received = get_received_chunks(session)
+    ranges = []
+    for chunk_index in received:
+        start = chunk_index * session['chunk_size']
+        end = start + _chunk_length(session, chunk_index) - 1
+        if ranges and ranges[-1][1] + 1 == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return {
+        'upload_id': session['id'],
+        'path': session['target_path'],
+        'size': session['file_size'],
+        'chunk_size': session['chunk_size'],
+        'total_chunks': session['total_chunks'],
+        'received_chunks': received,
+        'received_ranges': ranges,
+        'received_bytes': sum(end - start + 1 for start, end in ranges),
+        'status': session['status'],
+        'expires_at': session['expires_at'].isoformat() if session['expires_at'] else None,
+    }
+
+
+def write_chunk(session, offset, stream, content_length):
+    """
+    把请求体写入临时文件的 offset 处
+    offset 必须是分片边界，长度必须等于该分片的应有长度；重复上传同一分片会覆盖写入
+    返回分片序号
+    """
+    if session['status'] != 'uploading':
+        raise UploadSessionError('会话正在提交或已结束', status=409)
+    if offset < 0 or offset >= max(session['file_size'], 1) or offset % session['chunk_size']:
+        raise UploadSessionError('偏移量必须是分片大小的整数倍且不超过文件大小')
+    chunk_index = offset // session['chunk_size']
+    expected_length = _chunk_length(session, chunk_index)
+    if content_length != expected_length:
+        raise UploadSessionError(f'分片长度应为 {expected_length} 字节')
+
+    temp_path = _temp_path(session['id'])
+    try:
+        # r+b 不截断文件；各分片写入不同区间，并行写入互不影响（Windows 没有 os.pwrite）
+        f = open(temp_path, 'r+b')
+    except FileNotFoundError:
+        raise UploadSessionError('上传会话不存在或已过期', status=404)
+    written = 0
+    with f:
+        f.seek(offset)
+        while written < expected_length:
+            data = stream.read(min(WRITE_BLOCK_SIZE, expected_length - written))
+            if not data:
+                break
+            f.write(data)
+            written += len(data)
+    if written != expected_length:
+        raise UploadSessionError('分片数据不完整，请重新上传该分片')
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO network_disk_upload_chunks (upload_id, chunk_index, chunk_size, received_at)
+            VALUES (%s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE received_at = NOW()
+            """,
+            [session['id'], chunk_index, expected_length]
+        )
+        cursor.execute(
+            "UPDATE network_disk_upload_sessions SET expires_at = NOW() + INTERVAL %s HOUR WHERE id = %s",
+            [SESSION_TTL_HOURS, session['id']]
+        )
+    return chunk_index
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(WRITE_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _delete_session_rows(upload_id):
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM network_disk_upload_chunks WHERE upload_id = %s", [upload_id])
+        cursor.execute("DELETE FROM network_disk_upload_sessions WHERE id = %s", [upload_id])
+
+
+def _settle_committed(session, old_size):
+    """
+    临时文件已重命名到目标路径后结算：按实际写入大小更新台账并删除会话记录，两者在同一事务内
+    old_size 为覆盖前的目标文件大小，None 表示新文件
+    """
+    # 全局行已预留的部分不再重复累加
+    with transaction.atomic():
+        usage_ledger.apply_delta(
+            session['owner_id'],
+            files=1 if old_size is None else 0,
+            size=session['file_size'] - (old_size or 0),
+            reserved=session['reserved_bytes']
+        )
+        _delete_session_rows(session['id'])
+
+
+def commit_session(session):
+    """
+    提交会话：校验分片齐全和哈希后原子重命名到目标路径，按实际大小结算台账
+    返回目标文件路径
+    """
+    received = get_received_chunks(session)
+    if len(received) != session['total_chunks']:
+        raise UploadSessionError(
+            f'还有 {session["total_chunks"] - len(received)} 个分片未上传', status=409
+        )
+
+    temp_path = _temp_path(session['id'])
+    target_file = _target_file(session)
+    old_size = target_file.stat().st_size if target_file.is_file() else None
+
+    # 抢占提交权，防止并发提交；记录提交开始时间和覆盖前大小，提交进程中途退出时由清理任务回滚或结算
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE network_disk_upload_sessions
+            SET status = 'committing', commit_started_at = NOW(), commit_old_size = %s
+            WHERE id = %s AND status = 'uploading'
+            """,
+            [old_size, session['id']]
+        )
+        if cursor.rowcount != 1:
+            raise UploadSessionError('会话正在提交或已结束', status=409)
+
+    try:
+        if session['file_hash'] and _file_sha256(temp_path) != session['file_hash']:
+            raise UploadSessionError('文件校验失败（SHA-256 不一致），请重新上传', status=422)
+
+        target_file.parent.mkdir(parents=True, exist_ok=True)
+        # 覆盖去重文件时先断开硬链接（复制回退会就地改写目标文件）
+        blob_store.break_link(target_file)
+        try:
+            os.replace(temp_path, target_file)
+        except OSError:
+            # 临时目录与网盘目录不在同一文件系统时退化为复制
+            shutil.move(str(temp_path), str(target_file))
+    except Exception:
+        _rollback_commit(session['id'])
+        raise
+
+    # 结算失败时会话保持提交中状态，由 cleanup_expired_sessions 超时后按记录的覆盖前大小重新结算
+    _settle_committed(session, old_size)
+    blob_store.adopt_file(target_file, session['file_hash'])
+    dir_size_index.invalidate(target_file)
+    return target_file
+
+
+def _rollback_commit(upload_id):
+    """提交未完成（临时文件还在）时恢复为上传中，客户端可以重新提交"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE network_disk_upload_sessions
+            SET status = 'uploading', commit_started_at = NULL, commit_old_size = NULL
+            WHERE id = %s AND status = 'committing'
+            """,
+            [upload_id]
+        )
+
+
+def _recover_stale_commits():
+    """
+    处理提交中超过 COMMIT_TIMEOUT_MINUTES 的会话（提交进程中途退出或结算失败）：
+    临时文件还在说明还没有重命名，恢复为上传中（过期后按普通会话清理）；
+    临时文件已不在说明已经重命名到目标路径，按记录的覆盖前大小结算台账并删除会话
+    返回处理的会话数
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {', '.join(_SESSION_COLUMNS)}, commit_old_size FROM network_disk_upload_sessions "
+            "WHERE status = 'committing' AND commit_started_at <= NOW() - INTERVAL %s MINUTE",
+            [COMMIT_TIMEOUT_MINUTES]
+        )
+        rows = cursor.fetchall()
+
+    recovered = 0
+    for row in rows:
+        session = dict(zip(_SESSION_COLUMNS, row))
+        old_size = row[len(_SESSION_COLUMNS)]
+        # 重新计时抢占处理权，避免多个清理进程重复结算
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE network_disk_upload_sessions SET commit_started_at = NOW()
+                WHERE id = %s AND status = 'committing' AND commit_started_at <= NOW() - INTERVAL %s MINUTE
+                """,
+                [session['id'], COMMIT_TIMEOUT_MINUTES]
+            )
+            if cursor.rowcount != 1:
+                continue
+        if _temp_path(session['id']).exists():
+            _rollback_commit(session['id'])
+        else:
+            _settle_committed(session, old_size)
+            target_file = _target_file(session)
+            if target_file.is_file():
+                blob_store.adopt_file(target_file, session['file_hash'])
+                dir_size_index.invalidate(target_file)
+        recovered += 1
+    return recovered
+
+
+def abort_session(session):
+    """取消会话：删除临时文件并释放预留容量"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM network_disk_upload_sessions WHERE id = %s AND status = 'uploading'",
+            [session['id']]
+        )
+        if cursor.rowcount != 1:
+            raise UploadSessionError('会话正在提交或已结束', status=409)
+        cursor.execute("DELETE FROM network_disk_upload_chunks WHERE upload_id = %s", [session['id']])
+    _temp_path(session['id']).unlink(missing_ok=True)
+    usage_ledger.release_bytes(session['reserved_bytes'])
+
+
+def get_reserved_bytes():
+    """所有未结束会话预留的字节数（全量校正台账时保留）"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(SUM(reserved_bytes), 0) FROM network_disk_upload_sessions")
+        return int(cursor.fetchone()[0])
+
+
+def cleanup_expired_sessions():
+    """
+    清理过期会话：释放预留容量、删除临时文件，并删除没有对应会话的残留临时文件；
+    同时回滚或结算提交中超时的会话
+    返回清理的会话数
+    """
+    cleaned = _recover_stale_commits()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT id, reserved_bytes FROM network_disk_upload_sessions "
+            "WHERE expires_at <= NOW() AND status = 'uploading'"
+        )
+        expired = cursor.fetchall()
+
+    for upload_id, reserved_bytes in expired:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM network_disk_upload_sessions WHERE id = %s AND status = 'uploading'",
+                [upload_id]
+            )
+            if cursor.rowcount != 1:
+                continue
+            cursor.execute("DELETE FROM network_disk_upload_chunks WHERE upload_id = %s", [upload_id])
+        _temp_path(upload_id).unlink(missing_ok=True)
+        usage_ledger.release_bytes(reserved_bytes)
+        cleaned += 1
+
+    if UPLOAD_TMP_DIR.is_dir():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id FROM network_disk_upload_sessions")
+            active = {row[0] for row in cursor.fetchall()}
+        # 只删除一小时前的残留文件，避免误删刚创建、会话记录还未写入的临时文件
+        stale_before = time.time() - 3600
+        for entry in os.scandir(UPLOAD_TMP_DIR):
+            if entry.name.endswith('.part') and entry.name[:-len('.part')] not in active:
+                try:
+                    if entry.stat().st_mtime < stale_before:
+                        os.unlink(entry.path)
+                except OSError:
+                    pass
+    return cleaned
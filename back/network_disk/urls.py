@@ -7,6 +7,10 @@ from . import views
 urlpatterns = [
     path('list/', views.list_files, name='list_files'),  # 获取文件列表
     path('upload/', views.upload_file, name='upload_file'),  # 上传文件
+    path('upload/sessions/', views.create_upload_session, name='create_upload_session'),  # 初始化分片上传
+    path('upload/sessions/<str:upload_id>/', views.upload_session_detail, name='upload_session_detail'),  # 查询/取消分片上传
+    path('upload/sessions/<str:upload_id>/chunk/', views.upload_session_chunk, name='upload_session_chunk'),  # 上传分片
+    path('upload/sessions/<str:upload_id>/commit/', views.commit_upload_session, name='commit_upload_session'),  # 提交分片上传
     path('download/<path:file_path>', views.download_file, name='download_file'),  # 下载文件
     path('delete/<path:file_path>', views.delete_file, name='delete_file'),  # 删除文件
     path('mkdir/', views.create_directory, name='create_directory'),  # 创建目录
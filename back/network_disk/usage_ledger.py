@@ -0,0 +1,271 @@
+"""
+网盘容量台账
+按用户记录文件数、目录数和占用字节数（owner_id = 0 为全局汇总行），
+上传、删除、建目录以及定时清理时增量更新，配额检查与存储信息查询只读一行，不再遍历整个网盘目录。
+total_bytes 为逻辑占用（用户可见文件大小之和），全局行的 saved_bytes 记录去重存储节省的字节数，
+物理占用 = total_bytes - saved_bytes，总容量限制按物理占用检查。
+网盘根目录下以 . 开头的目录（如去重存储 .blobs）是内部目录，不计入逻辑占用。
+台账与磁盘之间的漂移由 reconcile_disk_usage 命令定期全量扫描校正。
+"""
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+
+
+# 网盘文件根目录
+NETWORK_DISK_ROOT = Path(settings.BASE_DIR) / 'api' / 'static' / 'files'
+
+# 全局汇总行的 owner_id
+GLOBAL_OWNER_ID = 0
+
+# 网盘总容量：15GB
+TOTAL_CAPACITY_GB = 15.0
+TOTAL_CAPACITY_BYTES = int(TOTAL_CAPACITY_GB * 1024 ** 3)
+
+# 本进程是否已确认全局汇总行存在
+_initialized = False
+
+
+def owner_id_from_parts(path_parts):
+    """从路径（相对网盘根目录的各级名称）中提取所属用户ID，不是用户目录时返回 None"""
+    if not path_parts:
+        return None
+    try:
+        owner_id = int(path_parts[0])
+    except (ValueError, TypeError):
+        return None
+    return owner_id if owner_id > 0 else None
+
+
+def owner_id_for_path(path):
+    """根据绝对路径获取所属用户ID"""
+    try:
+        relative = Path(path).resolve().relative_to(NETWORK_DISK_ROOT.resolve())
+    except (OSError, ValueError):
+        return None
+    return owner_id_from_parts(relative.parts)
+
+
+def summarize_tree(directory_path, linked_inodes=None):
+    """
+    统计目录下的文件数、目录数和字节数（不含目录自身）
+    linked_inodes 传入字典时，顺带收集有多个硬链接的文件（去重存储）：{(st_dev, st_ino): [大小, 出现次数]}
+    返回 (file_count, dir_count, total_bytes)
+    """
+    file_count = 0
+    dir_count = 0
+    total_bytes = 0
+    stack = [str(directory_path)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            dir_count += 1
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            stat = entry.stat(follow_symlinks=False)
+                            file_count += 1
+                            total_bytes += stat.st_size
+                            if linked_inodes is not None and stat.st_nlink > 1:
+                                linked = linked_inodes.setdefault((stat.st_dev, stat.st_ino), [stat.st_size, 0])
+                                linked[1] += 1
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    return file_count, dir_count, total_bytes
+
+
+def scan_usage(root=None):
+    """
+    全量扫描网盘目录，按用户汇总（跳过以 . 开头的内部目录）
+    返回 {owner_id: [file_count, dir_count, total_bytes]}，其中 GLOBAL_OWNER_ID 为全局汇总
+    """
+    root = Path(root or NETWORK_DISK_ROOT)
+    usage = {GLOBAL_OWNER_ID: [0, 0, 0]}
+    if not root.is_dir():
+        return usage
+
+    with os.scandir(root) as entries:
+        top_entries = list(entries)
+
+    for entry in top_entries:
+        if entry.name.startswith('.'):
+            continue
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                # 用户根目录自身不计入目录数，非用户目录只计入全局
+                file_count, dir_count, total_bytes = summarize_tree(entry.path)
+                owner_id = owner_id_from_parts([entry.name])
+                if owner_id is not None:
+                    usage[owner_id] = [file_count, dir_count, total_bytes]
+            elif entry.is_file(follow_symlinks=False):
+                file_count, dir_count, total_bytes = 1, 0, entry.stat(follow_symlinks=False).st_size
+            else:
+                continue
+        except OSError:
+            continue
+        totals = usage[GLOBAL_OWNER_ID]
+        totals[0] += file_count
+        totals[1] += dir_count
+        totals[2] += total_bytes
+    return usage
+
+
+def reconcile():
+    """
+    全量扫描磁盘并覆盖台账，用于初始化和定期校正漂移
+    同时校正去重存储的引用计数并回收无人引用的 blob
+    返回扫描得到的全局汇总 (file_count, dir_count, total_bytes)
+    """
+    global _initialized
+    from .upload_sessions import get_reserved_bytes
+    from .blob_store import reconcile_blobs
+    usage = scan_usage()
+    saved_bytes = reconcile_blobs()
+    # 分片上传会话预留的容量还不在磁盘上，全局行需要保留
+    reserved = get_reserved_bytes()
+    rows = [
+        (
+            owner_id, values[0], values[1],
+            values[2] + (reserved if owner_id == GLOBAL_OWNER_ID else 0),
+            saved_bytes if owner_id == GLOBAL_OWNER_ID else 0,
+        )
+        for owner_id, values in usage.items()
+    ]
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM network_disk_usage")
+            cursor.executemany(
+                """
+                INSERT INTO network_disk_usage (owner_id, file_count, dir_count, total_bytes, saved_bytes)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                rows
+            )
+    _initialized = True
+    return tuple(usage[GLOBAL_OWNER_ID])
+
+
+def ensure_initialized():
+    """首次使用时若台账为空，先做一次全量扫描建立基线"""
+    global _initialized
+    if _initialized:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM network_disk_usage WHERE owner_id = %s",
+            [GLOBAL_OWNER_ID]
+        )
+        exists = cursor.fetchone() is not None
+    if exists:
+        _initialized = True
+    else:
+        reconcile()
+
+
+def apply_delta(owner_id, files=0, dirs=0, size=0, reserved=0, saved=0):
+    """
+    增量更新台账（用户行与全局行在同一条语句内更新）
+    owner_id: 所属用户ID，None 表示只更新全局行
+    reserved: 已通过 reserve_bytes 计入全局行的字节数，全局行不再重复累加
+    saved: 去重存储节省字节数的变化，只记在全局行
+    """
+    ensure_initialized()
+    rows = [(GLOBAL_OWNER_ID, files, dirs, size - reserved, saved)]
+    if owner_id:
+        rows.append((owner_id, files, dirs, size, 0))
+
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+    params = [value for row in rows for value in row]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO network_disk_usage (owner_id, file_count, dir_count, total_bytes, saved_bytes)
+            VALUES {placeholders}
+            ON DUPLICATE KEY UPDATE
+                file_count = GREATEST(file_count + VALUES(file_count), 0),
+                dir_count = GREATEST(dir_count + VALUES(dir_count), 0),
+                total_bytes = GREATEST(total_bytes + VALUES(total_bytes), 0),
+                saved_bytes = GREATEST(saved_bytes + VALUES(saved_bytes), 0)
+            """,
+            params
+        )
+
+
+def reserve_bytes(size, capacity_bytes=TOTAL_CAPACITY_BYTES):
+    """
+    在全局行上原子地预留容量，物理占用超过总容量时返回 False
+    条件更新保证并发上传不会同时越过上限
+    """
+    ensure_initialized()
+    if size <= 0:
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE network_disk_usage
+            SET total_bytes = total_bytes + %s
+            WHERE owner_id = %s AND total_bytes - saved_bytes + %s <= %s
+            """,
+            [size, GLOBAL_OWNER_ID, size, capacity_bytes]
+        )
+        return cursor.rowcount == 1
+
+
+def release_bytes(size):
+    """释放 reserve_bytes 预留但最终未写入的容量"""
+    if size > 0:
+        apply_delta(None, size=-size)
+
+
+def get_usage(owner_id=GLOBAL_OWNER_ID):
+    """
+    读取某个用户（默认全局）的占用
+    返回 {'file_count', 'dir_count', 'total_bytes', 'saved_bytes', 'physical_bytes'}
+    total_bytes 为逻辑占用；saved_bytes 只在全局行有值，physical_bytes = total_bytes - saved_bytes
+    """
+    ensure_initialized()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT file_count, dir_count, total_bytes, saved_bytes
+            FROM network_disk_usage WHERE owner_id = %s
+            """,
+            [owner_id]
+        )
+        row = cursor.fetchone()
+    if not row:
+        return {'file_count': 0, 'dir_count': 0, 'total_bytes': 0, 'saved_bytes': 0, 'physical_bytes': 0}
+    total_bytes = max(row[2], 0)
+    saved_bytes = min(max(row[3], 0), total_bytes)
+    return {
+        'file_count': max(row[0], 0),
+        'dir_count': max(row[1], 0),
+        'total_bytes': total_bytes,
+        'saved_bytes': saved_bytes,
+        'physical_bytes': total_bytes - saved_bytes,
+    }
+
+
+def get_usage_map(owner_ids):
+    """
+    批量读取多个用户的占用字节数，一次查询
+    返回 {owner_id: total_bytes}，台账中没有记录的用户不出现在结果中
+    """
+    owner_ids = [owner_id for owner_id in set(owner_ids) if owner_id]
+    if not owner_ids:
+        return {}
+    ensure_initialized()
+    placeholders = ', '.join(['%s'] * len(owner_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT owner_id, total_bytes FROM network_disk_usage WHERE owner_id IN ({placeholders})",
+            owner_ids
+        )
+        return {row[0]: max(row[1], 0) for row in cursor.fetchall()}
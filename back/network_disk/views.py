@@ -9,15 +9,18 @@
 """
 import os
 import json
-import shutil
 from pathlib import Path
-from django.http import JsonResponse, FileResponse, Http404
+from django.http import JsonResponse, Http404
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
 from common.jwt_utils import jwt_required
 from common.config_utils import get_config_value
+from common.file_streaming import serve_file
+from common import job_queue
 from django.db import connection
+from common.username_resolver import resolve_username, resolve_usernames
+from . import usage_ledger, dir_size_index, upload_sessions, blob_store
 
 
 # 网盘文件根目录
@@ -46,13 +49,9 @@ def get_network_disk_config(request):
     
 
 def get_username_by_id(user_id):
-    """通过用户ID获取用户名"""
+    """通过用户ID获取用户名（经批量解析器缓存）"""
     try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT username FROM users WHERE id = %s", [user_id])
-            row = cursor.fetchone()
-            if row:
-                return row[0]
+        return resolve_username(user_id)
     except Exception:
         pass
     return None
@@ -90,36 +89,30 @@ def format_file_size(size_bytes):
     return f"{s} {size_names[i]}"
 
 
-def calculate_directory_size(directory_path):
-    """递归计算目录大小"""
-    total_size = 0
-    try:
-        for item in directory_path.rglob('*'):
-            if item.is_file():
-                total_size += item.stat().st_size
-    except (PermissionError, OSError):
-        pass
-    return total_size
-
-
-def get_file_info(file_path):
-    """获取文件信息"""
+def get_file_info(file_path, dir_size=None, upload_time=None):
+    """
+    获取文件信息
+    目录大小从目录大小索引读取（dir_size 可由调用方直接给出），
+    尚未统计完成时 size 为 None 并标记 size_pending
+    去重文件（多个硬链接共享 mtime）的修改时间取该路径记录的上传时间（upload_time 可由调用方批量查询后给出）
+    """
     stat = file_path.stat()
+    is_directory = file_path.is_dir()
     size = stat.st_size
-    size_formatted = format_file_size(size)
     
-    # 如果是目录，计算目录大小
-    if file_path.is_dir():
-        dir_size = calculate_directory_size(file_path)
-        size = dir_size
-        size_formatted = format_file_size(dir_size)
+    # 如果是目录，读取目录大小索引
+    if is_directory:
+        size = dir_size if dir_size is not None else dir_size_index.get_directory_size(file_path, stat.st_mtime_ns)
+    elif upload_time is None and stat.st_nlink > 1:
+        upload_time = blob_store.get_upload_times([file_path]).get(str(file_path))
     
     return {
         'name': file_path.name,
         'size': size,
-        'size_formatted': size_formatted,
-        'modified_time': stat.st_mtime,
-        'is_directory': file_path.is_dir(),
+        'size_formatted': format_file_size(size) if size is not None else '计算中',
+        'size_pending': size is None,
+        'modified_time': upload_time if upload_time is not None else stat.st_mtime,
+        'is_directory': is_directory,
     }
 
 
@@ -191,8 +184,8 @@ def list_files(request):
         relative_path = request.GET.get('path', '').strip()
         path_parts = [p for p in relative_path.split('/') if p] if relative_path else []
         
-        # 防止路径遍历攻击
-        if '..' in relative_path or relative_path.startswith('/'):
+        # 防止路径遍历攻击（内部目录不对外列出）
+        if '..' in relative_path or relative_path.startswith('/') or blob_store.is_internal_path(path_parts):
             return JsonResponse({
                 'success': False,
                 'error': '无效的路径'
@@ -269,13 +262,20 @@ def list_files(request):
         try:
             # 如果是根目录，只显示目录（用户文件夹）
             if len(path_parts) == 0:
+                # 用户文件夹的用户名和大小各用一次批量查询取得
+                user_dirs = []
                 if target_path.exists():
-                    for item in target_path.iterdir():
+                    user_dirs = [item for item in target_path.iterdir() if item.is_dir() and item.name.isdigit()]
+                user_dir_ids = [int(item.name) for item in user_dirs]
+                usernames = resolve_usernames(user_dir_ids)
+                user_sizes = usage_ledger.get_usage_map(user_dir_ids)
+                if user_dirs:
+                    for item in user_dirs:
                         if item.is_dir():
-                            # 尝试将目录名转换为用户ID，获取用户名
+                            # 将目录名转换为用户ID，获取用户名
                             try:
                                 user_id = int(item.name)
-                                username = get_username_by_id(user_id)
+                                username = usernames.get(user_id)
                                 if username:  # 只显示有效的用户目录
                                     # 应用筛选条件
                                     if only_mine and current_user_id:
@@ -295,7 +295,7 @@ def list_files(request):
                                         if filter_username.lower() not in username.lower():
                                             continue
                                     
-                                    file_info = get_file_info(item)
+                                    file_info = get_file_info(item, user_sizes.get(user_id))
                                     # 使用用户名作为显示名称
                                     file_info['display_name'] = username
                                     file_info['user_id'] = user_id
@@ -304,9 +304,11 @@ def list_files(request):
                                 # 如果不是数字，跳过
                                 pass
             else:
-                # 非根目录，正常显示所有文件和文件夹
-                for item in target_path.iterdir():
-                    file_info = get_file_info(item)
+                # 非根目录，正常显示所有文件和文件夹（去重文件的上传时间一次批量查询）
+                items = list(target_path.iterdir())
+                upload_times = blob_store.get_upload_times(items)
+                for item in items:
+                    file_info = get_file_info(item, upload_time=upload_times.get(str(item)))
                     if file_info['is_directory']:
                         directories.append(file_info)
                     else:
@@ -416,27 +418,6 @@ def upload_file(request):
         uploaded_file = request.FILES['file']
         file_size = uploaded_file.size
         
-        # 检查容量限制（在上传前检查）
-        total_size_gb = 15.0  # 总容量15GB
-        used_size_bytes = 0
-        try:
-            for item in NETWORK_DISK_ROOT.rglob('*'):
-                if item.is_file():
-                    used_size_bytes += item.stat().st_size
-        except (PermissionError, OSError):
-            pass
-        
-        # 计算上传后的使用量
-        new_used_size_bytes = used_size_bytes + file_size
-        new_used_size_gb = new_used_size_bytes / (1024 ** 3)
-        
-        # 如果超过100%，禁止上传
-        if new_used_size_gb > total_size_gb:
-            return JsonResponse({
-                'success': False,
-                'error': f'存储空间不足，无法上传。当前已用 {round(used_size_bytes / (1024 ** 3), 2)}G / {total_size_gb}G，上传此文件后将超过限制'
-            }, status=400)
-        
         # 构建目标路径
         if path_parts:
             target_dir = NETWORK_DISK_ROOT / '/'.join(path_parts)
@@ -455,31 +436,42 @@ def upload_file(request):
                 'error': '访问被拒绝'
             }, status=403)
         
-        # 保存文件
         file_path = target_dir / uploaded_file.name
-        with open(file_path, 'wb') as f:
-            for chunk in uploaded_file.chunks():
-                f.write(chunk)
+        owner_id = get_path_owner_id(path_parts) or current_user_id
+        
+        # 覆盖同名文件时只需为增量部分预留容量
+        old_size = file_path.stat().st_size if file_path.is_file() else 0
+        is_new_file = not file_path.exists()
+        reserved = max(file_size - old_size, 0)
         
-        # 上传后再次检查容量，如果超过100%则删除刚上传的文件
+        # 检查容量限制：在台账全局行上原子预留，超过总容量则禁止上传
+        if not usage_ledger.reserve_bytes(reserved):
+            used_size_bytes = usage_ledger.get_usage()['physical_bytes']
+            total_size_gb = usage_ledger.TOTAL_CAPACITY_GB
+            return JsonResponse({
+                'success': False,
+                'error': f'存储空间不足，无法上传。当前已用 {round(used_size_bytes / (1024 ** 3), 2)}G / {total_size_gb}G，上传此文件后将超过限制'
+            }, status=400)
+        
+        # 保存文件（覆盖去重文件时先断开硬链接，避免改写共享的 blob）
         try:
-            new_used_size_bytes_check = 0
-            for item in NETWORK_DISK_ROOT.rglob('*'):
-                if item.is_file():
-                    new_used_size_bytes_check += item.stat().st_size
-            
-            new_used_size_gb_check = new_used_size_bytes_check / (1024 ** 3)
-            if new_used_size_gb_check > total_size_gb:
-                # 删除刚上传的文件
-                if file_path.exists():
-                    file_path.unlink()
-                return JsonResponse({
-                    'success': False,
-                    'error': '存储空间已满，文件已自动删除'
-                }, status=400)
-        except (PermissionError, OSError):
-            # 如果检查失败，保留文件（避免误删）
-            pass
+            blob_store.break_link(file_path)
+            with open(file_path, 'wb') as f:
+                for chunk in uploaded_file.chunks():
+                    f.write(chunk)
+        except Exception:
+            usage_ledger.release_bytes(reserved)
+            raise
+        
+        # 按实际写入大小更新台账（全局行已预留的部分不再重复累加）
+        usage_ledger.apply_delta(
+            owner_id,
+            files=1 if is_new_file else 0,
+            size=file_path.stat().st_size - old_size,
+            reserved=reserved
+        )
+        blob_store.adopt_file(file_path)
+        dir_size_index.invalidate(file_path)
         
         file_info = get_file_info(file_path)
         
@@ -498,14 +490,207 @@ def upload_file(request):
         }, status=500)
 
 
+def _upload_session_error(error):
+    return JsonResponse({
+        'success': False,
+        'error': error.message
+    }, status=error.status)
+
+
 @csrf_exempt
-@require_http_methods(["GET"])
+@jwt_required
+@require_http_methods(["POST"])
+def create_upload_session(request):
+    """
+    初始化分片上传会话（大文件断点续传）
+    请求体：{"path": 目标目录, "filename": 文件名, "size": 字节数, "hash": SHA-256（可选）, "chunk_size": 分片大小（可选）}
+    初始化时按文件大小预留容量；同一文件未过期的会话直接返回，用于续传
+    """
+    try:
+        current_user_id = getattr(request, 'user_id', None)
+        if not current_user_id:
+            return JsonResponse({
+                'success': False,
+                'error': '请先登录'
+            }, status=401)
+        
+        try:
+            data = json.loads(request.body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return JsonResponse({
+                'success': False,
+                'error': '请求数据格式错误'
+            }, status=400)
+        
+        relative_path = str(data.get('path') or '').strip()
+        path_parts = [p for p in relative_path.split('/') if p] if relative_path else []
+        filename = str(data.get('filename') or '').strip()
+        if not filename or '/' in filename or '\\' in filename or filename in ('.', '..') or '\x00' in filename:
+            return JsonResponse({
+                'success': False,
+                'error': '文件名无效'
+            }, status=400)
+        
+        # 检查权限
+        has_permission, error_msg = check_permission(current_user_id, path_parts, 'write')
+        if not has_permission:
+            return JsonResponse({
+                'success': False,
+                'error': error_msg
+            }, status=403)
+        
+        # 构建目标路径
+        if path_parts:
+            target_dir = NETWORK_DISK_ROOT / '/'.join(path_parts)
+        else:
+            # 根目录，使用当前用户的文件夹
+            ensure_user_directory(current_user_id)
+            target_dir = NETWORK_DISK_ROOT / str(current_user_id)
+        target_file = target_dir / filename
+        
+        # 检查路径安全性
+        if not check_path_safety(target_file, NETWORK_DISK_ROOT):
+            return JsonResponse({
+                'success': False,
+                'error': '访问被拒绝'
+            }, status=403)
+        if target_file.is_dir():
+            return JsonResponse({
+                'success': False,
+                'error': '已存在同名文件夹'
+            }, status=400)
+        
+        owner_id = get_path_owner_id(path_parts) or current_user_id
+        upload_sessions.cleanup_expired_sessions()
+        session = upload_sessions.create_session(
+            current_user_id,
+            owner_id,
+            target_file,
+            data.get('size'),
+            file_hash=data.get('hash'),
+            chunk_size=data.get('chunk_size')
+        )
+        
+        return JsonResponse({
+            'success': True,
+            'data': upload_sessions.describe_session(session)
+        })
+        
+    except upload_sessions.UploadSessionError as e:
+        return _upload_session_error(e)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'创建上传会话失败: {str(e)}'
+        }, status=500)
+
+
+@csrf_exempt
+@jwt_required
+@require_http_methods(["GET", "DELETE"])
+def upload_session_detail(request, upload_id):
+    """
+    GET：查询上传会话，返回已收到的分片和字节区间（断线后据此续传）
+    DELETE：取消上传会话，删除临时文件并释放预留容量
+    """
+    try:
+        session = upload_sessions.get_session(upload_id, request.user_id)
+        
+        if request.method == 'DELETE':
+            upload_sessions.abort_session(session)
+            return JsonResponse({
+                'success': True,
+                'message': '上传已取消'
+            })
+        
+        return JsonResponse({
+            'success': True,
+            'data': upload_sessions.describe_session(session)
+        })
+        
+    except upload_sessions.UploadSessionError as e:
+        return _upload_session_error(e)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'操作上传会话失败: {str(e)}'
+        }, status=500)
+
+
+@csrf_exempt
+@jwt_required
+@require_http_methods(["PUT"])
+def upload_session_chunk(request, upload_id):
+    """
+    上传一个分片：PUT ?offset=字节偏移，请求体为分片原始数据
+    偏移必须是分片大小的整数倍，不同分片可以并行上传，重复上传同一分片会覆盖
+    """
+    try:
+        session = upload_sessions.get_session(upload_id, request.user_id)
+        try:
+            offset = int(request.GET.get('offset', ''))
+            content_length = int(request.META.get('CONTENT_LENGTH') or -1)
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'error': '缺少 offset 或 Content-Length'
+            }, status=400)
+        
+        # 直接从请求流读取并按偏移写入，不经过 request.body 缓存整个分片
+        chunk_index = upload_sessions.write_chunk(session, offset, request, content_length)
+        
+        return JsonResponse({
+            'success': True,
+            'data': {
+                'chunk_index': chunk_index
+            }
+        })
+        
+    except upload_sessions.UploadSessionError as e:
+        return _upload_session_error(e)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'分片上传失败: {str(e)}'
+        }, status=500)
+
+
+@csrf_exempt
+@jwt_required
+@require_http_methods(["POST"])
+def commit_upload_session(request, upload_id):
+    """
+    提交上传会话：所有分片到齐（并校验 SHA-256）后原子移动到目标路径
+    """
+    try:
+        session = upload_sessions.get_session(upload_id, request.user_id)
+        target_file = upload_sessions.commit_session(session)
+        
+        return JsonResponse({
+            'success': True,
+            'message': '文件上传成功',
+            'data': {
+                'file': get_file_info(target_file)
+            }
+        })
+        
+    except upload_sessions.UploadSessionError as e:
+        return _upload_session_error(e)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'提交上传失败: {str(e)}'
+        }, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "HEAD"])
 def download_file(request, file_path):
     """
     下载文件
     所有用户都可以下载（包括访客）
     支持直接URL访问下载
-    支持 Range 请求（用于检查文件是否存在而不下载）
+    支持 Range 请求（断点续传、视频拖动、bytes=0-0 检查文件是否存在）和 ETag/Last-Modified 条件请求
     """
     try:
         # 防止路径遍历攻击
@@ -515,8 +700,13 @@ def download_file(request, file_path):
                 'error': '无效的路径'
             }, status=400)
         
-        # 构建完整路径
+        # 构建完整路径（内部目录不对外提供下载）
         path_parts = [p for p in file_path.split('/') if p]
+        if blob_store.is_internal_path(path_parts):
+            return JsonResponse({
+                'success': False,
+                'error': '文件不存在'
+            }, status=404)
         target_file = NETWORK_DISK_ROOT / '/'.join(path_parts)
         
         # 检查路径安全性
@@ -533,37 +723,8 @@ def download_file(request, file_path):
                 'error': '文件不存在'
             }, status=404)
         
-        # 检查是否是 Range 请求（用于检查文件是否存在）
-        range_header = request.META.get('HTTP_RANGE', '')
-        if range_header and range_header.startswith('bytes=0-0'):
-            # 只返回第一个字节，用于检查文件是否存在
-            file_size = target_file.stat().st_size
-            if file_size > 0:
-                with open(target_file, 'rb') as f:
-                    f.seek(0)
-                    first_byte = f.read(1)
-                    response = FileResponse(
-                        first_byte,
-                        status=206,  # Partial Content
-                        content_type='application/octet-stream'
-                    )
-                    response['Content-Range'] = f'bytes 0-0/{file_size}'
-                    response['Accept-Ranges'] = 'bytes'
-                    return response
-            else:
-                # 空文件
-                return FileResponse(
-                    b'',
-                    content_type='application/octet-stream'
-                )
-        
-        # 返回文件
-        response = FileResponse(
-            open(target_file, 'rb'),
-            as_attachment=True,
-            filename=target_file.name
-        )
-        return response
+        # 返回文件（支持 Range 断点续传与条件请求）
+        return serve_file(request, target_file, filename=target_file.name)
         
     except Exception as e:
         return JsonResponse({
@@ -579,6 +740,7 @@ def delete_file(request, file_path):
     """
     删除文件或目录
     只能删除自己文件夹下的文件（需要登录）
+    文件直接删除；目录提交后台任务删除，返回 202 和 job_id，通过 /api/jobs/<job_id>/ 查询进度
     """
     try:
         current_user_id = getattr(request, 'user_id', None)
@@ -622,12 +784,34 @@ def delete_file(request, file_path):
                 'error': '文件或目录不存在'
             }, status=404)
         
-        # 删除文件或目录
-        import shutil
-        if target_path.is_file():
-            target_path.unlink()
-        else:
-            shutil.rmtree(target_path)
+        # 目录可能很大，交给后台任务删除，返回任务ID供前端查询进度
+        owner_id = get_path_owner_id(path_parts)
+        if not target_path.is_file():
+            job_id = job_queue.enqueue(
+                'network_disk.delete_tree',
+                {
+                    'path': '/'.join(path_parts),
+                    'owner_id': owner_id,
+                    # 用户根目录自身不计入目录数
+                    'is_user_root': len(path_parts) == 1,
+                },
+                created_by=current_user_id
+            )
+            return JsonResponse({
+                'success': True,
+                'message': '已提交删除任务',
+                'data': {'job_id': job_id}
+            }, status=202)
+        
+        # 删除文件，并从台账中扣除（去重文件同时减少 blob 引用）
+        linked = blob_store.collect_linked(target_path)
+        removed_size = target_path.stat().st_size
+        target_path.unlink()
+        usage_ledger.apply_delta(owner_id, files=-1, size=-removed_size)
+        blob_store.settle_removed(linked)
+        if linked:
+            blob_store.forget_upload_times([target_path])
+        dir_size_index.invalidate(target_path)
         
         return JsonResponse({
             'success': True,
@@ -718,6 +902,8 @@ def create_directory(request):
             }, status=400)
         
         new_dir.mkdir(parents=True, exist_ok=True)
+        usage_ledger.apply_delta(get_path_owner_id(path_parts) or current_user_id, dirs=1)
+        dir_size_index.invalidate(new_dir)
         
         return JsonResponse({
             'success': True,
@@ -835,8 +1021,11 @@ def rename_item(request):
                 'error': '新名称已存在'
             }, status=400)
         
-        # 重命名
+        # 重命名（同一目录内改名，所属用户和占用不变，无需更新台账）
         target_path.rename(new_path)
+        blob_store.move_upload_times(target_path, new_path)
+        dir_size_index.invalidate(target_path)
+        dir_size_index.invalidate(new_path)
         
         # 获取新文件信息
         file_info = get_file_info(new_path)
@@ -864,22 +1053,21 @@ def rename_item(request):
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_storage_info(request):
-    """获取存储信息（总容量15G，已使用，剩余）"""
+    """
+    获取存储信息（总容量15G，已使用，剩余）
+    已使用按物理占用计算（去重后实际占用的磁盘空间），同时返回逻辑占用和去重节省的空间
+    """
     try:
         # 总容量：15GB
-        total_size_gb = 15.0
+        total_size_gb = usage_ledger.TOTAL_CAPACITY_GB
         
-        # 计算已使用空间
-        used_size_bytes = 0
-        try:
-            for item in NETWORK_DISK_ROOT.rglob('*'):
-                if item.is_file():
-                    used_size_bytes += item.stat().st_size
-        except (PermissionError, OSError):
-            pass
+        # 已使用空间直接读取台账全局行
+        usage = usage_ledger.get_usage()
         
         # 转换为GB
-        used_size_gb = used_size_bytes / (1024 ** 3)
+        used_size_gb = usage['physical_bytes'] / (1024 ** 3)
+        logical_used_gb = usage['total_bytes'] / (1024 ** 3)
+        saved_gb = usage['saved_bytes'] / (1024 ** 3)
         remaining_size_gb = total_size_gb - used_size_gb
         
         # 精度为0.01G
@@ -894,6 +1082,9 @@ def get_storage_info(request):
             'data': {
                 'total_gb': total_size_gb,
                 'used_gb': used_size_gb,
+                'physical_used_gb': used_size_gb,
+                'logical_used_gb': round(logical_used_gb, 2),
+                'saved_gb': round(saved_gb, 2),
                 'remaining_gb': remaining_size_gb,
                 'usage_percentage': usage_percentage
             }
@@ -0,0 +1,49 @@
+import apiClient from './api.js'
+
+const apiUrl = import.meta.env.VITE_API_URL
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms))
+
+/**
+ * 轮询等待后台任务结束
+ * @param {number} jobId - 任务ID
+ * @param {object} options - onProgress(job)：每次轮询的回调；interval：轮询间隔（毫秒）
+ * @returns {Promise<object>} 结束时的任务信息（status 为 succeeded / failed / cancelled）
+ */
+export async function waitForJob(jobId, { onProgress, interval = 1000 } = {}) {
+  for (;;) {
+    const response = await apiClient.get(`${apiUrl}jobs/${jobId}/`)
+    if (!response.data?.success) {
+      throw new Error(response.data?.error || '获取任务状态失败')
+    }
+    const job = response.data.data
+    if (onProgress) onProgress(job)
+    if (job.finished) return job
+    await sleep(interval)
+  }
+}
+
+/**
+ * 处理可能提交了后台任务的接口响应
+ * 返回 job_id 时等待任务结束，并转换为 { success, error, data }（data 为任务结果）；否则原样返回 response.data
+ */
+export async function resolveJobResponse(response, options) {
+  const jobId = response.data?.data?.job_id
+  if (!response.data?.success || !jobId) {
+    return response.data
+  }
+  const job = await waitForJob(jobId, options)
+  return {
+    success: job.status === 'succeeded',
+    error: job.status === 'cancelled' ? '任务已取消' : job.error,
+    data: job.result
+  }
+}
+
+/**
+ * 取消后台任务
+ * @param {number} jobId - 任务ID
+ */
+export function cancelJob(jobId) {
+  return apiClient.post(`${apiUrl}jobs/${jobId}/cancel/`)
+}